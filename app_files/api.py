@@ -0,0 +1,510 @@
+"""Headless HTTP (ASGI) API over PricingCalculator.
+
+Run with:  uvicorn api:app --port 8000
+
+Endpoints (JSON in, JSON out):
+    GET  /health
+    GET  /tariff                  current tariff version, packages and modules
+    POST /quote                   {"modules": [...], "package": "...", "orders": 30}
+                                  (optional on quotes: "contract_month": 1, "discount_codes": [...])
+    POST /optimal-package         {"modules": [...], "orders": 30}
+    POST /upgrade                 {"modules": [...], "package": "...", "orders": 30}
+    POST /forecast                {"modules": [...], "inputs": {...forecast inputs}}
+    POST /forecast/export         {"modules": [...], "inputs": {...}, "format": "csv|parquet|xlsx",
+                                   "currency": "EUR", "sweep": {"input": "monthly_growth_rate", "values": [...]}}
+    POST /forecast/metrics        {"modules": [...], "inputs": {...}, "discount_rate": 0.1, "currency": "EUR",
+                                   "sweep": {...}}  NPV, IRR and payback month of the monthly profit
+    POST /quotes/batch            {"quotes": [{"modules": [...], "package": "...", "orders": 30}, ...]}
+    GET  /batcher/stats           batch size and queueing delay metrics for /quote
+    GET  /metrics                 span timings and cache counters (Prometheus text format)
+
+Single /quote requests go through an asyncio micro-batcher (batcher.py), so
+bursts of concurrent quotes are priced as one vectorized batch. Tune it with
+PRICING_BATCH_MAX_SIZE and PRICING_BATCH_MAX_WAIT_MS.
+
+The API reads the same compiled tariff snapshot as the Streamlit app
+(pricing_config, or PRICING_TARIFF_FILE with hot reload).
+"""
+import asyncio
+import json
+import math
+
+import numpy as np
+
+from batcher import batched_quote, get_quote_batcher
+from currency import BASE_CURRENCY, available_currencies, convert_amounts
+from exports import ExportError, export_forecasts
+from config import DEFAULT_DISCOUNT_RATE
+from finance import cash_flow_metrics
+from forecast import convert_forecast, forecast_inputs, get_forecast, sweep_forecasts, sweep_metrics
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_prometheus
+from pricing_calculator import PricingCalculator, price_quotes
+from tariff import get_tariff
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_BATCH_QUOTES = 200_000
+MAX_SWEEP_VALUES = 100_000
+
+
+class ApiError(Exception):
+    """Client error reported as a JSON body with the given HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class StreamingResponse:
+    """Handler result sent as a chunked body instead of JSON"""
+
+    def __init__(self, chunks, content_type, filename=None):
+        self.chunks = chunks
+        self.content_type = content_type
+        self.filename = filename
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, 'keys'):  # read-only tariff mappings
+        return dict(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _is_finite_number(value):
+    # json.loads accepts NaN and Infinity, which are not valid amounts (nor valid JSON to send back)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return math.isfinite(value)
+    except OverflowError:
+        return False
+
+
+def _modules(payload, tariff):
+    modules = payload.get('modules') or []
+    if not isinstance(modules, list) or not all(isinstance(name, str) for name in modules):
+        raise ApiError("'modules' must be a list of module names")
+    unknown = [name for name in modules if name not in tariff.modules]
+    if unknown:
+        raise ApiError(f"Unknown modules: {', '.join(map(str, unknown))}")
+    return modules
+
+
+def _package(payload, tariff, required=True):
+    package = payload.get('package')
+    if package is None and not required:
+        return None
+    if package not in tariff.package_sizes:
+        raise ApiError(f"Unknown package: {package!r}")
+    return package
+
+
+def _orders(payload):
+    orders = payload.get('orders')
+    if not _is_finite_number(orders) or orders < 0:
+        raise ApiError("'orders' must be a non-negative number")
+    return orders
+
+
+def _contract_month(payload):
+    month = payload.get('contract_month', 1)
+    if isinstance(month, bool) or not isinstance(month, int) or month < 1:
+        raise ApiError("'contract_month' must be a whole number from 1")
+    return month
+
+
+def _discount_codes(payload):
+    codes = payload.get('discount_codes') or []
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+        raise ApiError("'discount_codes' must be a list of strings")
+    return codes
+
+
+def _calculator(payload, package_required=True):
+    tariff = get_tariff()
+    package = _package(payload, tariff, package_required) or tariff.package_names[0]
+    return PricingCalculator(_modules(payload, tariff), package, tariff, discount_codes=_discount_codes(payload))
+
+
+def handle_health(payload):
+    return {'status': 'ok', 'tariff_version': get_tariff().version}
+
+
+def handle_tariff(payload):
+    tariff = get_tariff()
+    return {
+        'tariff_version': tariff.version,
+        'packages': tariff.package_sizes,
+        'modules': tariff.modules,
+        'external_fees': tariff.external_fees,
+        'discounts': tariff.discount_rules
+    }
+
+
+async def handle_quote(payload):
+    # Concurrent quotes are coalesced into one vectorized batch by the shared batcher
+    calculator = _calculator(payload)
+    tariff = calculator.tariff
+    orders = _orders(payload)
+    contract_month = _contract_month(payload)
+    result = await batched_quote(calculator.selected_modules, calculator.selected_package, orders, tariff,
+                                 contract_month, calculator.discount_codes)
+    monthly = {
+        'base_modules': result['base_modules'],
+        'overage_orders': result['overage_orders'],
+        'overage_cost': result['overage_cost'],
+        'discount': result['discount'],
+        'total': result['total']
+    }
+    if tariff.discounts:
+        # Discounts can change from month to month, so the year is priced month by month
+        yearly = calculator.calculate_yearly_cost(orders, contract_month)
+    else:
+        yearly = {
+            'base_modules_yearly': monthly['base_modules'] * 12,
+            'overage_cost_yearly': monthly['overage_cost'] * 12,
+            'discount_yearly': 0.0,
+            'total_yearly': monthly['total'] * 12
+        }
+    return {
+        'tariff_version': tariff.version,
+        'package': calculator.get_package_details(),
+        'monthly': monthly,
+        'yearly': yearly
+    }
+
+
+def handle_optimal_package(payload):
+    calculator = _calculator(payload, package_required=False)
+    result = calculator.find_optimal_package(_orders(payload), _contract_month(payload))
+    result['tariff_version'] = calculator.tariff.version
+    return result
+
+
+def handle_upgrade(payload):
+    calculator = _calculator(payload)
+    result = calculator.should_upgrade_package(_orders(payload), _contract_month(payload))
+    result['tariff_version'] = calculator.tariff.version
+    return result
+
+
+def handle_forecast(payload):
+    calculator = _calculator(payload, package_required=False)
+    try:
+        inputs = forecast_inputs(calculator.tariff, **(payload.get('inputs') or {}))
+    except (TypeError, ValueError) as e:
+        raise ApiError(str(e))
+    forecast = get_forecast(calculator, inputs)
+    return {'tariff_version': calculator.tariff.version, 'inputs': inputs, 'forecast': forecast}
+
+
+def _currency(payload):
+    currency = payload.get('currency', BASE_CURRENCY)
+    if currency not in available_currencies():
+        raise ApiError(f"Unknown currency: {currency!r}")
+    return currency
+
+
+def _sweep(payload, inputs, tariff):
+    """(input name, values) of the optional 'sweep', or None; every value is validated up front"""
+    sweep = payload.get('sweep')
+    if sweep is None:
+        return None
+    values = sweep.get('values') if isinstance(sweep, dict) else None
+    if not isinstance(values, list) or not values:
+        raise ApiError("'sweep' must be {\"input\": name, \"values\": [...]}")
+    if len(values) > MAX_SWEEP_VALUES:
+        raise ApiError(f"At most {MAX_SWEEP_VALUES} sweep values", status=413)
+    if sweep.get('input') not in inputs:
+        raise ApiError(f"Unknown forecast input: {sweep.get('input')!r}")
+    for index, value in enumerate(values):
+        try:
+            forecast_inputs(tariff, **dict(inputs, **{sweep['input']: value}))
+        except (TypeError, ValueError) as e:
+            raise ApiError(f"Invalid sweep value at index {index}: {e}")
+    return sweep['input'], values
+
+
+def _nan_to_none(values):
+    # Undefined IRR / payback are NaN, which is not valid JSON
+    return np.where(np.isnan(values), None, values)
+
+
+def handle_forecast_export(payload):
+    calculator = _calculator(payload, package_required=False)
+    currency = _currency(payload)
+    try:
+        inputs = forecast_inputs(calculator.tariff, **(payload.get('inputs') or {}))
+    except (TypeError, ValueError) as e:
+        raise ApiError(str(e))
+
+    sweep = _sweep(payload, inputs, calculator.tariff)
+    if sweep is None:
+        forecasts = [(None, convert_forecast(get_forecast(calculator, inputs), currency))]
+    else:
+        # Computed lazily while the response streams (values were validated by _sweep)
+        forecasts = sweep_forecasts(calculator, inputs, *sweep, currency)
+
+    try:
+        content_type, extension, chunks = export_forecasts(forecasts, calculator.tariff.package_names,
+                                                           payload.get('format', 'csv'))
+    except ExportError as e:
+        raise ApiError(str(e))
+    return StreamingResponse(chunks, content_type, f"forecast.{extension}")
+
+
+def handle_forecast_metrics(payload):
+    calculator = _calculator(payload, package_required=False)
+    currency = _currency(payload)
+    discount_rate = payload.get('discount_rate', DEFAULT_DISCOUNT_RATE)
+    if not _is_finite_number(discount_rate) or discount_rate <= -1:
+        raise ApiError("'discount_rate' must be an annual rate above -1, e.g. 0.1")
+    try:
+        inputs = forecast_inputs(calculator.tariff, **(payload.get('inputs') or {}))
+    except (TypeError, ValueError) as e:
+        raise ApiError(str(e))
+
+    sweep = _sweep(payload, inputs, calculator.tariff)
+    if sweep is None:
+        metrics = cash_flow_metrics(get_forecast(calculator, inputs)['profit'], discount_rate)
+    else:
+        metrics = sweep_metrics(calculator, inputs, *sweep, discount_rate)
+        # One row per scenario; the monthly curves are left to /forecast/export
+        del metrics['cumulative_cash'], metrics['discounted_cumulative_cash']
+    # NPV and cash curves scale with the currency; IRR and payback do not
+    metrics = convert_amounts(metrics, [field for field in ('npv', 'cumulative_cash', 'discounted_cumulative_cash')
+                                        if field in metrics], currency)
+    for field in ('irr_monthly', 'irr_annual', 'payback_month'):
+        metrics[field] = _nan_to_none(metrics[field])
+    return {'tariff_version': calculator.tariff.version, 'currency': currency, 'discount_rate': discount_rate,
+            'metrics': metrics}
+
+
+def handle_batcher_stats(payload):
+    batcher = get_quote_batcher()
+    stats = batcher.metrics.summary()
+    stats.update(max_batch_size_limit=batcher.max_batch_size, max_wait_ms=batcher.max_wait_ms)
+    return stats
+
+
+def handle_metrics(payload):
+    return StreamingResponse([render_prometheus().encode('utf-8')], METRICS_CONTENT_TYPE)
+
+
+def parse_quote_batch(quotes, tariff):
+    """Turn a list of quote dicts into (module_masks, package_indices, orders, contract_months,
+    active_discounts) arrays; active_discounts is None when no quote has discount codes"""
+    if not isinstance(quotes, list) or not quotes:
+        raise ApiError("'quotes' must be a non-empty list")
+    if len(quotes) > MAX_BATCH_QUOTES:
+        raise ApiError(f"At most {MAX_BATCH_QUOTES} quotes per batch", status=413)
+
+    masks = np.empty(len(quotes), dtype=np.uint64)
+    packages = np.empty(len(quotes), dtype=int)
+    orders = np.empty(len(quotes), dtype=float)
+    months = np.ones(len(quotes), dtype=int)
+    active = None
+    package_index = {name: i for i, name in enumerate(tariff.package_names)}
+    mask_cache = {}
+    for i, quote in enumerate(quotes):
+        try:
+            modules = tuple(_modules(quote, tariff))
+            mask = mask_cache.get(modules)
+            if mask is None:
+                mask = mask_cache[modules] = tariff.module_mask(modules)
+            masks[i] = mask
+            package = _package(quote, tariff, required=False)
+            packages[i] = -1 if package is None else package_index[package]
+            orders[i] = _orders(quote)
+            months[i] = _contract_month(quote)
+            codes = _discount_codes(quote)
+            if codes:
+                if active is None:
+                    active = np.tile(tariff.discounts.active(), (len(quotes), 1))
+                active[i] = tariff.discounts.active(codes)
+        except (AttributeError, KeyError, OverflowError, TypeError, ApiError) as e:
+            raise ApiError(f"Invalid quote at index {i}: {e}")
+    return masks, packages, orders, months, active
+
+
+def handle_quote_batch(payload):
+    tariff = get_tariff()
+    masks, packages, orders, months, active = parse_quote_batch(payload.get('quotes'), tariff)
+    result = price_quotes(tariff, masks, packages, orders, months, active)
+    names = np.array(tariff.package_names, dtype=object)
+    return {
+        'tariff_version': tariff.version,
+        'count': len(orders),
+        'package': names[result['package_index']],
+        'base_modules': result['base_modules'],
+        'overage_orders': result['overage_orders'],
+        'overage_cost': result['overage_cost'],
+        'discount': result['discount'],
+        'total': result['total'],
+        'optimal_package': names[result['optimal_package_index']],
+        'optimal_total': result['optimal_total'],
+        'monthly_savings': result['monthly_savings']
+    }
+
+
+ROUTES = {
+    ('GET', '/health'): handle_health,
+    ('GET', '/tariff'): handle_tariff,
+    ('POST', '/quote'): handle_quote,
+    ('POST', '/optimal-package'): handle_optimal_package,
+    ('POST', '/upgrade'): handle_upgrade,
+    ('POST', '/forecast'): handle_forecast,
+    ('POST', '/forecast/export'): handle_forecast_export,
+    ('POST', '/forecast/metrics'): handle_forecast_metrics,
+    ('POST', '/quotes/batch'): handle_quote_batch,
+    ('GET', '/batcher/stats'): handle_batcher_stats,
+    ('GET', '/metrics'): handle_metrics,
+}
+
+
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise ApiError("Request body too large", status=413)
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def _send_stream(send, response):
+    headers = [(b'content-type', response.content_type.encode())]
+    if response.filename:
+        headers.append((b'content-disposition', f'attachment; filename="{response.filename}"'.encode()))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    chunks = iter(response.chunks)
+    while True:
+        # Producing a chunk can mean computing sweep forecasts and encoding them, so it runs
+        # in a worker thread and the event loop keeps serving other requests meanwhile
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        if chunk:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _send_json(send, status, data):
+    body = json.dumps(data, default=_json_default).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class PricingAPI:
+    """Minimal ASGI application dispatching ROUTES; handlers may be plain functions (run in a worker
+    thread) or async functions (run on the event loop)"""
+
+    def __init__(self, routes=None):
+        self.routes = dict(ROUTES if routes is None else routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        method, path = scope['method'], scope['path'].rstrip('/') or '/'
+        handler = self.routes.get((method, path))
+        started = False
+
+        async def send_tracked(message):
+            nonlocal started
+            started = started or message['type'] == 'http.response.start'
+            await send(message)
+
+        try:
+            if handler is None:
+                allowed = [m for (m, p) in self.routes if p == path]
+                raise ApiError("Method not allowed" if allowed else "Not found", status=405 if allowed else 404)
+            body = await _read_body(receive)
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError:
+                raise ApiError("Request body must be JSON")
+            if not isinstance(payload, dict):
+                raise ApiError("Request body must be a JSON object")
+            if asyncio.iscoroutinefunction(handler):
+                result = await handler(payload)
+            else:
+                # Plain handlers price batches and compute forecasts and metrics, which is CPU-bound;
+                # a worker thread runs them so the event loop (and the /quote batcher) keeps serving
+                result = await asyncio.to_thread(handler, payload)
+            if isinstance(result, StreamingResponse):
+                await _send_stream(send_tracked, result)
+            else:
+                await _send_json(send_tracked, 200, result)
+        except ApiError as e:
+            await _send_json(send, e.status, {'error': str(e)})
+        except (KeyError, TypeError, ValueError) as e:
+            # Backstop for invalid input the handlers did not check; a stream that has
+            # already started cannot change its status, so that error is left to the server
+            if started:
+                raise
+            await _send_json(send, 400, {'error': f"Invalid request: {e}"})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                get_tariff()  # Compile (or load) the tariff before accepting requests
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+app = PricingAPI()
+
+
+class LocalClient:
+    """Call an ASGI app in-process, without a server or network (for tests and benchmarks)"""
+
+    def __init__(self, asgi_app=None):
+        self.app = asgi_app or app
+
+    async def request(self, method, path, payload=None):
+        """Returns (status, decoded JSON body), or (status, raw bytes) for non-JSON responses"""
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        scope = {'type': 'http', 'method': method, 'path': path, 'headers': [], 'query_string': b''}
+        sent = []
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                return {'type': 'http.disconnect'}
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        await self.app(scope, receive, send)
+        status = sent[0]['status']
+        response = b''.join(message.get('body', b'') for message in sent[1:])
+        if dict(sent[0]['headers']).get(b'content-type') != b'application/json':
+            return status, response
+        return status, json.loads(response) if response else None
+
+    def get(self, path):
+        return asyncio.run(self.request('GET', path))
+
+    def post(self, path, payload):
+        return asyncio.run(self.request('POST', path, payload))
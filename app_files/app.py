@@ -1,54 +1,190 @@
+import calendar
+import os
+
+import numpy as np
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
 import plotly.express as px
-from pricing_config import MODULES, PACKAGE_SIZES, EXTERNAL_FEES
 from pricing_calculator import PricingCalculator
+from tariff import get_tariff
+from config import DEFAULT_DISCOUNT_RATE, FORECAST_DEFAULTS, SEASONALITY_PRESETS
+from finance import cash_flow_metrics
+from forecast import convert_forecast, forecast_inputs, forecast_key, get_forecast
+from electricity import load_price_curves
+from portfolio import load_portfolio
+from charts import get_cash_figure, get_figures
+from view_models import get_configurator_view
+from currency import BASE_CURRENCY, available_currencies, format_money, fx_rate
+from exports import EXPORT_FORMATS, FORMAT_LABELS, available_formats, export_forecasts
+from quote_pdf import QuoteBusyError, build_quote_document, get_quote_jobs, quote_key
+from scenarios import get_scenario_store, prime_forecast_cache
+from snapshots import encode_snapshot, get_snapshot_store, new_token
+from metrics import ENABLED as METRICS_ENABLED, begin_rerun, end_rerun, span, start_metrics_server, timed
+from profiling import ENABLED as PROFILING_ENABLED, ProfilerBusyError, last_profile, profile_archive, profile_call, top_functions
 
 def main():
+    # Spans are only recorded for this rerun when the timing panel is switched on
+    # (or exported process-wide with PRICING_METRICS=1)
+    begin_rerun(record=timing_panel_available() and st.session_state.get('show_timings', False))
+    start_metrics_server()
+    profile = profiling_available() and st.sidebar.button(
+        "🔬 Profile this rerun", help="Reruns the page under the profiler and saves the profile for download")
+    try:
+        with span("rerun"):
+            if profile:
+                show_page_profiled()
+            else:
+                show_page()
+    finally:
+        breakdown = end_rerun()
+    show_timing_panel(breakdown)
+    show_profile_panel()
+
+def timing_panel_available():
+    return METRICS_ENABLED or st.query_params.get("timings") == "1"
+
+def show_timing_panel(breakdown):
+    if not timing_panel_available():
+        return
+    if st.sidebar.checkbox("⏱️ Show rerun timings", key="show_timings") and breakdown:
+        with st.sidebar.expander("Rerun timings", expanded=True):
+            labels = [f"{'  ' * depth}{name}" for name, depth, _ in breakdown]
+            width = max(len(label) for label in labels)
+            st.code("\n".join(f"{label:<{width}} {seconds * 1000:8.2f} ms"
+                              for label, (_, _, seconds) in zip(labels, breakdown)), language=None)
+
+def profiling_available():
+    return PROFILING_ENABLED or st.query_params.get("profile") == "1"
+
+def profile_metadata():
+    """What a profiled rerun was taken with, so it can be reproduced"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    tariff = st.session_state.get('tariff')
+    return {
+        'session_id': ctx.session_id if ctx is not None else None,
+        'tariff_version': tariff.version if tariff is not None else None,
+        'selected_modules': selected_modules(tariff) if 'module_mask' in st.session_state else None,
+        'selected_package': selected_package(tariff) if 'package_id' in st.session_state else None,
+        'display_currency': st.session_state.get('display_currency'),
+        'forecast_inputs': (dict(zip(FORECAST_DEFAULTS, st.session_state.forecast_values))
+                            if 'forecast_values' in st.session_state else None),
+        'query_params': st.query_params.to_dict(),
+        'streamlit': st.__version__,
+    }
+
+def show_page_profiled():
+    try:
+        profile_call(show_page, profile_metadata)
+    except ProfilerBusyError as error:
+        st.sidebar.warning(str(error))
+        show_page()
+    finally:
+        # Also set when the rerun was cut short by st.rerun(); the profile is saved either way
+        if last_profile() is not None:
+            st.session_state.last_profile = last_profile()
+
+def show_profile_panel():
+    profile = st.session_state.get('last_profile')
+    if not profiling_available() or profile is None or not os.path.isdir(profile['path']):
+        return
+    with st.sidebar.expander("🔬 Last profile", expanded=True):
+        st.caption(f"{profile['seconds'] * 1000:,.0f} ms, {profile['samples']:,} samples · saved to {profile['path']}")
+        st.download_button(
+            "Download profile",
+            data=lambda: profile_archive(profile['path']),
+            file_name=f"profile-{profile['name']}.zip",
+            mime="application/zip",
+            on_click="ignore",
+            help="pstats, a speedscope flamegraph (open at speedscope.app) and the session metadata"
+        )
+        st.code(top_functions(profile['path'], limit=10), language=None)
+
+# The module selection and package live in session state as a tariff bitmask and a package
+# index; everything derived from them comes from the shared, immutable tariff and view models
+def selected_modules(tariff):
+    return tariff.mask_to_modules(st.session_state.module_mask)
+
+def selected_package(tariff):
+    return tariff.package_names[st.session_state.package_id]
+
+def remap_selection(tariff, latest_tariff):
+    """Carry the selection over to a new tariff, dropping modules and packages it no longer has"""
+    modules = [module for module in selected_modules(tariff) if module in latest_tariff.modules]
+    st.session_state.module_mask = latest_tariff.module_mask(modules)
+    package = selected_package(tariff)
+    st.session_state.package_id = latest_tariff.package_index(package) if package in latest_tariff.package_sizes else 0
+
+def show_page():
     st.set_page_config(
         page_title="Nordic Charge",
         page_icon="🏢",  # Use emoji as more reliable fallback
         layout="wide"
     )
 
-    # Header with logo
-    col1, col2, col3 = st.columns([1, 1, 1])
-    with col2:
-        import os
-        logo_path = "logo.png"
-        if os.path.exists(logo_path):
-            st.image(logo_path, width=1000)
-        else:
-            # Try alternative paths
-            alt_paths = ["./logo.png", "app_files/logo.png", "../logo.png"]
-            logo_found = False
-            for path in alt_paths:
-                if os.path.exists(path):
-                    st.image(path, width=1000)
-                    logo_found = True
-                    break
-            
-            if not logo_found:
+    with span("session_init"):
+        # Pin a tariff snapshot to this session; price updates apply to new sessions
+        if 'tariff' not in st.session_state:
+            st.session_state.tariff = get_tariff()
+        tariff = st.session_state.tariff
+        restore_session(tariff)
+    
+        # Display currency only rescales results; inputs and cached forecasts stay in the base currency
+        st.sidebar.selectbox(
+            "Display currency:",
+            options=available_currencies(),
+            key="display_currency",
+            help=f"Amounts are converted from {BASE_CURRENCY} using the local FX rate table"
+        )
+
+        # Partner and prepay promotions are unlocked by a code; only offer the field when the tariff has one
+        if any(tariff.discounts.codes):
+            st.sidebar.text_input(
+                "Discount codes:",
+                key="discount_codes",
+                help="Comma-separated promotion codes, e.g. ANNUAL"
+            )
+    
+        # Header with logo (resolved and read once per process by the view model)
+        view = get_configurator_view(tariff)
+        col1, col2, col3 = st.columns([1, 1, 1])
+        with col2:
+            if view.logo is not None:
+                st.image(view.logo, width=1000)
+            else:
                 st.write("🏢 Nordic Charge")  # Fallback with company name
     
-    st.markdown("---")
+        st.markdown("---")
     
-    # Initialize session state
-    if 'selected_modules' not in st.session_state:
-        st.session_state.selected_modules = ["System Access"]  # Always include System Access
-    elif "System Access" not in st.session_state.selected_modules:
-        st.session_state.selected_modules.append("System Access")  # Ensure it's always present
-    if 'selected_package' not in st.session_state:
-        st.session_state.selected_package = "Starter (<25 orders)"
+        latest_tariff = get_tariff()
+        if latest_tariff.version != tariff.version:
+            st.info("🔔 Updated prices are available. Your current calculation uses the prices from when you opened the page.")
+            if st.button("Use updated prices"):
+                if 'module_mask' in st.session_state:
+                    remap_selection(tariff, latest_tariff)
+                st.session_state.tariff = latest_tariff
+                st.rerun()
+    
+        # Initialize session state
+        # Always include System Access
+        system_access = tariff.module_mask(["System Access"])
+        st.session_state.module_mask = st.session_state.get('module_mask', 0) | system_access
+        if 'package_id' not in st.session_state:
+            st.session_state.package_id = 0
     
     # Single-step module and package selection
     show_pricing_configurator()
 
+@timed("configurator")
 def show_pricing_configurator():
     st.header("Select your package tier and modules to see pricing")
     st.subheader("Note all prices are excluded VAT")
     
+    tariff = st.session_state.tariff
+    currency = st.session_state.display_currency
+    view = get_configurator_view(tariff, currency)
+    modules = selected_modules(tariff)
+    
     # Create two columns for package selection and module selection
     col_package, col_modules = st.columns([1, 2])
     
@@ -56,29 +192,28 @@ def show_pricing_configurator():
         st.subheader("Select Package Tier")
         
         # Package selection
-        package_options = list(PACKAGE_SIZES.keys())
-        selected_package = st.selectbox(
+        package_options = list(view.package_names)
+        package = st.selectbox(
             "Choose your package size:",
             options=package_options,
-            index=package_options.index(st.session_state.selected_package),
+            index=st.session_state.package_id,
             help="Higher tiers offer better overage rates and module pricing"
         )
         
         # Update session state
-        st.session_state.selected_package = selected_package
+        st.session_state.package_id = tariff.package_index(package)
         
         # Show package details
-        package_info = PACKAGE_SIZES[selected_package]
+        package_view = view.packages[package]
         
-        st.metric("Order Limit", f"{package_info['order_limit']} orders/month")
-        st.metric("Overage Fee", f"{package_info['overage_fee']} DKK/order")
+        st.metric("Order Limit", package_view.order_limit_text)
+        st.metric("Overage Fee", package_view.overage_fee_text)
         
         # Show total monthly cost preview
-        if st.session_state.selected_modules:
-            total_module_cost = sum(MODULES[module]['prices'][selected_package] 
-                                  for module in st.session_state.selected_modules)
-            st.metric("**Monthly Module Cost**", f"**{total_module_cost:,} DKK**")
-            st.caption(f"Based on {len(st.session_state.selected_modules)} selected modules")
+        if modules:
+            total_module_cost = sum(package_view.module_prices[module] for module in modules)
+            st.metric("**Monthly Module Cost**", f"**{format_money(total_module_cost, currency)}**")
+            st.caption(f"Based on {len(modules)} selected modules")
         else:
             st.info("Select modules to see total cost")
     
@@ -86,98 +221,59 @@ def show_pricing_configurator():
         st.subheader("Select Modules")
         
         # Create a grid for modules
-        col1, col2 = st.columns(2)
+        grid_columns = st.columns(2)
         
-        selected_modules = st.session_state.selected_modules.copy()
-        
-        with col1:
-            for i, (module_name, module_info) in enumerate(MODULES.items()):
-                if i % 2 == 0:
-                    module_price = module_info['prices'][selected_package]
-                    
-                    # Special handling for mandatory System Access module
-                    if module_name == "System Access":
-                        is_selected = st.checkbox(
-                            f"**{module_name}** (Mandatory)",
-                            key=f"module_{module_name}",
-                            value=True,
-                            disabled=True  # Cannot be deselected
-                        )
-                        # Always ensure System Access is in selected modules
-                        if module_name not in selected_modules:
-                            selected_modules.append(module_name)
-                    else:
-                        # Regular checkbox for optional modules
-                        is_selected = st.checkbox(
-                            f"**{module_name}**",
-                            key=f"module_{module_name}",
-                            value=module_name in st.session_state.selected_modules
-                        )
-                        
-                        if is_selected and module_name not in selected_modules:
-                            selected_modules.append(module_name)
-                        elif not is_selected and module_name in selected_modules:
-                            selected_modules.remove(module_name)
-                    
-                    if is_selected:
-                        st.success(f" {module_price:,} DKK/month")
-                    else:
-                        st.write(f" {module_price:,} DKK/month")
-                    
-                    st.caption(module_info['description'])
-                    st.markdown("---")
+        module_mask = 0
         
-        with col2:
-            for i, (module_name, module_info) in enumerate(MODULES.items()):
-                if i % 2 == 1:
-                    module_price = module_info['prices'][selected_package]
-                    
+        for column, rows in zip(grid_columns, package_view.module_columns):
+            with column:
+                for row in rows:
                     # Special handling for mandatory System Access module
-                    if module_name == "System Access":
+                    if row.mandatory:
                         is_selected = st.checkbox(
-                            f"**{module_name}** (Mandatory)",
-                            key=f"module_{module_name}",
+                            row.label,
+                            key=f"module_{row.name}",
                             value=True,
                             disabled=True  # Cannot be deselected
                         )
                         # Always ensure System Access is in selected modules
-                        if module_name not in selected_modules:
-                            selected_modules.append(module_name)
+                        module_mask |= tariff.module_mask([row.name])
                     else:
                         # Regular checkbox for optional modules
                         is_selected = st.checkbox(
-                            f"**{module_name}**",
-                            key=f"module_{module_name}",
-                            value=module_name in st.session_state.selected_modules
+                            row.label,
+                            key=f"module_{row.name}",
+                            value=row.name in modules
                         )
                         
-                        if is_selected and module_name not in selected_modules:
-                            selected_modules.append(module_name)
-                        elif not is_selected and module_name in selected_modules:
-                            selected_modules.remove(module_name)
+                        if is_selected:
+                            module_mask |= tariff.module_mask([row.name])
                     
                     if is_selected:
-                        st.success(f" {module_price:,} DKK/month")
+                        st.success(row.price_text)
                     else:
-                        st.write(f" {module_price:,} DKK/month")
+                        st.write(row.price_text)
                     
-                    st.caption(module_info['description'])
+                    st.caption(row.description)
                     st.markdown("---")
         
         # Update session state
-        st.session_state.selected_modules = selected_modules
+        st.session_state.module_mask = module_mask
     
     # Show detailed calculator since System Access is always selected
     st.markdown("---")
     show_pricing_calculator()
 
+@timed("calculator")
 def show_pricing_calculator():
     st.header("Your Pricing Summary & Calculator")
     
-    calculator = PricingCalculator(
-        st.session_state.selected_modules,
-        st.session_state.selected_package
-    )
+    tariff = st.session_state.tariff
+    currency = st.session_state.display_currency
+    modules = selected_modules(tariff)
+    package = selected_package(tariff)
+    calculator = PricingCalculator(modules, package, tariff, currency,
+                                   st.session_state.get('discount_codes', ''))
     
     # Show configuration summary
     with st.expander("Configuration Summary", expanded=True):
@@ -185,86 +281,142 @@ def show_pricing_calculator():
         
         with col1:
             st.subheader("Selected Modules:")
-            for module in st.session_state.selected_modules:
-                module_info = MODULES[module]
-                module_price = module_info['prices'][st.session_state.selected_package]
-                st.write(f"• **{module}**: {module_price:,} DKK/month")
+            package_view = get_configurator_view(tariff, currency).packages[package]
+            for module in modules:
+                st.write(package_view.rows_by_name[module].summary_text)
 
             # Show total module cost
-            total_module_cost = sum(MODULES[module]['prices'][st.session_state.selected_package] 
-                                  for module in st.session_state.selected_modules)
-            st.write(f"**Total Module Cost: {total_module_cost:,} DKK/month**")
+            total_module_cost = sum(package_view.module_prices[module] for module in modules)
+            st.write(f"**Total Module Cost: {format_money(total_module_cost, currency)}/month**")
         
         with col2:
             st.subheader("Package Details:")
-            package_info = PACKAGE_SIZES[st.session_state.selected_package]
-            st.write(f"**{st.session_state.selected_package}**")
+            package_info = tariff.package_sizes[package]
+            st.write(f"**{package}**")
             st.write(f"• Order limit: {package_info['order_limit']} orders")
-            st.write(f"• Overage fee: {package_info['overage_fee']} DKK/order")
+            st.write(f"• Overage fee: {package_view.overage_fee_text}")
 
     # Customer Revenue Calculator
     st.markdown("---")
     st.header("Customer Revenue Calculator")
     st.subheader("Calculate your potential revenue from charge point subscriptions:")
     
+    # Widget defaults come from the loaded scenario (if any); keys change per load so the
+    # widgets pick the loaded values up instead of keeping their previous state
+    initial = st.session_state.get('scenario_inputs', FORECAST_DEFAULTS)
+    generation = st.session_state.get('scenario_generation', 0)
+    
+    def widget_key(name):
+        return f"{name}_{generation}"
+    
     col1, col2, col3 = st.columns([2, 2, 3])
     
     with col1:
         st.subheader("💵 Pricing Structure")
         monthly_subscription_fee = st.number_input(
-            "Monthly subscription (DKK/customer):",
+            f"Monthly subscription ({BASE_CURRENCY}/customer):",
             min_value=0.0,
-            value=39.0,
+            value=float(initial['monthly_subscription_fee']),
+            key=widget_key("monthly_subscription_fee"),
             step=10.0,
             help="How much you charge customers per charge point per month"
         )
         
         one_time_setup_fee = st.number_input(
-            "Standard package fee (DKK):",
+            f"Standard package fee ({BASE_CURRENCY}):",
             min_value=0.0,
-            value=6000.0,
+            value=float(initial['one_time_setup_fee']),
+            key=widget_key("one_time_setup_fee"),
             step=100.0,
             help="Initial setup or installation fee charged to customers"
         )
         
         st.subheader("**⚡ Electricity Revenue**")
         kwh_addon_price = st.number_input(
-            "kWh add-on (DKK/kWh):",
+            f"kWh add-on ({BASE_CURRENCY}/kWh):",
             min_value=0.0,
-            value=0.00,
+            value=float(initial['kwh_addon_price']),
+            key=widget_key("kwh_addon_price"),
             step=0.05,
             help="Your markup/profit per kWh of electricity sold to customers"
         )
         
+        # Hourly model is offered when a curves directory with price/profile files is present
+        curves = load_price_curves()
+        electricity_model = "flat"
+        spot_markup = 0.0
+        if curves is not None:
+            model_choice = st.radio(
+                "Electricity model:",
+                options=["Flat monthly", "Hourly profiles"],
+                index=1 if initial['electricity_model'] == "hourly" else 0,
+                horizontal=True,
+                key=widget_key("electricity_model"),
+                help="Hourly profiles price each customer segment's hourly consumption against the hourly spot price"
+            )
+            if model_choice == "Hourly profiles":
+                electricity_model = "hourly"
+                spot_markup = st.number_input(
+                    "Spot price markup (%):",
+                    min_value=0.0,
+                    value=round(initial['spot_markup'] * 100, 6),
+                    step=1.0,
+                    key=widget_key("spot_markup"),
+                    help="Share of the hourly spot price you keep as margin"
+                ) / 100
+                st.caption(f"Segments: {', '.join(curves.segment_names)}")
+        
         kwh_per_customer_monthly = st.number_input(
             "kWh/customer/month:",
             min_value=0.0,
-            value=400.0,
+            value=float(initial['kwh_per_customer_monthly']),
+            key=widget_key("kwh_per_customer_monthly"),
             step=50.0,
+            disabled=electricity_model == "hourly",
             help="Expected monthly electricity consumption per active customer"
         )
     
     with col2:
         st.subheader("📈 Business Forecast")
+        # Portfolio mode is offered when a file with the existing customers is present
+        portfolio = load_portfolio()
+        existing_model = "count"
+        if portfolio is not None:
+            existing_choice = st.radio(
+                "Existing customers:",
+                options=["Count", "Portfolio file"],
+                index=1 if initial['existing_model'] == "portfolio" else 0,
+                horizontal=True,
+                key=widget_key("existing_model"),
+                help="Portfolio file simulates every existing customer with their own fee, consumption and churn"
+            )
+            if existing_choice == "Portfolio file":
+                existing_model = "portfolio"
+                st.caption(f"{len(portfolio):,} customers in segments: {', '.join(portfolio.segment_names)}")
+        
         existing_customers = st.number_input(
             "Current customers:",
             min_value=0,
-            value=0,
+            value=int(initial['existing_customers']),
             step=50,
+            key=widget_key("existing_customers"),
+            disabled=existing_model == "portfolio",
             help="Number of customers you already have with active subscriptions"
         )
         
         customers_month_1 = st.number_input(
             "New customers Month 1:",
             min_value=0,
-            value=20,
+            value=int(initial['customers_month_1']),
+            key=widget_key("customers_month_1"),
             step=5
         )
         
         monthly_growth_rate = st.number_input(
             "Growth rate (%):",
             min_value=0.0,
-            value=5.0,
+            value=round(initial['monthly_growth_rate'] * 100, 6),
+            key=widget_key("monthly_growth_rate"),
             step=1.0,
             help="Expected percentage growth in new customers each month"
         ) / 100
@@ -272,8 +424,9 @@ def show_pricing_calculator():
         growth_cap = st.number_input(
             "Growth cap (max new customers/month):",
             min_value=0,
-            value=0,
+            value=int(initial['growth_cap']),
             step=50,
+            key=widget_key("growth_cap"),
             help="Maximum new customers per month (0 = no cap). Growth flattens when this limit is reached."
         )
         
@@ -281,7 +434,8 @@ def show_pricing_calculator():
             "Retention rate (%):",
             min_value=0.0,
             max_value=100.0,
-            value=100.0,
+            value=round(initial['customer_retention_rate'] * 100, 6),
+            key=widget_key("customer_retention_rate"),
             step=1.0,
             help="Percentage of customers that continue their subscription each month"
         ) / 100
@@ -290,128 +444,154 @@ def show_pricing_calculator():
             "Forecast (months):",
             min_value=1,
             max_value=60,
-            value=24,
+            value=int(initial['forecast_months']),
+            key=widget_key("forecast_months"),
             step=12
         )
         
+        # Daily resolution spreads new customers over the days with seasonality and bills per month
+        resolution = st.radio(
+            "Forecast resolution:",
+            options=["Monthly", "Daily"],
+            index=1 if initial['resolution'] == "daily" else 0,
+            horizontal=True,
+            key=widget_key("resolution"),
+            help="Daily models new customers per day with weekly and annual seasonality, then adds them up per billing month"
+        ).lower()
+        weekly_seasonality = tuple(initial['weekly_seasonality'])
+        annual_seasonality = tuple(initial['annual_seasonality'])
+        if resolution == "daily":
+            presets = dict(SEASONALITY_PRESETS)
+            current = next((name for name, preset in presets.items()
+                            if preset == {'weekly_seasonality': weekly_seasonality,
+                                          'annual_seasonality': annual_seasonality}), None)
+            if current is None:
+                # Profiles from a saved scenario or the API that match no preset
+                current = "Custom"
+                presets[current] = {'weekly_seasonality': weekly_seasonality,
+                                    'annual_seasonality': annual_seasonality}
+            seasonality = st.selectbox(
+                "Seasonality:",
+                options=list(presets),
+                index=list(presets).index(current),
+                key=widget_key("seasonality"),
+                help="Weekday and calendar-month multipliers on new customers per day"
+            )
+            weekly_seasonality = presets[seasonality]['weekly_seasonality']
+            annual_seasonality = presets[seasonality]['annual_seasonality']
+        
+        start_month = int(initial['start_month'])
+        if resolution == "daily" or electricity_model == "hourly":
+            start_month = st.selectbox(
+                "Forecast starts in:",
+                options=list(range(1, 13)),
+                index=start_month - 1,
+                key=widget_key("start_month"),
+                format_func=lambda month: calendar.month_name[month]
+            )
+        
         st.markdown("**🔌 Hardware**")
         charger_type = st.radio(
             "Charger type:",
-            options=["NexBlue Edge", "Zaptec Go"],
+            options=tariff.charger_types,
+            index=tariff.charger_types.index(initial['charger_type']),
+            key=widget_key("charger_type"),
             help="Choose which charger type you'll provide to new customers"
         )
         
         # Calculate variable costs per customer
-        standard_installation_cost = EXTERNAL_FEES["Standard installation"]["amount"]
-        charger_cost = EXTERNAL_FEES[charger_type]["amount"]
+        standard_installation_cost = tariff.external_fees["Standard installation"]["amount"]
+        charger_cost = tariff.external_fees[charger_type]["amount"]
         variable_cost_per_customer = standard_installation_cost + charger_cost
         
         # Display variable cost breakdown
-        st.caption(f"🔧 Installation: DKK{standard_installation_cost:,}")
-        st.caption(f"⚡ {charger_type}: DKK{charger_cost:,}")
-        st.metric("Variable Cost/Customer", f"DKK{variable_cost_per_customer:,}")
+        rate = fx_rate(currency)
+        st.caption(f"🔧 Installation: {format_money(standard_installation_cost * rate, currency)}")
+        st.caption(f"⚡ {charger_type}: {format_money(charger_cost * rate, currency)}")
+        st.metric("Variable Cost/Customer", format_money(variable_cost_per_customer * rate, currency))
     
     with col3:
         # Calculate revenue projections
         st.subheader("📊 Revenue Projection")
         
-        # Calculate monthly projections
-        months = []
-        new_customers = []
-        total_active_customers = []
-        monthly_recurring_revenue = []
-        electricity_revenue = []  # New electricity revenue stream
-        one_time_revenue = []
-        total_monthly_revenue = []
-        
-        active_customers = existing_customers  # Start with existing customer base
-        
-        for month in range(1, forecast_months + 1):
-            # Calculate new customers for this month with growth cap
-            uncapped_new_cust = customers_month_1 * ((1 + monthly_growth_rate) ** (month - 1))
-            
-            # Apply growth cap if set (0 means no cap)
-            if growth_cap > 0:
-                new_cust = min(uncapped_new_cust, growth_cap)
-            else:
-                new_cust = uncapped_new_cust
-                
-            new_customers.append(int(new_cust))
-            
-            # Update active customers (existing/previous retained + new)
-            active_customers = (active_customers * customer_retention_rate) + new_cust
-            total_active_customers.append(int(active_customers))
-            
-            # Calculate revenues
-            mrr = active_customers * monthly_subscription_fee
-            electricity_rev = active_customers * kwh_per_customer_monthly * kwh_addon_price  # New electricity revenue
-            one_time_rev = new_cust * one_time_setup_fee  # Only new customers pay setup fee
-            total_rev = mrr + electricity_rev + one_time_rev
-            
-            months.append(month)
-            monthly_recurring_revenue.append(mrr)
-            electricity_revenue.append(electricity_rev)
-            one_time_revenue.append(one_time_rev)
-            total_monthly_revenue.append(total_rev)
+        forecast_params = forecast_inputs(tariff, **{
+            'monthly_subscription_fee': monthly_subscription_fee,
+            'one_time_setup_fee': one_time_setup_fee,
+            'kwh_addon_price': kwh_addon_price,
+            'kwh_per_customer_monthly': kwh_per_customer_monthly,
+            'existing_customers': existing_customers,
+            'existing_model': existing_model,
+            'customers_month_1': customers_month_1,
+            'monthly_growth_rate': monthly_growth_rate,
+            'growth_cap': growth_cap,
+            'customer_retention_rate': customer_retention_rate,
+            'forecast_months': forecast_months,
+            'charger_type': charger_type,
+            'electricity_model': electricity_model,
+            'spot_markup': spot_markup,
+            'start_month': start_month,
+            'resolution': resolution,
+            'weekly_seasonality': weekly_seasonality,
+            'annual_seasonality': annual_seasonality
+        })
+        # Only the values, in FORECAST_DEFAULTS order; attached to profiles, see profile_metadata()
+        st.session_state.forecast_values = tuple(forecast_params.values())
+        # Monthly projections are shared across sessions via the result cache (in the base
+        # currency); switching display currency only rescales the cached arrays
+        forecast = convert_forecast(get_forecast(calculator, forecast_params), currency)
+        new_customers = forecast['new_customers']
+        save_session_snapshot(calculator, forecast_params)
         
         # Display key metrics
-        total_revenue_full_period = sum(total_monthly_revenue)  # Fix: calculate total for full period
+        total_revenue_full_period = forecast['total_revenue'].sum()
         average_monthly_revenue = total_revenue_full_period / forecast_months  # Calculate average
         
         # Calculate comprehensive totals for the forecast period
-        total_recurring_revenue = sum(monthly_recurring_revenue)
-        total_electricity_revenue = sum(electricity_revenue)
-        total_one_time_revenue = sum(one_time_revenue)
-        total_new_customers = sum(new_customers)
+        total_recurring_revenue = forecast['monthly_recurring_revenue'].sum()
+        total_electricity_revenue = forecast['electricity_revenue'].sum()
+        total_one_time_revenue = forecast['one_time_revenue'].sum()
+        total_new_customers = new_customers.sum()
         
         # Verify total revenue calculation (should equal subscription + electricity + one-time)
         total_revenue_verification = total_recurring_revenue + total_electricity_revenue + total_one_time_revenue
         assert abs(total_revenue_full_period - total_revenue_verification) < 0.01, "Revenue calculation mismatch!"
         
-        # Calculate platform costs (including overage) for each month
-        total_platform_cost_period = 0
-        total_variable_cost_period = 0
-        
-        for i in range(len(months)):
-            new_customers_month = new_customers[i]
-            
-            # Platform cost based on new customers per month (with automatic package optimization)
-            optimal_info = calculator.find_optimal_package(new_customers_month)
-            monthly_platform_cost = optimal_info['cost_breakdown']['total']
-            total_platform_cost_period += monthly_platform_cost
-            
-            # Variable costs based on new customers only
-            monthly_variable_cost = new_customers_month * variable_cost_per_customer
-            total_variable_cost_period += monthly_variable_cost
+        # Platform costs (including overage, optimal package per month) and variable costs
+        total_platform_cost_period = forecast['platform_costs'].sum()
+        total_variable_cost_period = forecast['variable_costs'].sum()
         
         total_cost_period = total_platform_cost_period + total_variable_cost_period
-        
+
         # Display comprehensive metrics in a structured way
         st.markdown("### 📊 Complete Financial Overview")
         
         # Revenue metrics
         col_rev1, col_rev2 = st.columns(2)
         with col_rev1:
-            st.metric("Total Revenue", f"{total_revenue_full_period:,.0f} DKK")
+            st.metric("Total Revenue", format_money(total_revenue_full_period, currency))
             st.caption(f"Over {forecast_months} months")
         with col_rev2:
-            st.metric("Total Recurring Revenue", f"{total_recurring_revenue + total_electricity_revenue:,.0f} DKK")
+            st.metric("Total Recurring Revenue", format_money(total_recurring_revenue + total_electricity_revenue, currency))
             st.caption("Subscription + Electricity accumulated")
         
         col_rev3, col_rev4 = st.columns(2)
         with col_rev3:
-            st.metric("Total Subscription Revenue", f"{total_recurring_revenue:,.0f} DKK")
+            st.metric("Total Subscription Revenue", format_money(total_recurring_revenue, currency))
             st.caption("Monthly subscriptions accumulated over period")
         with col_rev4:
-            st.metric("Total Electricity Revenue", f"{total_electricity_revenue:,.0f} DKK")
+            st.metric("Total Electricity Revenue", format_money(total_electricity_revenue, currency))
             st.caption("Electricity sales accumulated over period")
+            if electricity_model == "hourly":
+                segment_totals = forecast['electricity_by_segment'].sum(axis=0)
+                st.caption(" · ".join(f"{name}: {format_money(total, currency)}"
+                                      for name, total in zip(curves.segment_names, segment_totals)))
         
         col_rev5, col_rev6 = st.columns(2)
         with col_rev5:
-            st.metric("Total One-time Revenue", f"{total_one_time_revenue:,.0f} DKK")
+            st.metric("Total One-time Revenue", format_money(total_one_time_revenue, currency))
             st.caption(f"From {total_new_customers:,.0f} new customers")
         with col_rev6:
-            st.metric("Average Monthly Revenue", f"{average_monthly_revenue:,.0f} DKK")
+            st.metric("Average Monthly Revenue", format_money(average_monthly_revenue, currency))
             st.caption("Mean monthly revenue over period")
         
         st.markdown("---")
@@ -419,20 +599,23 @@ def show_pricing_calculator():
         # Cost metrics
         col_cost1, col_cost2 = st.columns(2)
         with col_cost1:
-            st.metric("Total Cost", f"{total_cost_period:,.0f} DKK")
+            st.metric("Total Cost", format_money(total_cost_period, currency))
             st.caption(f"Over {forecast_months} months")
         with col_cost2:
-            st.metric("Total Platform Cost", f"{total_platform_cost_period:,.0f} DKK")
-            st.caption("Base + overage fees combined")
+            st.metric("Total Platform Cost", format_money(total_platform_cost_period, currency))
+            if forecast['discounts'].sum() > 0:
+                st.caption(f"Base + overage fees combined, after {format_money(forecast['discounts'].sum(), currency)} in discounts")
+            else:
+                st.caption("Base + overage fees combined")
         
         col_cost3, col_cost4 = st.columns(2)
         with col_cost3:
-            st.metric("Total Variable Cost", f"{total_variable_cost_period:,.0f} DKK")
+            st.metric("Total Variable Cost", format_money(total_variable_cost_period, currency))
             st.caption("Installation + charger costs")
         with col_cost4:
             # Calculate average platform cost over the period
             average_platform_cost = total_platform_cost_period / forecast_months
-            st.metric("Average Platform Cost", f"{average_platform_cost:,.0f} DKK")
+            st.metric("Average Platform Cost", format_money(average_platform_cost, currency))
             st.caption("Mean monthly platform cost")
         
         st.markdown("---")
@@ -444,9 +627,9 @@ def show_pricing_calculator():
         col_profit1, col_profit2 = st.columns(2)
         with col_profit1:
             if total_profit_period >= 0:
-                st.metric("Total Profit", f"{total_profit_period:,.0f} DKK", delta="Profitable")
+                st.metric("Total Profit", format_money(total_profit_period, currency), delta="Profitable")
             else:
-                st.metric("Total Loss", f"{abs(total_profit_period):,.0f} DKK", delta="Loss")
+                st.metric("Total Loss", format_money(abs(total_profit_period), currency), delta="Loss")
         with col_profit2:
             st.metric("Profit Margin", f"{profit_margin:.1f}%")
             if profit_margin > 10:
@@ -456,13 +639,57 @@ def show_pricing_calculator():
             else:
                 st.caption("🔴 Low margin")
         
-        if existing_customers > 0:
+        # Discounted metrics of the monthly profit (already in the display currency); the
+        # default is set through session state so a restored session can override it
+        st.session_state.setdefault("discount_rate", DEFAULT_DISCOUNT_RATE * 100)
+        discount_rate = st.number_input(
+            "Discount rate (%/year):",
+            min_value=0.0,
+            max_value=100.0,
+            step=1.0,
+            key="discount_rate",
+            help="Annual rate used to discount monthly profits for the net present value"
+        ) / 100
+        cash = cash_flow_metrics(forecast['profit'], discount_rate)
+        
+        col_npv1, col_npv2, col_npv3 = st.columns(3)
+        with col_npv1:
+            st.metric("NPV", format_money(cash['npv'], currency))
+            st.caption(f"Profits discounted at {discount_rate:.1%}/year")
+        with col_npv2:
+            if np.isnan(cash['irr_annual']):
+                st.metric("IRR", "n/a")
+                # Without a sign change there is no IRR at all; with one it lies outside IRR_BRACKET
+                if (forecast['profit'] > 0).any() and (forecast['profit'] < 0).any():
+                    st.caption("IRR outside the solvable range")
+                else:
+                    st.caption("Profit never changes sign")
+            else:
+                st.metric("IRR", f"{cash['irr_annual']:.1%}")
+                st.caption(f"{cash['irr_monthly']:.2%} per month")
+        with col_npv3:
+            if np.isnan(cash['payback_month']):
+                st.metric("Payback", "Not reached")
+                st.caption(f"Within {forecast_months} months")
+            else:
+                st.metric("Payback", f"Month {cash['payback_month']:.0f}")
+                st.caption("Cumulative cash stays positive from here")
+        
+        if resolution == "daily":
+            # Day-level troughs that the monthly totals average away
+            daily_cash = np.cumsum(forecast['daily_profit'])
+            lowest_day = int(daily_cash.argmin())
+            st.metric("Lowest Cash Point", format_money(daily_cash[lowest_day], currency))
+            st.caption(f"Cumulative cash on day {lowest_day + 1} (month {forecast['day_month'][lowest_day]})")
+        
+        if existing_model == "portfolio":
+            show_portfolio_summary(forecast, currency)
+        elif existing_customers > 0:
             st.caption(f"Starting with {existing_customers:,} existing customers")
         
         # Growth cap indicator
         if growth_cap > 0:
             # Check if growth cap was reached
-            max_new_customers = max(new_customers) if new_customers else 0
             cap_reached_month = next((i+1 for i, val in enumerate(new_customers) if val >= growth_cap), None)
             
             if cap_reached_month:
@@ -476,111 +703,15 @@ def show_pricing_calculator():
     
     st.info("💡 **Smart Package Optimization**: The system automatically selects the most cost-effective package tier each month based on your **new customers per month**. When overage fees exceed the cost of upgrading to a higher tier, the system automatically chooses the cheaper option.")
     
-    revenue_df = pd.DataFrame({
-        'Month': months,
-        'New Customers': new_customers,
-        'Total Active Customers': total_active_customers,
-        'Monthly Recurring Revenue': monthly_recurring_revenue,
-        'Electricity Revenue': electricity_revenue,
-        'One-time Revenue': one_time_revenue,
-        'Total Monthly Revenue': total_monthly_revenue
-    })
+    show_saved_scenarios(calculator, forecast_params)
+    
+    figures = get_figures(forecast_key(calculator, forecast_params), forecast, currency)
+    optimal_packages_used = [tariff.package_names[i] for i in forecast['optimal_package_index']]
     
     # Fixed Components chart (full width)
     st.subheader("🔧 Fixed Components")
-    fig_fixed = go.Figure()
-    
-    # Calculate platform costs including overage for each month
-    fixed_platform_costs = []
-    overage_costs = []
-    optimal_packages_used = []  # Track which package is optimal for each month
-    
-    for i in range(len(months)):
-        new_customers_month = new_customers[i]
-        
-        # Find optimal package for this month's new customers
-        optimal_info = calculator.find_optimal_package(new_customers_month)
-        optimal_package = optimal_info['optimal_package']
-        optimal_packages_used.append(optimal_package)
-        
-        # Calculate costs using optimal package
-        cost_breakdown = optimal_info['cost_breakdown']
-        base_cost = cost_breakdown['base_modules']
-        overage_cost = cost_breakdown['overage_cost']
-        
-        fixed_platform_costs.append(base_cost)
-        overage_costs.append(overage_cost)
-    
-    # Base platform cost (red) - bottom layer
-    fig_fixed.add_trace(go.Bar(
-        name='Base Platform Cost',
-        x=revenue_df['Month'],
-        y=fixed_platform_costs,
-        marker_color="#1111D6",
-        offsetgroup=1,
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Base Platform Cost: DKK%{y:,.0f}<br>' +
-                     '<extra></extra>'
-    ))
-    
-    # Overage fees (blue) - stacked on top of base platform cost
-    fig_fixed.add_trace(go.Bar(
-        name='Overage Fees',
-        x=revenue_df['Month'],
-        y=overage_costs,
-        marker_color='#7C99F1',
-        offsetgroup=1,
-        base=fixed_platform_costs,
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Overage Fees: DKK%{y:,.0f}<br>' +
-                     'Orders over limit: %{customdata:,.0f}<br>' +
-                     '<extra></extra>',
-        customdata=[max(0, new_customers[i] - PACKAGE_SIZES[optimal_packages_used[i]]['order_limit']) for i in range(len(months))]
-    ))
-    
-    # Monthly Recurring Revenue (separate group) - bottom layer
-    fig_fixed.add_trace(go.Bar(
-        name='Monthly Subscription Revenue',
-        x=revenue_df['Month'],
-        y=revenue_df['Monthly Recurring Revenue'],
-        marker_color="#63BE63",
-        offsetgroup=2,
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Subscription Revenue: DKK%{y:,.0f}<br>' +
-                     'Active Customers: %{customdata:,.0f}<br>' +
-                     '<extra></extra>',
-        customdata=revenue_df['Total Active Customers']
-    ))
-    
-    # Electricity Revenue (stacked on top of subscription revenue)
-    fig_fixed.add_trace(go.Bar(
-        name='Electricity Revenue',
-        x=revenue_df['Month'],
-        y=revenue_df['Electricity Revenue'],
-        marker_color='#C7F0C0',
-        offsetgroup=2,
-        base=revenue_df['Monthly Recurring Revenue'],
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Electricity Revenue: DKK%{y:,.0f}<br>' +
-                     'Active Customers: %{customdata:,.0f}<br>' +
-                     '<extra></extra>',
-        customdata=revenue_df['Total Active Customers']
-    ))
-    
-    fig_fixed.update_layout(
-        title='Fixed: Subscription + Electricity Revenue vs Platform Cost (Auto-Optimized Packages)',
-        xaxis_title='Month',
-        xaxis=dict(
-            tick0=1, 
-            dtick=2,  # Show x-axis ticks every 2 months
-            range=[0.5, forecast_months + 0.5]  # Set proper range from 1 to forecast_months
-        ),
-        yaxis_title='Amount (DKK)',
-        height=500,
-        barmode='group'
-    )
-    
-    st.plotly_chart(fig_fixed, use_container_width=True)
+    with span("plotly_chart.fixed"):
+        st.plotly_chart(figures['fixed'], use_container_width=True)
     
     # Show package optimization summary
     with st.expander("📋 Package Optimization Summary", expanded=False):
@@ -610,243 +741,201 @@ def show_pricing_calculator():
 
     # Variable Components chart (full width)
     st.subheader("📊 Variable Components")
-    fig_variable = go.Figure()
-    
-    # Calculate variable costs for each month (based on new customers)
-    variable_costs_monthly = [new_customers[i] * variable_cost_per_customer for i in range(len(months))]
-    
-    fig_variable.add_trace(go.Bar(
-        name='Variable Costs',
-        x=revenue_df['Month'],
-        y=variable_costs_monthly,
-        marker_color='#FF8C00',
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Variable Costs: DKK%{y:,.0f}<br>' +
-                     'New Customers: %{customdata:,.0f}<br>' +
-                     '<extra></extra>',
-        customdata=revenue_df['New Customers']
-    ))
-    
-    fig_variable.add_trace(go.Bar(
-        name='One-time Revenue',
-        x=revenue_df['Month'],
-        y=revenue_df['One-time Revenue'],
-        marker_color="#018001",
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'One-time Revenue: DKK%{y:,.0f}<br>' +
-                     'New Customers: %{customdata:,.0f}<br>' +
-                     '<extra></extra>',
-        customdata=revenue_df['New Customers']
-    ))
-    
-    fig_variable.update_layout(
-        title='Variable: One-time Revenue vs Variable Costs',
-        xaxis_title='Month',
-        xaxis=dict(
-            tick0=1, 
-            dtick=2,  # Show x-axis ticks every 2 months
-            range=[0.5, forecast_months + 0.5]  # Set proper range from 1 to forecast_months
-        ),
-        yaxis_title='Amount (DKK)',
-        height=500,
-        barmode='group'
-    )
-    
-    st.plotly_chart(fig_variable, use_container_width=True)
+    with span("plotly_chart.variable"):
+        st.plotly_chart(figures['variable'], use_container_width=True)
     
     # Total Overview section (full width below the two columns)
     st.subheader("💰 Total Overview")
-    fig_total = go.Figure()
+    with span("plotly_chart.total"):
+        st.plotly_chart(figures['total'], use_container_width=True)
     
-    # Calculate total costs for each month (including overage)
-    total_platform_costs_monthly = []
-    for i in range(len(months)):
-        new_customers_month = new_customers[i]
-        # Use optimal package for each month's new customers
-        optimal_info = calculator.find_optimal_package(new_customers_month)
-        platform_cost = optimal_info['cost_breakdown']['total']
-        total_platform_costs_monthly.append(platform_cost)
-    
-    total_costs_monthly = [total_platform_costs_monthly[i] + variable_costs_monthly[i] for i in range(len(months))]
-    
-    # Total Revenue Stack (One-time + Electricity + Subscription) - Group 1
-    fig_total.add_trace(go.Bar(
-        name='One-time Revenue',
-        x=revenue_df['Month'],
-        y=revenue_df['One-time Revenue'],
-        marker_color='#018001',
-        offsetgroup=1,
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'One-time Revenue: %{y:,.0f} DKK<br>' +
-                     'New Customers: %{customdata:,.0f}<br>' +
-                     '<extra></extra>',
-        customdata=revenue_df['New Customers']
-    ))
-    
-    fig_total.add_trace(go.Bar(
-        name='Monthly Subscription Revenue',
-        x=revenue_df['Month'],
-        y=revenue_df['Monthly Recurring Revenue'],
-        marker_color='#63BE63',
-        offsetgroup=1,
-        base=revenue_df['One-time Revenue'],
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Subscription Revenue: %{y:,.0f} DKK<br>' +
-                     'Active Customers: %{customdata:,.0f}<br>' +
-                     '<extra></extra>',
-        customdata=revenue_df['Total Active Customers']
-    ))
-
-    # Calculate base for electricity revenue (one-time + subscription)
-    onetime_plus_subscription = [revenue_df['One-time Revenue'].iloc[i] + revenue_df['Monthly Recurring Revenue'].iloc[i] for i in range(len(months))]
-
-    fig_total.add_trace(go.Bar(
-        name='Electricity Revenue',
-        x=revenue_df['Month'],
-        y=revenue_df['Electricity Revenue'],
-        marker_color="#C7F0C0",
-        offsetgroup=1,
-        base=onetime_plus_subscription,
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Electricity Revenue: %{y:,.0f} DKK<br>' +
-                     'Active Customers: %{customdata:,.0f}<br>' +
-                     '<extra></extra>',
-        customdata=revenue_df['Total Active Customers']
-    ))
-    
-    # Total Costs Stack (Variable + Base Platform + Overage) - Group 2
-    fig_total.add_trace(go.Bar(
-        name='Variable Costs',
-        x=revenue_df['Month'],
-        y=variable_costs_monthly,
-        marker_color='#FF8C00',
-        offsetgroup=2,
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Variable Costs: %{y:,.0f} DKK<br>' +
-                     'New Customers: %{customdata:,.0f}<br>' +
-                     'Total Cost'
-                     '<extra></extra>',
-        customdata=revenue_df['New Customers']
-    ))
-    
-    fig_total.add_trace(go.Bar(
-        name='Base Platform Cost',
-        x=revenue_df['Month'],
-        y=fixed_platform_costs,
-        marker_color='#1111D6',
-        offsetgroup=2,
-        base=variable_costs_monthly,
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Base Platform Cost: %{y:,.0f} DKK<br>' +
-                     '<extra></extra>'
-    ))
-    
-    # Variable costs + base platform costs for overage base
-    variable_plus_platform = [variable_costs_monthly[i] + fixed_platform_costs[i] for i in range(len(months))]
-    
-    fig_total.add_trace(go.Bar(
-        name='Overage Fees',
-        x=revenue_df['Month'],
-        y=overage_costs,
-        marker_color="#7C99F1",
-        offsetgroup=2,
-        base=variable_plus_platform,
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Overage Fees: %{y:,.0f} DKK<br>' +
-                     '<extra></extra>'
-    ))
-    
-    # Add profit line
-    profit_monthly = [revenue_df['Total Monthly Revenue'].iloc[i] - total_costs_monthly[i] for i in range(len(months))]
-    fig_total.add_trace(go.Scatter(
-        name='Monthly Profit',
-        x=revenue_df['Month'],
-        y=profit_monthly,
-        mode='lines+markers',
-        marker_color='#FFD700',
-        line=dict(width=3),
-        yaxis='y2',
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Monthly Profit: %{y:,.0f} DKK<br>' +
-                     '<extra></extra>'
-    ))
-    
-    fig_total.update_layout(
-        title='Total: Revenue Stack (Subscription + Electricity + One-time) vs Cost Stack (Auto-Optimized Packages)',
-        xaxis_title='Month',
-        xaxis=dict(
-            tick0=1, 
-            dtick=2,  # Show x-axis ticks every 2 months
-            range=[0.5, forecast_months + 0.5]  # Set proper range from 1 to forecast_months
-        ),
-        yaxis_title='Amount (DKK)',
-        yaxis2=dict(
-            title='Profit (DKK)',
-            overlaying='y',
-            side='right'
-        ),
-        height=500,
-        barmode='group'  # Changed to group to show separate stacks
-    )
-    
-    st.plotly_chart(fig_total, use_container_width=True)
+    # Cumulative cash flow with the payback month
+    st.subheader("💵 Cumulative Cash Flow")
+    with span("plotly_chart.cash"):
+        st.plotly_chart(get_cash_figure(forecast_key(calculator, forecast_params), forecast, cash,
+                                        discount_rate, currency), use_container_width=True)
     
     # Customer Growth Chart (separate row)
     st.subheader("👥 Customer Growth Overview")
-    
-    fig_customers = go.Figure()
-    
-    fig_customers.add_trace(go.Scatter(
-        x=revenue_df['Month'],
-        y=revenue_df['Total Active Customers'],
-        mode='lines+markers',
-        name='Total Active Customers',
-        marker_color='#1f77b4',
-        line=dict(width=3),
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'Active Customers: %{y:,.0f}<br>' +
-                     'New Customers: %{customdata:,.0f}<br>' +
-                     '<extra></extra>',
-        customdata=revenue_df['New Customers']
-    ))
-    
-    fig_customers.add_trace(go.Bar(
-        x=revenue_df['Month'],
-        y=revenue_df['New Customers'],
-        name='New Customers',
-        marker_color="#168416",
-        opacity=0.5,
-        yaxis='y2',
-        hovertemplate='<b>Month %{x}</b><br>' +
-                     'New Customers: %{y:,.0f}<br>' +
-                     '<extra></extra>'
-    ))
-    
-    fig_customers.update_layout(
-        title='Customer Acquisition & Growth',
-        xaxis_title='Month',
-        xaxis=dict(
-            tick0=1, 
-            dtick=2,  # Show x-axis ticks every 2 months
-            range=[0.5, forecast_months + 0.5]  # Set proper range from 1 to forecast_months
-        ),
-        yaxis_title='Total Active Customers',
-        yaxis2=dict(
-            title='New Customers',
-            overlaying='y',
-            side='right'
-        ),
-        height=400
-    )
-    
-    st.plotly_chart(fig_customers, use_container_width=True)
+    with span("plotly_chart.customers"):
+        st.plotly_chart(figures['customers'], use_container_width=True)
+
+    # Monthly table download in the display currency; files are only generated on click
+    st.subheader("📥 Export Forecast")
+    formats = available_formats()
+    for column, fmt in zip(st.columns(len(formats)), formats):
+        with column:
+            st.download_button(
+                f"Download {FORMAT_LABELS[fmt]}",
+                data=lambda fmt=fmt: b"".join(export_forecasts([(None, forecast)], tariff.package_names, fmt)[2]),
+                file_name=f"forecast.{EXPORT_FORMATS[fmt][2]}",
+                mime=EXPORT_FORMATS[fmt][1]
+            )
+
+    # Branded PDF quote, rendered on the background pool so this session stays responsive
+    st.subheader("📄 PDF Quote")
+    customer = st.session_state.get("scenario_customer", "")
+    pdf_key = quote_key(calculator, forecast_params, currency, customer)
+    if st.button("Generate PDF quote"):
+        try:
+            get_quote_jobs().submit(pdf_key, lambda: build_quote_document(
+                calculator, forecast_params, forecast, currency, customer))
+        except QuoteBusyError as e:
+            st.warning(str(e))
+    show_pdf_quote_status(pdf_key)
 
     # Restart button
     st.markdown("---")
     if st.button("🔄 Start Over", type="secondary"):
-        st.session_state.selected_modules = []
-        st.session_state.selected_package = "Starter (<25 orders)"
+        st.session_state.module_mask = 0
+        st.session_state.package_id = 0
         st.rerun()
 
+def show_portfolio_summary(forecast, currency):
+    """Existing customers from the portfolio file, per segment (amounts already in currency)"""
+    active = forecast['portfolio_active_by_segment']
+    revenue = forecast['portfolio_subscription_by_segment'] + forecast['portfolio_electricity_by_segment']
+    st.caption(f"Starting with {active[:, 0].sum():,.0f} portfolio customers after month 1, "
+               f"{active[:, -1].sum():,.0f} left in month {active.shape[1]}")
+    with st.expander("👥 Portfolio by Segment", expanded=False):
+        st.dataframe({
+            "Segment": forecast['portfolio_segments'].tolist(),
+            "Active month 1": np.round(active[:, 0]).astype(int),
+            f"Active month {active.shape[1]}": np.round(active[:, -1]).astype(int),
+            "Subscription revenue": [format_money(v, currency) for v in forecast['portfolio_subscription_by_segment'].sum(axis=1)],
+            "Electricity revenue": [format_money(v, currency) for v in forecast['portfolio_electricity_by_segment'].sum(axis=1)],
+            "Total revenue": [format_money(v, currency) for v in revenue.sum(axis=1)]
+        }, hide_index=True)
+        chargers = forecast['portfolio_active_by_charger'][:, -1]
+        st.caption("Chargers in month {}: {}".format(
+            len(forecast['months']),
+            " · ".join(f"{name}: {count:,.0f}" for name, count in zip(forecast['portfolio_chargers'], chargers))))
+
+# Session widgets restored with a snapshot besides the module selection and forecast inputs
+SNAPSHOT_SETTINGS = ('display_currency', 'discount_codes', 'discount_rate', 'scenario_customer')
+
+def restore_session(tariff):
+    """Once per session: restore the snapshot named by the URL token, or start a new token.
+
+    A dropped websocket (sleeping laptop, network blip) starts a new session
+    on the same URL; its inputs come back from the snapshot, and the forecast
+    and charts from the shared cache under the same keys.
+    """
+    if 'snapshot_token' in st.session_state:
+        return
+    token = st.query_params.get("session")
+    snapshot = get_snapshot_store().load(token) if token else None
+    if snapshot is None or not apply_snapshot(snapshot, tariff):
+        token = new_token()
+        st.query_params["session"] = token
+    elif snapshot['tariff_version'] != tariff.version:
+        st.toast("Restored your previous session with the current prices")
+    else:
+        st.toast("Restored your previous session")
+    st.session_state.snapshot_token = token
+
+def apply_snapshot(snapshot, tariff):
+    """Put a snapshot's inputs into session state (before any widget exists); False if unusable"""
+    try:
+        inputs = forecast_inputs(tariff, **snapshot['inputs'])
+    except (TypeError, ValueError):
+        return False
+    st.session_state.module_mask = tariff.module_mask(
+        [module for module in snapshot['modules'] if module in tariff.modules])
+    if snapshot['package'] in tariff.package_sizes:
+        st.session_state.package_id = tariff.package_index(snapshot['package'])
+    st.session_state.scenario_inputs = inputs
+    settings = snapshot['settings']
+    if settings.get('display_currency') not in available_currencies():
+        settings.pop('display_currency', None)
+    for name in SNAPSHOT_SETTINGS:
+        if settings.get(name) is not None:
+            st.session_state[name] = settings[name]
+    return True
+
+def save_session_snapshot(calculator, forecast_params):
+    """Write this session's snapshot when it changed since the last write (cheap when it did not)"""
+    with span("session_snapshot"):
+        encoded = encode_snapshot({
+            'tariff_version': calculator.tariff.version,
+            'modules': calculator.selected_modules,
+            'package': calculator.selected_package,
+            'inputs': forecast_params,
+            'settings': {name: st.session_state.get(name) for name in SNAPSHOT_SETTINGS},
+            'forecast_key': forecast_key(calculator, forecast_params)
+        })
+        # Only the hash is kept in session state; the session lives in this process, so hash() is stable
+        if hash(encoded) != st.session_state.get('snapshot_hash'):
+            get_snapshot_store().save(st.session_state.snapshot_token, encoded)
+            st.session_state.snapshot_hash = hash(encoded)
+
+def show_pdf_quote_status(pdf_key):
+    status = get_quote_jobs().status(pdf_key)
+    if status['state'] == 'done':
+        st.download_button("Download PDF quote", data=status['pdf'], file_name="quote.pdf", mime="application/pdf")
+    elif status['state'] == 'failed':
+        st.error(f"PDF quote failed: {status['error']}")
+    elif status['state'] != 'none':
+        # Only this fragment reruns while polling, not the whole page
+        st.fragment(show_pdf_quote_progress, run_every=0.5)(pdf_key)
+
+def show_pdf_quote_progress(pdf_key):
+    status = get_quote_jobs().status(pdf_key)
+    if status['state'] in ('done', 'failed'):
+        st.rerun()  # Full rerun replaces the progress bar with the result and stops polling
+    text = "Waiting for a free PDF worker..." if status['state'] == 'queued' else "Rendering PDF quote..."
+    st.progress(status['progress'], text=text)
+
+def load_scenario(scenario_key):
+    """Restore a saved scenario into the session (runs as a button callback, before the rerun)"""
+    scenario = get_scenario_store().load(scenario_key)
+    if scenario is None:
+        return
+    tariff = st.session_state.tariff
+    try:
+        inputs = forecast_inputs(tariff, **scenario['inputs'])
+    except (TypeError, ValueError) as e:
+        # Saved under an older tariff or before stricter input checks; leave the session as it is
+        st.error(f"Scenario '{scenario['name']}' cannot be loaded with the current tariff: {e}")
+        return
+    # Reuse the stored arrays; ignored automatically when the prices have changed since saving
+    prime_forecast_cache(scenario)
+    st.session_state.module_mask = tariff.module_mask(
+        [module for module in scenario['modules'] if module in tariff.modules])
+    if scenario['package'] in tariff.package_sizes:
+        st.session_state.package_id = tariff.package_index(scenario['package'])
+    # Module checkboxes re-read their value from module_mask once their state is cleared
+    for module in tariff.modules:
+        st.session_state.pop(f"module_{module}", None)
+    st.session_state.scenario_inputs = inputs
+    st.session_state.discount_codes = ", ".join(scenario['discount_codes'])
+    st.session_state.scenario_generation = st.session_state.get('scenario_generation', 0) + 1
+
+def show_saved_scenarios(calculator, forecast_params):
+    store = get_scenario_store()
+    with st.sidebar.expander("💾 Saved Scenarios", expanded=False):
+        customer = st.text_input("Customer:", key="scenario_customer")
+        name = st.text_input("Scenario name:", key="scenario_name")
+        if st.button("Save scenario", disabled=not name):
+            # Saved in the base currency, exactly as cached
+            store.save(name, calculator, forecast_params, get_forecast(calculator, forecast_params), customer)
+            st.success(f"Saved '{name}'")
+        
+        saved = store.list(customer=customer or None, limit=500)
+        if saved:
+            st.markdown("---")
+            options = {row['scenario_key']: row for row in saved}
+            selected = st.selectbox(
+                "Saved scenarios:",
+                options=list(options),
+                format_func=lambda key: (f"{options[key]['name']} · {options[key]['customer'] or '-'}"
+                                         f" · {options[key]['created_at'][:10]}")
+            )
+            row = options[selected]
+            st.caption(f"{row['package']} · profit {format_money(row['profit'], BASE_CURRENCY)}")
+            if row['tariff_version'] != calculator.tariff.version:
+                st.caption("Saved with different prices; the forecast will be recalculated.")
+            st.button("Load scenario", on_click=load_scenario, args=(selected,))
+
 if __name__ == "__main__":
     main()
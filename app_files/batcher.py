@@ -0,0 +1,140 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from pricing_calculator import price_quotes
+from tariff import get_tariff
+
+
+class BatchMetrics:
+    """Counters and histograms for batch sizes and queueing delay"""
+
+    SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+    DELAY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+    def __init__(self):
+        self.batches = 0
+        self.quotes = 0
+        self.max_batch_size = 0
+        self.total_delay_ms = 0.0
+        self.size_counts = [0] * (len(self.SIZE_BUCKETS) + 1)
+        self.delay_counts = [0] * (len(self.DELAY_BUCKETS_MS) + 1)
+
+    def record_batch(self, size, delays_ms):
+        self.batches += 1
+        self.quotes += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.size_counts[int(np.searchsorted(self.SIZE_BUCKETS, size))] += 1
+        self.total_delay_ms += float(np.sum(delays_ms))
+        for bucket, count in enumerate(np.bincount(np.searchsorted(self.DELAY_BUCKETS_MS, delays_ms),
+                                                   minlength=len(self.delay_counts))):
+            self.delay_counts[bucket] += int(count)
+
+    def _histogram(self, bounds, counts):
+        labels = [f"<={bound}" for bound in bounds] + [f">{bounds[-1]}"]
+        return dict(zip(labels, counts))
+
+    def summary(self):
+        return {
+            'batches': self.batches,
+            'quotes': self.quotes,
+            'mean_batch_size': self.quotes / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'mean_queue_delay_ms': self.total_delay_ms / self.quotes if self.quotes else 0.0,
+            'batch_size_histogram': self._histogram(self.SIZE_BUCKETS, self.size_counts),
+            'queue_delay_ms_histogram': self._histogram(self.DELAY_BUCKETS_MS, self.delay_counts)
+        }
+
+
+class QuoteBatcher:
+    """Coalesce concurrent quote requests into vectorized price_quotes calls.
+
+    Requests arriving within max_wait_ms of the first pending one are priced
+    together; a batch is flushed early once it reaches max_batch_size. Each
+    request is priced against the tariff snapshot it was submitted with.
+    """
+
+    def __init__(self, max_batch_size=None, max_wait_ms=None):
+        self.max_batch_size = max_batch_size or int(os.environ.get("PRICING_BATCH_MAX_SIZE", "512"))
+        self.max_wait_ms = (max_wait_ms if max_wait_ms is not None
+                            else float(os.environ.get("PRICING_BATCH_MAX_WAIT_MS", "2")))
+        self.metrics = BatchMetrics()
+        self._pending = []
+        self._timer = None
+
+    async def quote(self, tariff, module_mask, package_index, orders, contract_month=1, active_discounts=None):
+        """Price one quote; resolves with the price_quotes fields for it as Python scalars.
+
+        active_discounts is tariff.discounts.active(codes) (default: the rules without a code).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((tariff, module_mask, package_index, orders, time.perf_counter(), future,
+                              contract_month, active_discounts))
+        if len(self._pending) >= self.max_batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self.flush)
+        return await future
+
+    def flush(self):
+        """Price everything pending now (called by the timer or when the batch is full)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        started = time.perf_counter()
+        delays_ms = np.array([(started - item[4]) * 1000 for item in pending])
+        self.metrics.record_batch(len(pending), delays_ms)
+
+        # Requests submitted against different tariff snapshots are priced separately
+        groups = {}
+        for item in pending:
+            groups.setdefault(item[0].version, []).append(item)
+        for items in groups.values():
+            tariff = items[0][0]
+            try:
+                active = None
+                if any(item[7] is not None for item in items):
+                    default = tariff.discounts.active()
+                    active = np.array([default if item[7] is None else item[7] for item in items], dtype=bool)
+                result = price_quotes(tariff,
+                                      [item[1] for item in items],
+                                      [item[2] for item in items],
+                                      [item[3] for item in items],
+                                      [item[6] for item in items],
+                                      active)
+            except Exception as e:
+                for item in items:
+                    if not item[5].done():
+                        item[5].set_exception(e)
+                continue
+            columns = {name: values.tolist() for name, values in result.items()}
+            for i, item in enumerate(items):
+                if not item[5].done():
+                    item[5].set_result({name: values[i] for name, values in columns.items()})
+
+
+_default_batcher = None
+
+
+def get_quote_batcher():
+    """Process-wide batcher used by the API"""
+    global _default_batcher
+    if _default_batcher is None:
+        _default_batcher = QuoteBatcher()
+    return _default_batcher
+
+
+async def batched_quote(module_names, package_name, orders, tariff=None, contract_month=1, discount_codes=()):
+    """Convenience wrapper: price one quote by names through the shared batcher"""
+    tariff = tariff or get_tariff()
+    package_index = -1 if package_name is None else tariff.package_index(package_name)
+    active = tariff.discounts.active(discount_codes) if discount_codes else None
+    return await get_quote_batcher().quote(tariff, tariff.module_mask(module_names), package_index, orders,
+                                           contract_month, active)
@@ -0,0 +1,101 @@
+"""Requests/sec and latency percentiles for the pricing API.
+
+Run from app_files/:
+    python -m benchmarks.api_bench                      # in-process ASGI calls
+    python -m benchmarks.api_bench --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from api import LocalClient
+from batcher import get_quote_batcher
+from tariff import get_tariff
+
+
+def random_quote(tariff, rng):
+    optional = list(tariff.module_names[1:])
+    modules = [tariff.module_names[0]] + rng.sample(optional, rng.randint(0, len(optional)))
+    return {'modules': modules, 'package': rng.choice(tariff.package_names), 'orders': rng.randint(0, 600)}
+
+
+def scenarios(tariff, rng):
+    return {
+        'quote': ('/quote', lambda: random_quote(tariff, rng)),
+        'batch_1000': ('/quotes/batch', lambda: {'quotes': [random_quote(tariff, rng) for _ in range(1000)]}),
+        'batch_10000': ('/quotes/batch', lambda: {'quotes': [random_quote(tariff, rng) for _ in range(10000)]}),
+    }
+
+
+def summarize(name, latencies, elapsed, quotes_per_request):
+    latencies = np.array(latencies) * 1000
+    requests = len(latencies)
+    print(f"{name:<12} {requests / elapsed:>9.1f} req/s {requests * quotes_per_request / elapsed:>12.0f} quotes/s "
+          f"p50 {np.percentile(latencies, 50):7.2f} ms  p99 {np.percentile(latencies, 99):7.2f} ms")
+
+
+async def run_local(path, payloads, concurrency):
+    client = LocalClient()
+    latencies = []
+    queue = list(payloads)
+
+    async def worker():
+        while queue:
+            payload = queue.pop()
+            started = time.perf_counter()
+            status, _ = await client.request('POST', path, payload)
+            assert status == 200, status
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+def run_http(url, path, payloads, concurrency):
+    def call(payload):
+        request = urllib.request.Request(url + path, data=json.dumps(payload).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        started = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(call, payloads))
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="Benchmark a running server instead of in-process calls")
+    parser.add_argument('--requests', type=int, default=2000, help="Requests per single-quote scenario")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for name, (path, make_payload) in scenarios(get_tariff(), rng).items():
+        count = args.requests if name == 'quote' else max(args.requests // 100, 10)
+        payloads = [make_payload() for _ in range(count)]
+        if args.url:
+            latencies, elapsed = run_http(args.url.rstrip('/'), path, payloads, args.concurrency)
+        else:
+            latencies, elapsed = asyncio.run(run_local(path, payloads, args.concurrency))
+        summarize(name, latencies, elapsed, len(payloads[0].get('quotes', [None])))
+
+    if not args.url:
+        stats = get_quote_batcher().metrics.summary()
+        print(f"/quote batching: {stats['batches']} batches, mean size {stats['mean_batch_size']:.1f}, "
+              f"mean queue delay {stats['mean_queue_delay_ms']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
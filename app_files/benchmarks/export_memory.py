@@ -0,0 +1,64 @@
+"""Peak memory of a streaming forecast export against a ceiling.
+
+Exports a lazily computed sweep (scenarios x forecast months rows) and
+discards the bytes, so the only memory growth is the exporter's own. Exits
+with status 1 when peak RSS grows by more than --ceiling-mb.
+
+Run from app_files/:
+    python -m benchmarks.export_memory --format parquet --scenarios 50000
+"""
+import argparse
+import resource
+import sys
+import time
+
+import numpy as np
+
+from exports import DEFAULT_CHUNK_ROWS, export_forecasts
+from forecast import forecast_inputs, sweep_forecasts
+from pricing_calculator import PricingCalculator
+from tariff import get_tariff
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_export(fmt, scenarios, months, chunk_rows):
+    tariff = get_tariff()
+    calculator = PricingCalculator([tariff.module_names[0]], tariff.package_names[0], tariff)
+    sweep = sweep_forecasts(calculator, forecast_inputs(forecast_months=months),
+                            'monthly_growth_rate', np.linspace(0.0, 0.1, scenarios))
+    _, _, chunks = export_forecasts(sweep, tariff.package_names, fmt, chunk_rows)
+    return sum(len(chunk) for chunk in chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", default="csv", choices=("csv", "parquet", "xlsx"))
+    parser.add_argument("--scenarios", type=int, default=50_000)
+    parser.add_argument("--months", type=int, default=60)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--ceiling-mb", type=float, default=128.0)
+    args = parser.parse_args()
+
+    # Warm up imports and writer setup so the baseline only excludes the export itself
+    run_export(args.format, 2 * args.chunk_rows // args.months + 1, args.months, args.chunk_rows)
+    baseline = peak_rss_mb()
+
+    started = time.perf_counter()
+    size = run_export(args.format, args.scenarios, args.months, args.chunk_rows)
+    elapsed = time.perf_counter() - started
+    growth = peak_rss_mb() - baseline
+
+    rows = args.scenarios * args.months
+    print(f"{args.format}: {rows:,} rows, {size / 1e6:,.1f} MB in {elapsed:.2f}s "
+          f"({rows / elapsed:,.0f} rows/s); peak RSS {peak_rss_mb():.0f} MB, "
+          f"+{growth:.1f} MB over baseline (ceiling {args.ceiling_mb:.0f} MB)")
+    return 0 if growth <= args.ceiling_mb else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""Concurrent-session load test of the Streamlit app.
+
+Starts the app with serve.py on a free local port (or targets --url) and
+drives simulated sales sessions over Streamlit's websocket protocol, exactly
+like browser tabs: each session opens the page and then runs a random
+interaction script (toggle modules, change the package, edit forecast inputs,
+switch display currency), sending the widget states and waiting for the
+rerun to finish. All sessions of a concurrency level run at once.
+
+For each level it reports rerun latency percentiles, throughput, server CPU
+time per rerun and server memory growth per open session (CPU and memory are
+read from /proc, so they need a server started by the harness, or --pid, on
+Linux). Exits with status 1 when a rerun fails or p95 latency or memory per
+session exceed the given limits, so deploy.sh can gate a freshly built image.
+
+Streamlit's in-process AppTest is not used: it swaps process-wide runtime
+state on every run, so concurrent AppTests interfere with each other.
+
+Run from app_files/:
+    python -m benchmarks.load_test --sessions 1,4,8,16 --steps 20
+    python -m benchmarks.load_test --sessions 8 --max-p95-ms 1500 --max-session-mb 40
+    python -m benchmarks.load_test --url http://127.0.0.1:8501 --pid 1234
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Values a sales user might plausibly type, per forecast input widget key (without its generation suffix)
+INPUT_CHOICES = {
+    'customers_month_1': (5, 10, 20, 50, 100, 250),
+    'monthly_growth_rate': (0.0, 2.0, 5.0, 10.0, 15.0),
+    'forecast_months': (12, 24, 36, 48, 60),
+    'monthly_subscription_fee': (29.0, 39.0, 49.0, 79.0),
+    'existing_customers': (0, 100, 500, 2000),
+    'customer_retention_rate': (90.0, 95.0, 98.0, 100.0),
+}
+
+# Relative frequency of each interaction in a session script
+ACTIONS = (('edit_input', 5), ('toggle_module', 3), ('change_package', 1), ('change_currency', 1))
+
+WIDGET_TYPES = ('checkbox', 'number_input', 'selectbox')
+
+# ScriptFinishedStatus: the run stopped early because another rerun was requested
+FINISHED_EARLY_FOR_RERUN = 2
+
+
+class RerunError(RuntimeError):
+    """A rerun raised an exception in the app or never finished"""
+
+
+class Session:
+    """One simulated browser tab: a websocket plus the widget states it sends"""
+
+    def __init__(self, url, timeout):
+        self.url = url.replace('http', 'ws', 1).rstrip('/') + "/_stcore/stream"
+        self.timeout = timeout
+        self.widgets = {}  # id -> (type, key, label, proto) as rendered by the last rerun
+        self.states = {}  # id -> WidgetState set by this session
+
+    async def connect(self):
+        import websockets
+
+        self.socket = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+
+    async def close(self):
+        await self.socket.close()
+
+    async def rerun(self):
+        """Send the current widget states and wait for the rerun to finish"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.widget_states.widgets.extend(self.states.values())
+        await self.socket.send(message.SerializeToString())
+
+        widgets = {}
+        while True:
+            data = await asyncio.wait_for(self.socket.recv(), self.timeout)
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof('type')
+            if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'exception':
+                    raise RerunError(f"{element.exception.type}: {element.exception.message}")
+                if element_type in WIDGET_TYPES:
+                    proto = getattr(element, element_type)
+                    # Widget ids look like "$$ID-<hash>-<user key or None>"
+                    key = proto.id.split('-', 2)[2] if proto.id.startswith('$$ID-') else None
+                    widgets[proto.id] = (element_type, key, proto.label, proto)
+            elif kind == 'script_finished' and forward.script_finished != FINISHED_EARLY_FOR_RERUN:
+                break
+        self.widgets = widgets
+        # Like the browser, only send states for widgets that are still on the page
+        self.states = {widget_id: state for widget_id, state in self.states.items() if widget_id in widgets}
+
+    def find(self, element_type, key=None, label=None):
+        return [(widget_id, proto) for widget_id, (kind, widget_key, widget_label, proto) in self.widgets.items()
+                if kind == element_type and (key is None or key(widget_key or ''))
+                and (label is None or widget_label == label)]
+
+    def set_state(self, widget_id, **value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        self.states[widget_id] = WidgetState(id=widget_id, **value)
+
+    def interact(self, action, rng):
+        """Change one widget as a user would; the next rerun() sends it"""
+        if action == 'toggle_module':
+            boxes = [(widget_id, proto) for widget_id, proto in self.find('checkbox', key=lambda k: k.startswith('module_'))
+                     if not proto.disabled]
+            widget_id, proto = rng.choice(boxes)
+            current = self.states[widget_id].bool_value if widget_id in self.states else proto.default
+            self.set_state(widget_id, bool_value=not current)
+        elif action in ('change_package', 'change_currency'):
+            label = "Choose your package size:" if action == 'change_package' else "Display currency:"
+            widget_id, proto = self.find('selectbox', label=label)[0]
+            self.set_state(widget_id, string_value=rng.choice(list(proto.options)))
+        else:
+            name = rng.choice(list(INPUT_CHOICES))
+            widget_id, _ = self.find('number_input', key=lambda k: k.rsplit('_', 1)[0] == name)[0]
+            self.set_state(widget_id, double_value=rng.choice(INPUT_CHOICES[name]))
+
+
+async def run_session(index, url, steps, seed, think, timeout, latencies, errors, opened, finish):
+    rng = random.Random(seed * 10_000 + index)
+    names = [name for name, _ in ACTIONS]
+    weights = [weight for _, weight in ACTIONS]
+    session = Session(url, timeout)
+    try:
+        await session.connect()
+        for step in range(steps + 1):
+            if step:
+                session.interact(rng.choices(names, weights)[0], rng)
+                if think:
+                    await asyncio.sleep(rng.uniform(0, 2 * think))
+            started = time.perf_counter()
+            await session.rerun()
+            latencies.append(time.perf_counter() - started)
+    except Exception as error:  # Reported with the level's results instead of stopping the other sessions
+        errors.append(f"session {index}: {error!r}")
+    finally:
+        # Stay connected until every session is done, so memory is measured with all of them open
+        opened.append(session)
+        await finish.wait()
+        if hasattr(session, 'socket'):
+            await session.close()
+
+
+def server_usage(pid):
+    """(CPU seconds, RSS MB) of a local process from /proc, or (None, None)"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, TypeError):
+        return None, None
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')  # utime + stime
+    return cpu, resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+
+
+async def run_level(url, pid, concurrency, steps, seed, think, timeout):
+    latencies = []
+    errors = []
+    opened = []
+    finish = asyncio.Event()
+    cpu_before, rss_before = server_usage(pid)
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(run_session(i, url, steps, seed, think, timeout, latencies, errors, opened, finish))
+             for i in range(concurrency)]
+    while len(opened) < concurrency:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    cpu_after, rss_after = server_usage(pid)
+    finish.set()
+    await asyncio.gather(*tasks)
+
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    result = {
+        'sessions': concurrency,
+        'reruns': len(latencies),
+        'reruns_per_second': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p90_ms': float(np.percentile(latencies_ms, 90)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'max_ms': float(latencies_ms.max()),
+        'cpu_ms_per_rerun': None,
+        'rss_mb': rss_after,
+        'mb_per_session': None,
+        'errors': errors,
+    }
+    if cpu_before is not None and cpu_after is not None:
+        result['cpu_ms_per_rerun'] = (cpu_after - cpu_before) * 1000 / max(len(latencies), 1)
+        result['mb_per_session'] = max(rss_after - rss_before, 0.0) / concurrency
+    return result
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(startup_timeout=120):
+    """serve.py (warmup included) on a free local port; returns (process, url)"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", f"--server.port={port}", "--server.address=127.0.0.1",
+         "--server.headless=true", "--browser.gatherUsageStats=false"],
+        cwd=APP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(url + "/_stcore/health", timeout=1):
+                return process, url
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"serve.py did not become healthy within {startup_timeout}s")
+
+
+def format_optional(value, width, precision=1):
+    return f"{'-':>{width}}" if value is None else f"{value:>{width}.{precision}f}"
+
+
+async def run(args, url, pid):
+    levels = [int(level) for level in args.sessions.split(',')]
+    # One session first so the report does not start with the server's cold start
+    await run_level(url, pid, 1, 0, args.seed, 0, args.timeout)
+
+    print(f"{'sessions':>8} {'reruns':>7} {'rerun/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'cpu ms/rerun':>12} {'MB/session':>10} {'RSS MB':>7}")
+    results = []
+    failures = []
+    for concurrency in levels:
+        result = await run_level(url, pid, concurrency, args.steps, args.seed, args.think_ms / 1000, args.timeout)
+        results.append(result)
+        print(f"{concurrency:>8} {result['reruns']:>7} {result['reruns_per_second']:>8.1f} {result['p50_ms']:>8.1f} "
+              f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['max_ms']:>8.1f} "
+              f"{format_optional(result['cpu_ms_per_rerun'], 12)} {format_optional(result['mb_per_session'], 10)} "
+              f"{format_optional(result['rss_mb'], 7, 0)}")
+        for error in result['errors']:
+            failures.append(error)
+            print(f"  error: {error}")
+        if args.max_p95_ms is not None and result['p95_ms'] > args.max_p95_ms:
+            failures.append(f"{concurrency} sessions: p95 {result['p95_ms']:.0f} ms > {args.max_p95_ms:.0f} ms")
+        if (args.max_session_mb is not None and result['mb_per_session'] is not None
+                and result['mb_per_session'] > args.max_session_mb):
+            failures.append(f"{concurrency} sessions: {result['mb_per_session']:.1f} MB/session "
+                            f"> {args.max_session_mb:.1f} MB")
+    return results, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--steps", type=int, default=15, help="Interactions per session after opening the page")
+    parser.add_argument("--think-ms", type=float, default=0.0,
+                        help="Mean pause between interactions (0 = back to back, a stress test)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a single rerun fails")
+    parser.add_argument("--url", help="Target a running app instead of starting serve.py")
+    parser.add_argument("--pid", type=int, help="Server process id for CPU and memory figures with --url")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail when any level's p95 rerun latency exceeds this")
+    parser.add_argument("--max-session-mb", type=float, help="Fail when server memory per session exceeds this")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        url, pid = args.url, args.pid
+    else:
+        process, url = start_server()
+        pid = process.pid
+    try:
+        results, failures = asyncio.run(run(args, url, pid))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'levels': results, 'steps': args.steps, 'think_ms': args.think_ms, 'seed': args.seed},
+                      f, indent=1)
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Memory held per Streamlit session.
+
+Opens --sessions sessions of the app one after another with Streamlit's
+AppTest (sequential, so its process-wide runtime swapping is harmless), walks
+each through a few interactions and keeps them all open. It then walks every
+session's state object graph: objects reachable from only one session are
+that session's private memory, objects reachable from several (the pinned
+tariff snapshot, interned strings, small ints) are shared and counted once.
+Functions, classes and modules are not followed.
+
+Reports private bytes per session with the largest session state keys, and
+the shared bytes. This is the app's own per-session footprint; Streamlit's
+per-connection overhead (message queues, the forward message cache) comes on
+top and is what benchmarks.load_test measures as server RSS per session.
+
+Run from app_files/:
+    python -m benchmarks.session_memory --sessions 10
+    python -m benchmarks.session_memory --max-session-kb 64
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import types
+
+import numpy as np
+
+from benchmarks.load_test import INPUT_CHOICES
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Not followed: code and type objects live once per process however many sessions refer to them
+SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+              types.CodeType, types.FrameType)
+
+
+def reachable(root):
+    """{id: size} of every object reachable from root (excluding SKIP_TYPES)"""
+    sizes = {}
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in sizes or isinstance(obj, SKIP_TYPES):
+            continue
+        sizes[id(obj)] = sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return sizes
+
+
+def open_session(index):
+    """Open the page and interact with it like a sales user would; returns the AppTest"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = np.random.default_rng(index)
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.run()
+    modules = [box for box in at.checkbox if (box.key or '').startswith("module_") and not box.disabled]
+    for box in rng.choice(modules, size=min(3, len(modules)), replace=False):
+        box.check()
+    package = next(box for box in at.selectbox if box.label.startswith("Choose your package"))
+    package.select(package.options[int(rng.integers(len(package.options)))])
+    at.run()
+    for box in at.number_input:
+        name = (box.key or '').rsplit('_', 1)[0]
+        if name in INPUT_CHOICES:
+            box.set_value(INPUT_CHOICES[name][int(rng.integers(len(INPUT_CHOICES[name])))])
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"Session {index} failed: {at.exception[0].message}")
+    return at
+
+
+def measure(sessions):
+    states = [at.session_state._state._state for at in sessions]
+    graphs = [reachable(state) for state in states]
+    owners = {}
+    for graph in graphs:
+        for object_id in graph:
+            owners[object_id] = owners.get(object_id, 0) + 1
+    shared = {object_id: size for graph in graphs for object_id, size in graph.items() if owners[object_id] > 1}
+
+    private = []
+    for state, graph in zip(states, graphs):
+        keys = {}
+        for key, value in state.filtered_state.items():
+            keys[key] = sum(size for object_id, size in reachable(value).items() if owners.get(object_id) == 1)
+        private.append({
+            'bytes': sum(size for object_id, size in graph.items() if owners[object_id] == 1),
+            'keys': keys,
+        })
+    return private, sum(shared.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5, help="Sessions to open (at least 2)")
+    parser.add_argument("--top", type=int, default=8, help="Largest session state keys to list")
+    parser.add_argument("--max-session-kb", type=float, help="Fail when a session holds more private memory")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+    if args.sessions < 2:
+        parser.error("--sessions must be at least 2 to tell private from shared memory")
+
+    sessions = [open_session(index) for index in range(args.sessions)]
+    private, shared_bytes = measure(sessions)
+
+    per_session = np.array([session['bytes'] for session in private])
+    print(f"{args.sessions} sessions: private memory per session "
+          f"mean {per_session.mean() / 1024:,.1f} KB, max {per_session.max() / 1024:,.1f} KB; "
+          f"shared between sessions {shared_bytes / 1024:,.1f} KB")
+    totals = {}
+    for session in private:
+        for key, size in session['keys'].items():
+            totals[key] = totals.get(key, 0) + size
+    print(f"\nLargest session state keys (mean private bytes):")
+    for key, size in sorted(totals.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {key:<40} {size / args.sessions:>10,.0f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'sessions': private, 'shared_bytes': shared_bytes}, f, indent=1)
+    if args.max_session_kb is not None and per_session.max() > args.max_session_kb * 1024:
+        print(f"\nFAILED: a session holds {per_session.max() / 1024:,.1f} KB "
+              f"(limit {args.max_session_kb:,.1f} KB)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+"""Benchmark suite for the calculator, forecast and chart builders.
+
+Each benchmark runs over a parameter grid (asv style): forecast horizon
+(12-600 months), number of modules (8-64, synthetic tariffs), number of
+packages (4-32) and batch size (order volumes, quotes or sweep scenarios).
+Every case is timed in repeats of enough calls to last --min-time seconds;
+the median and the minimum time per call are reported and stored.
+
+Results are saved as JSON baselines in benchmarks/baselines/ and compared
+against one with a relative regression threshold on the minimum (the least
+noisy statistic on a shared machine); the exit status is 1 when a case got
+slower than the threshold allows. Baselines are only comparable on
+the machine (and Python/NumPy versions) they were recorded with, so record
+one from the commit you start from before changing code.
+
+Run from app_files/:
+    python -m benchmarks.suite --save main             # record a baseline
+    python -m benchmarks.suite --compare main          # after a change
+    python -m benchmarks.suite --filter forecast --quick
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+HORIZONS = (12, 60, 240, 600)
+MODULE_COUNTS = (8, 16, 64)
+PACKAGE_COUNTS = (4, 8, 32)
+ORDER_BATCHES = (1_000, 100_000)
+QUOTE_BATCHES = (1_000, 100_000)
+SWEEP_BATCHES = (10, 100, 1_000)
+METRIC_BATCHES = (1_000, 10_000)
+PORTFOLIO_SIZES = (100_000, 1_000_000)
+OVERAGE_BANDS = (3, 10)
+
+# --quick keeps the smallest and largest value of every parameter
+QUICK = {'horizon': (12, 600), 'modules': (8, 64), 'packages': (4, 32),
+         'orders': (1_000,), 'quotes': (1_000,), 'scenarios': (10, 100), 'customers': (100_000,)}
+
+
+def synthetic_tariff(n_modules, n_packages, n_bands=1):
+    """CompiledTariff with n_modules modules and n_packages packages of growing size.
+
+    With n_bands > 1 every package has graduated overage bands of doubling
+    width (10, 20, 40... orders) whose fee drops 10% per band.
+    """
+    from pricing_config import EXTERNAL_FEES
+    from tariff import compile_tariff
+
+    rng = np.random.default_rng(n_modules * 1000 + n_packages)
+    limits = np.round(25 * 1.6 ** np.arange(n_packages)).astype(int)
+    fees = np.round(np.linspace(500, 100, n_packages))
+    package_sizes = {f"Package {i + 1} (<{limit} orders)": {'order_limit': int(limit), 'overage_fee': float(fee)}
+                     for i, (limit, fee) in enumerate(zip(limits, fees))}
+    if n_bands > 1:
+        for package, fee in zip(package_sizes.values(), fees):
+            ends = 10 * (2 ** np.arange(1, n_bands) - 1)
+            bands = [{'up_to': int(end), 'fee': float(fee * 0.9 ** k)} for k, end in enumerate(ends)]
+            package['overage_bands'] = bands + [{'fee': float(fee * 0.9 ** (n_bands - 1))}]
+    # Module prices grow with package size, more slowly than the included orders
+    growth = 1.35 ** np.arange(n_packages)
+    modules = {}
+    for i in range(n_modules):
+        name = "System Access" if i == 0 else f"Module {i:02d}"
+        base = 7000 if i == 0 else rng.integers(5, 40) * 100
+        modules[name] = {'description': f"Synthetic module {i}",
+                         'prices': {package: float(np.round(base * factor, -1))
+                                    for package, factor in zip(package_sizes, growth)}}
+    return compile_tariff(package_sizes, modules, EXTERNAL_FEES, source=f"synthetic {n_modules}x{n_packages}")
+
+
+_tariffs = {}
+
+
+def tariff_for(params):
+    shape = (params['modules'], params['packages'], params.get('bands', 1))
+    if shape not in _tariffs:
+        _tariffs[shape] = synthetic_tariff(*shape)
+    return _tariffs[shape]
+
+
+def calculator_for(params):
+    """Calculator with every other module selected, on the middle package"""
+    from pricing_calculator import PricingCalculator
+
+    tariff = tariff_for(params)
+    modules = list(tariff.module_names[::2])
+    return PricingCalculator(modules, tariff.package_names[len(tariff.package_names) // 2], tariff)
+
+
+def forecast_params(horizon, resolution='monthly'):
+    from config import SEASONALITY_PRESETS
+    from forecast import forecast_inputs
+
+    # Capped growth keeps long horizons within realistic order volumes
+    seasonality = SEASONALITY_PRESETS['Installer calendar'] if resolution == 'daily' else {}
+    return forecast_inputs(forecast_months=horizon, customers_month_1=20, monthly_growth_rate=0.05,
+                           growth_cap=400, existing_customers=100, customer_retention_rate=0.98,
+                           kwh_addon_price=0.5, resolution=resolution, **seasonality)
+
+
+# Each setup(params) returns the zero-argument callable that is timed
+
+
+def setup_monthly_cost(params):
+    calculator = calculator_for(params)
+    return lambda: calculator.calculate_monthly_cost(180)
+
+
+def setup_find_optimal_package(params):
+    calculator = calculator_for(params)
+    return lambda: calculator.find_optimal_package(180)
+
+
+def setup_should_upgrade(params):
+    calculator = calculator_for(params)
+    return lambda: calculator.should_upgrade_package(180)
+
+
+def setup_find_optimal_packages(params):
+    calculator = calculator_for(params)
+    orders = np.random.default_rng(0).integers(0, 2000, params['orders'])
+    return lambda: calculator.find_optimal_packages(orders)
+
+
+def setup_price_quotes(params):
+    from pricing_calculator import price_quotes
+
+    tariff = tariff_for(params)
+    rng = np.random.default_rng(0)
+    count = params['quotes']
+    n_modules = len(tariff.module_names)
+    bits = rng.integers(0, 2, (count, n_modules), dtype=np.uint64) << np.arange(n_modules, dtype=np.uint64)
+    masks = np.bitwise_or.reduce(bits, axis=1) | np.uint64(1)
+    packages = rng.integers(-1, len(tariff.package_names), count)
+    orders = rng.integers(0, 2000, count)
+    return lambda: price_quotes(tariff, masks, packages, orders)
+
+
+def setup_forecast(params):
+    from cache import shared_cache
+    from forecast import run_forecast
+
+    calculator = calculator_for(params)
+    inputs = forecast_params(params['horizon'], params.get('resolution', 'monthly'))
+
+    def forecast_cold():
+        # A new configuration: the optimal-package table is rebuilt too
+        shared_cache.clear()
+        return run_forecast(calculator, inputs)
+    return forecast_cold
+
+
+def setup_sweep(params):
+    from forecast import sweep_forecasts
+
+    calculator = calculator_for(params)
+    inputs = forecast_params(params['horizon'])
+    values = np.linspace(0.0, 0.1, params['scenarios'])
+    return lambda: sum(1 for _ in sweep_forecasts(calculator, inputs, 'monthly_growth_rate', values))
+
+
+def setup_cash_metrics(params):
+    from finance import cash_flow_metrics
+
+    # Monte Carlo style profit paths: an up-front loss that turns into noisy, growing profit
+    rng = np.random.default_rng(0)
+    months = np.arange(1, params['horizon'] + 1)
+    profits = rng.normal(1.0, 2.0, (params['scenarios'], len(months))) * months * 100
+    profits[:, :6] -= 50_000
+    return lambda: cash_flow_metrics(profits, 0.1)
+
+
+def setup_snapshot_write(params):
+    import tempfile
+    from snapshots import SnapshotStore, encode_snapshot, new_token
+
+    store = SnapshotStore(os.path.join(tempfile.mkdtemp(), "snapshots.db"))
+    token = new_token()
+    state = {'tariff_version': 'benchmark', 'modules': ['System Access'], 'package': 'Starter',
+             'inputs': forecast_params(60), 'settings': {'display_currency': 'DKK'}, 'forecast_key': 'forecast:0'}
+    step = itertools.count()
+
+    def write():
+        # What a rerun with a changed input costs: encode and upsert
+        state['settings']['discount_rate'] = next(step)
+        store.save(token, encode_snapshot(state))
+    return write
+
+
+def setup_portfolio(params):
+    import tempfile
+    from portfolio import Portfolio, simulate_portfolio, write_synthetic_portfolio
+
+    path = os.path.join(tempfile.mkdtemp(), "portfolio.parquet")
+    write_synthetic_portfolio(path, params['customers'])
+    portfolio = Portfolio(path)
+    return lambda: simulate_portfolio(portfolio, params['horizon'], default_kwh=400.0, default_churn=0.01)
+
+
+def setup_chart(name):
+    def setup(params):
+        from charts import CHART_BUILDERS
+        from forecast import run_forecast
+
+        forecast = run_forecast(calculator_for(params), forecast_params(params['horizon']))
+        builder = CHART_BUILDERS[name]
+        return lambda: builder(forecast)
+    return setup
+
+
+SHAPE = {'modules': MODULE_COUNTS, 'packages': PACKAGE_COUNTS}
+DEFAULT_SHAPE = {'modules': (16,), 'packages': (8,)}
+
+# name: (setup, parameter grid)
+BENCHMARKS = {
+    'calculator.calculate_monthly_cost': (setup_monthly_cost, SHAPE),
+    'calculator.find_optimal_package': (setup_find_optimal_package, SHAPE),
+    'calculator.should_upgrade_package': (setup_should_upgrade, SHAPE),
+    'calculator.find_optimal_packages': (setup_find_optimal_packages, dict(SHAPE, orders=ORDER_BATCHES)),
+    'calculator.price_quotes': (setup_price_quotes, dict(SHAPE, quotes=QUOTE_BATCHES)),
+    'calculator.price_quotes_banded': (setup_price_quotes,
+                                       dict(DEFAULT_SHAPE, bands=OVERAGE_BANDS, quotes=QUOTE_BATCHES)),
+    'forecast.run_forecast': (setup_forecast, dict(SHAPE, horizon=HORIZONS)),
+    'forecast.run_forecast_daily': (setup_forecast, dict(DEFAULT_SHAPE, resolution=('daily',), horizon=HORIZONS)),
+    'forecast.sweep': (setup_sweep, dict(DEFAULT_SHAPE, horizon=(60,), scenarios=SWEEP_BATCHES)),
+    'session.snapshot_write': (setup_snapshot_write, {}),
+    'finance.cash_flow_metrics': (setup_cash_metrics, dict(horizon=(60, 240), scenarios=METRIC_BATCHES)),
+    'portfolio.simulate': (setup_portfolio, dict(horizon=(36,), customers=PORTFOLIO_SIZES)),
+}
+for _chart in ('fixed', 'variable', 'total', 'customers'):
+    BENCHMARKS[f'charts.{_chart}'] = (setup_chart(_chart), dict(DEFAULT_SHAPE, horizon=HORIZONS))
+
+
+def cases(quick=False, pattern=None):
+    """(case id, setup, params) for every benchmark and parameter combination"""
+    for name, (setup, grid) in BENCHMARKS.items():
+        names = list(grid)
+        values = [grid[param] for param in names]
+        if quick:
+            values = [[v for v in options if v in QUICK.get(param, options)] or options[:1]
+                      for param, options in zip(names, values)]
+        for combination in itertools.product(*values):
+            params = dict(zip(names, combination))
+            case_id = f"{name}[{','.join(f'{k}={v}' for k, v in params.items())}]"
+            if pattern is None or re.search(pattern, case_id):
+                yield case_id, setup, params
+
+
+def time_case(func, min_time, repeats):
+    """Median and min seconds per call over repeats of enough calls to take min_time"""
+    func()  # Warm-up (imports, caches, allocator)
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+    timings = [elapsed / number]
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return {'median': statistics.median(timings), 'min': min(timings), 'number': number, 'repeats': repeats}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+    }
+
+
+def format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:7.2f} {unit}"
+    return f"{seconds / 1e-9:7.1f} ns"
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def compare(results, baseline, threshold):
+    """Print changes against a baseline; returns the ids of regressed cases"""
+    regressions = []
+    for case_id, result in results.items():
+        previous = baseline.get(case_id)
+        if previous is None:
+            continue
+        ratio = result['min'] / previous['min']
+        if ratio > 1 + threshold:
+            regressions.append(case_id)
+            marker = "REGRESSION"
+        elif ratio < 1 / (1 + threshold):
+            marker = "faster"
+        else:
+            continue
+        print(f"{marker:<10} {case_id}: {format_seconds(previous['min']).strip()} -> "
+              f"{format_seconds(result['min']).strip()} ({ratio:.2f}x)")
+    missing = sorted(set(baseline) - set(results))
+    if missing:
+        print(f"{len(missing)} baseline cases were not run")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="Only run cases whose id matches this regular expression")
+    parser.add_argument("--quick", action="store_true", help="Only the extremes of each parameter")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Seconds per timing repeat")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--save", metavar="NAME", help="Store the results as benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare with a stored baseline (name or .json path)")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Relative slowdown counted as a regression (default 0.25 = 25%%)")
+    parser.add_argument("--list", action="store_true", help="List the case ids and exit")
+    args = parser.parse_args()
+
+    from cache import shared_cache
+
+    # Time the computations themselves, never a (possibly warm) on-disk shared cache
+    shared_cache.backend = None
+
+    selected = list(cases(args.quick, args.filter))
+    if args.list:
+        print("\n".join(case_id for case_id, _, _ in selected))
+        return 0
+
+    results = {}
+    width = max((len(case_id) for case_id, _, _ in selected), default=0)
+    for case_id, setup, params in selected:
+        result = time_case(setup(params), args.min_time, args.repeats)
+        results[case_id] = result
+        print(f"{case_id:<{width}}  {format_seconds(result['median'])}  (min {format_seconds(result['min']).strip()})")
+
+    status = 0
+    if args.compare:
+        with open(baseline_path(args.compare), encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} ({baseline['environment'].get('commit')}, "
+              f"{baseline['environment'].get('recorded_at')}), threshold {args.threshold:.0%}:")
+        regressions = compare(results, baseline['results'], args.threshold)
+        print(f"{len(regressions)} regressions")
+        status = 1 if regressions else 0
+
+    if args.save:
+        path = baseline_path(args.save)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"Saved {len(results)} results to {path}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
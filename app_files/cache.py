@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def make_key(namespace, *parts):
+    """Build a stable cache key from a namespace and JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+    return f"{namespace}:{digest}"
+
+
+class DiskCache:
+    """Size-bounded result cache in a directory shared by several processes (replicas).
+
+    Each entry is one pickle file named after a hash of its key. Writes go to a
+    temporary file that is renamed into place, so readers never see a partial
+    entry. Reads refresh the file's mtime and eviction removes the least
+    recently used files once the directory grows past max_bytes; the size is
+    re-measured after every max_bytes / 10 written by this process, so the
+    bound is approximate when many processes write at once.
+
+    Only point this at a directory the app owns: entries are unpickled.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._written_since_scan = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.evict()
+
+    def _path(self, key):
+        namespace = key.split(':', 1)[0]
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.directory, f"{namespace}-{digest}.pkl")
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except Exception:
+            # Absent, evicted meanwhile, or unreadable (e.g. written by another version): a miss
+            self.misses += 1
+            return default
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store value; values that cannot be pickled are silently not persisted"""
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.writes += 1
+            self._written_since_scan += len(payload)
+            scan = self._written_since_scan >= self.max_bytes // 10
+        if scan:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the directory is under 90% of max_bytes"""
+        with self._lock:
+            self._written_since_scan = 0
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # Removed by another process meanwhile
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+            if total <= target:
+                break
+
+    def clear(self):
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'writes': self.writes, 'evictions': self.evictions}
+
+
+class ResultCache:
+    """Thread-safe in-process LRU cache shared by every Streamlit session.
+
+    With a backend (a DiskCache), misses fall through to it and new values are
+    written to it, so several processes can reuse each other's results.
+    Values are treated as read-only once stored; callers must not mutate them.
+    """
+
+    def __init__(self, max_entries=512, backend=None):
+        self.max_entries = max_entries
+        self.backend = backend
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        if self.backend is not None:
+            missing = object()
+            value = self.backend.get(key, missing)
+            if value is not missing:
+                self._store(key, value)
+                return value
+        return default
+
+    def _store(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        """Drop the in-process entries (the shared backend is left alone)"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {'entries': len(self._data), 'hits': self.hits, 'misses': self.misses}
+        if self.backend is not None:
+            stats['shared'] = self.backend.stats()
+        return stats
+
+
+def _shared_backend():
+    """DiskCache at PRICING_SHARED_CACHE_DIR (size from PRICING_SHARED_CACHE_MAX_MB), if configured"""
+    directory = os.environ.get("PRICING_SHARED_CACHE_DIR")
+    if not directory:
+        return None
+    max_mb = float(os.environ.get("PRICING_SHARED_CACHE_MAX_MB", "512"))
+    return DiskCache(directory, int(max_mb * 1024 * 1024))
+
+
+# Shared by all sessions in this process (Streamlit keeps imported modules alive between reruns),
+# and across processes/replicas when a shared cache directory is configured
+shared_cache = ResultCache(backend=_shared_backend())
@@ -0,0 +1,413 @@
+import numpy as np
+import plotly.graph_objects as go
+
+from cache import shared_cache
+from currency import BASE_CURRENCY
+from metrics import span
+
+
+def _month_axis(forecast_months):
+    return dict(
+        tick0=1,
+        dtick=2,  # Show x-axis ticks every 2 months
+        range=[0.5, forecast_months + 0.5]  # Set proper range from 1 to forecast_months
+    )
+
+
+def build_fixed_chart(forecast, currency=BASE_CURRENCY):
+    """Subscription + electricity revenue vs base platform + overage cost"""
+    months = forecast['months']
+    fig_fixed = go.Figure()
+
+    # Base platform cost (red) - bottom layer
+    fig_fixed.add_trace(go.Bar(
+        name='Base Platform Cost',
+        x=months,
+        y=forecast['base_platform_costs'],
+        marker_color="#1111D6",
+        offsetgroup=1,
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Base Platform Cost: ' + currency + '%{y:,.0f}<br>' +
+                     '<extra></extra>'
+    ))
+
+    # Overage fees (blue) - stacked on top of base platform cost
+    fig_fixed.add_trace(go.Bar(
+        name='Overage Fees',
+        x=months,
+        y=forecast['overage_costs'],
+        marker_color='#7C99F1',
+        offsetgroup=1,
+        base=forecast['base_platform_costs'],
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Overage Fees: ' + currency + '%{y:,.0f}<br>' +
+                     'Orders over limit: %{customdata:,.0f}<br>' +
+                     '<extra></extra>',
+        customdata=forecast['overage_orders']
+    ))
+
+    # Discounts - drawn down from the top of the cost stack to the platform cost actually paid
+    if forecast['discounts'].any():
+        fig_fixed.add_trace(go.Bar(
+            name='Discounts',
+            x=months,
+            y=-forecast['discounts'],
+            marker_color='#FFFFFF',
+            marker_pattern_shape='/',
+            marker_pattern_fgcolor='#1111D6',
+            offsetgroup=1,
+            base=forecast['base_platform_costs'] + forecast['overage_costs'],
+            hovertemplate='<b>Month %{x}</b><br>' +
+                         'Discounts: ' + currency + '%{customdata:,.0f}<br>' +
+                         '<extra></extra>',
+            customdata=forecast['discounts']
+        ))
+
+    # Monthly Recurring Revenue (separate group) - bottom layer
+    fig_fixed.add_trace(go.Bar(
+        name='Monthly Subscription Revenue',
+        x=months,
+        y=forecast['monthly_recurring_revenue'],
+        marker_color="#63BE63",
+        offsetgroup=2,
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Subscription Revenue: ' + currency + '%{y:,.0f}<br>' +
+                     'Active Customers: %{customdata:,.0f}<br>' +
+                     '<extra></extra>',
+        customdata=forecast['active_customers']
+    ))
+
+    # Electricity Revenue (stacked on top of subscription revenue)
+    fig_fixed.add_trace(go.Bar(
+        name='Electricity Revenue',
+        x=months,
+        y=forecast['electricity_revenue'],
+        marker_color='#C7F0C0',
+        offsetgroup=2,
+        base=forecast['monthly_recurring_revenue'],
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Electricity Revenue: ' + currency + '%{y:,.0f}<br>' +
+                     'Active Customers: %{customdata:,.0f}<br>' +
+                     '<extra></extra>',
+        customdata=forecast['active_customers']
+    ))
+
+    fig_fixed.update_layout(
+        title='Fixed: Subscription + Electricity Revenue vs Platform Cost (Auto-Optimized Packages)',
+        xaxis_title='Month',
+        xaxis=_month_axis(len(months)),
+        yaxis_title=f'Amount ({currency})',
+        height=500,
+        barmode='group'
+    )
+    return fig_fixed
+
+
+def build_variable_chart(forecast, currency=BASE_CURRENCY):
+    """One-time revenue vs variable (installation + charger) costs"""
+    months = forecast['months']
+    fig_variable = go.Figure()
+
+    fig_variable.add_trace(go.Bar(
+        name='Variable Costs',
+        x=months,
+        y=forecast['variable_costs'],
+        marker_color='#FF8C00',
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Variable Costs: ' + currency + '%{y:,.0f}<br>' +
+                     'New Customers: %{customdata:,.0f}<br>' +
+                     '<extra></extra>',
+        customdata=forecast['new_customers']
+    ))
+
+    fig_variable.add_trace(go.Bar(
+        name='One-time Revenue',
+        x=months,
+        y=forecast['one_time_revenue'],
+        marker_color="#018001",
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'One-time Revenue: ' + currency + '%{y:,.0f}<br>' +
+                     'New Customers: %{customdata:,.0f}<br>' +
+                     '<extra></extra>',
+        customdata=forecast['new_customers']
+    ))
+
+    fig_variable.update_layout(
+        title='Variable: One-time Revenue vs Variable Costs',
+        xaxis_title='Month',
+        xaxis=_month_axis(len(months)),
+        yaxis_title=f'Amount ({currency})',
+        height=500,
+        barmode='group'
+    )
+    return fig_variable
+
+
+def build_total_chart(forecast, currency=BASE_CURRENCY):
+    """Full revenue stack vs full cost stack with the monthly profit line"""
+    months = forecast['months']
+    fig_total = go.Figure()
+
+    # Total Revenue Stack (One-time + Electricity + Subscription) - Group 1
+    fig_total.add_trace(go.Bar(
+        name='One-time Revenue',
+        x=months,
+        y=forecast['one_time_revenue'],
+        marker_color='#018001',
+        offsetgroup=1,
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'One-time Revenue: %{y:,.0f} ' + currency + '<br>' +
+                     'New Customers: %{customdata:,.0f}<br>' +
+                     '<extra></extra>',
+        customdata=forecast['new_customers']
+    ))
+
+    fig_total.add_trace(go.Bar(
+        name='Monthly Subscription Revenue',
+        x=months,
+        y=forecast['monthly_recurring_revenue'],
+        marker_color='#63BE63',
+        offsetgroup=1,
+        base=forecast['one_time_revenue'],
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Subscription Revenue: %{y:,.0f} ' + currency + '<br>' +
+                     'Active Customers: %{customdata:,.0f}<br>' +
+                     '<extra></extra>',
+        customdata=forecast['active_customers']
+    ))
+
+    fig_total.add_trace(go.Bar(
+        name='Electricity Revenue',
+        x=months,
+        y=forecast['electricity_revenue'],
+        marker_color="#C7F0C0",
+        offsetgroup=1,
+        base=forecast['one_time_revenue'] + forecast['monthly_recurring_revenue'],
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Electricity Revenue: %{y:,.0f} ' + currency + '<br>' +
+                     'Active Customers: %{customdata:,.0f}<br>' +
+                     '<extra></extra>',
+        customdata=forecast['active_customers']
+    ))
+
+    # Total Costs Stack (Variable + Base Platform + Overage) - Group 2
+    fig_total.add_trace(go.Bar(
+        name='Variable Costs',
+        x=months,
+        y=forecast['variable_costs'],
+        marker_color='#FF8C00',
+        offsetgroup=2,
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Variable Costs: %{y:,.0f} ' + currency + '<br>' +
+                     'New Customers: %{customdata:,.0f}<br>' +
+                     'Total Cost'
+                     '<extra></extra>',
+        customdata=forecast['new_customers']
+    ))
+
+    fig_total.add_trace(go.Bar(
+        name='Base Platform Cost',
+        x=months,
+        y=forecast['base_platform_costs'],
+        marker_color='#1111D6',
+        offsetgroup=2,
+        base=forecast['variable_costs'],
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Base Platform Cost: %{y:,.0f} ' + currency + '<br>' +
+                     '<extra></extra>'
+    ))
+
+    fig_total.add_trace(go.Bar(
+        name='Overage Fees',
+        x=months,
+        y=forecast['overage_costs'],
+        marker_color="#7C99F1",
+        offsetgroup=2,
+        base=forecast['variable_costs'] + forecast['base_platform_costs'],
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Overage Fees: %{y:,.0f} ' + currency + '<br>' +
+                     '<extra></extra>'
+    ))
+
+    # Add profit line
+    fig_total.add_trace(go.Scatter(
+        name='Monthly Profit',
+        x=months,
+        y=forecast['profit'],
+        mode='lines+markers',
+        marker_color='#FFD700',
+        line=dict(width=3),
+        yaxis='y2',
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Monthly Profit: %{y:,.0f} ' + currency + '<br>' +
+                     '<extra></extra>'
+    ))
+
+    fig_total.update_layout(
+        title='Total: Revenue Stack (Subscription + Electricity + One-time) vs Cost Stack (Auto-Optimized Packages)',
+        xaxis_title='Month',
+        xaxis=_month_axis(len(months)),
+        yaxis_title=f'Amount ({currency})',
+        yaxis2=dict(
+            title=f'Profit ({currency})',
+            overlaying='y',
+            side='right'
+        ),
+        height=500,
+        barmode='group'  # Changed to group to show separate stacks
+    )
+    return fig_total
+
+
+def build_customer_chart(forecast, currency=BASE_CURRENCY):
+    """Active customer line with new customers per month as bars"""
+    months = forecast['months']
+    fig_customers = go.Figure()
+
+    fig_customers.add_trace(go.Scatter(
+        x=months,
+        y=forecast['active_customers'],
+        mode='lines+markers',
+        name='Total Active Customers',
+        marker_color='#1f77b4',
+        line=dict(width=3),
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Active Customers: %{y:,.0f}<br>' +
+                     'New Customers: %{customdata:,.0f}<br>' +
+                     '<extra></extra>',
+        customdata=forecast['new_customers']
+    ))
+
+    fig_customers.add_trace(go.Bar(
+        x=months,
+        y=forecast['new_customers'],
+        name='New Customers',
+        marker_color="#168416",
+        opacity=0.5,
+        yaxis='y2',
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'New Customers: %{y:,.0f}<br>' +
+                     '<extra></extra>'
+    ))
+
+    fig_customers.update_layout(
+        title='Customer Acquisition & Growth',
+        xaxis_title='Month',
+        xaxis=_month_axis(len(months)),
+        yaxis_title='Total Active Customers',
+        yaxis2=dict(
+            title='New Customers',
+            overlaying='y',
+            side='right'
+        ),
+        height=400
+    )
+    return fig_customers
+
+
+def build_cash_chart(forecast, metrics, currency=BASE_CURRENCY):
+    """Cumulative cash, nominal and discounted, with the payback month marked"""
+    months = forecast['months']
+    fig_cash = go.Figure()
+
+    fig_cash.add_trace(go.Scatter(
+        name='Cumulative Cash',
+        x=months,
+        y=metrics['cumulative_cash'],
+        mode='lines+markers',
+        marker_color='#018001',
+        line=dict(width=3),
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Cumulative Cash: %{y:,.0f} ' + currency + '<br>' +
+                     '<extra></extra>'
+    ))
+
+    fig_cash.add_trace(go.Scatter(
+        name='Discounted Cumulative Cash',
+        x=months,
+        y=metrics['discounted_cumulative_cash'],
+        mode='lines',
+        marker_color='#1111D6',
+        line=dict(width=2, dash='dash'),
+        hovertemplate='<b>Month %{x}</b><br>' +
+                     'Discounted Cumulative Cash: %{y:,.0f} ' + currency + '<br>' +
+                     '<extra></extra>'
+    ))
+
+    if 'daily_profit' in forecast:
+        # Daily resolution: days sit at their position within the month's bar slot
+        day_month = forecast['day_month']
+        starts = forecast['month_starts']
+        days_in_month = np.diff(np.append(starts, len(day_month)))
+        day_in_month = np.arange(len(day_month)) - starts[day_month - 1]
+        fig_cash.add_trace(go.Scatter(
+            name='Daily Cumulative Cash',
+            x=day_month - 0.5 + (day_in_month + 0.5) / days_in_month[day_month - 1],
+            y=np.cumsum(forecast['daily_profit']),
+            mode='lines',
+            marker_color='#FF8C00',
+            line=dict(width=1),
+            hovertemplate='<b>Month %{customdata}</b><br>' +
+                         'Cumulative Cash: %{y:,.0f} ' + currency + '<br>' +
+                         '<extra></extra>',
+            customdata=day_month
+        ))
+
+    fig_cash.add_hline(y=0, line_color='#888888', line_width=1)
+    payback = metrics['payback_month']
+    if payback == payback:  # NaN when the forecast never pays back
+        fig_cash.add_vline(x=float(payback), line_dash='dot', line_color='#FFD700',
+                           annotation_text=f"Payback: month {payback:.0f}")
+
+    fig_cash.update_layout(
+        title='Cumulative Cash Flow',
+        xaxis_title='Month',
+        xaxis=_month_axis(len(months)),
+        yaxis_title=f'Amount ({currency})',
+        height=400
+    )
+    return fig_cash
+
+
+CHART_BUILDERS = {
+    'fixed': build_fixed_chart,
+    'variable': build_variable_chart,
+    'total': build_total_chart,
+    'customers': build_customer_chart
+}
+
+
+def build_figures(forecast, currency=BASE_CURRENCY):
+    """Build every chart from a forecast already expressed in currency"""
+    figures = {}
+    for name, builder in CHART_BUILDERS.items():
+        with span(f"figure_build.{name}"):
+            figures[name] = builder(forecast, currency)
+    return figures
+
+
+def _figure_from_spec(spec):
+    # The spec was produced by a validated figure, so skip plotly's (slow) re-validation
+    return go.Figure(spec, _validate=False)
+
+
+def get_figures(forecast_key, forecast, currency=BASE_CURRENCY):
+    """All four charts for a converted forecast, cached alongside it under forecast_key.
+
+    The cache holds each chart's plotly JSON spec (cheap to pickle for the
+    shared disk cache) and every call builds new Figure objects from it, so a
+    session changing its figures never changes another session's.
+    """
+    specs = shared_cache.get_or_compute(
+        f"figure_specs:{currency}:{forecast_key}",
+        lambda: {name: figure.to_plotly_json() for name, figure in build_figures(forecast, currency).items()})
+    return {name: _figure_from_spec(spec) for name, spec in specs.items()}
+
+
+def get_cash_figure(forecast_key, forecast, metrics, discount_rate, currency=BASE_CURRENCY):
+    """Cumulative cash chart, cached per forecast and discount rate"""
+    # Rounded, so the page's percent / 100 and the same rate written as a fraction share an entry
+    rate = round(float(discount_rate), 6)
+    spec = shared_cache.get_or_compute(f"cash_figure_spec:{currency}:{rate!r}:{forecast_key}",
+                                       lambda: build_cash_chart(forecast, metrics, currency).to_plotly_json())
+    return _figure_from_spec(spec)
@@ -0,0 +1,241 @@
+"""Command-line tools for the pricing calculator.
+
+    python cli.py quote [INPUT] [--format csv|jsonl] [--output-format csv|jsonl]
+                        [--chunk-size N] [--workers N]
+
+`quote` reads one quote per row from INPUT (or stdin): module selection,
+package and monthly order volume. In CSV, `modules` is a ';'-separated list;
+in JSONL it is a JSON list. An empty/missing `package` prices the optimal
+package. Optional `contract_month` (default 1) and `discount_codes`
+(';'-separated in CSV, a list in JSONL) apply the tariff's discount rules.
+CSV input must hold one record per line.
+
+Rows are priced in fixed-size vectorized chunks and streamed to stdout with
+the input columns plus the cost breakdown, so memory stays constant however
+large the input is. Rows that cannot be read or priced are written with an
+`error` message. A throughput summary goes to stderr.
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from pricing_calculator import price_quotes
+from tariff import get_tariff
+
+# Columns a quote row is read from; CSV output of JSONL input has these (plus 'input' for unreadable lines)
+INPUT_FIELDS = ('modules', 'package', 'orders', 'contract_month', 'discount_codes')
+RESULT_FIELDS = ('package', 'base_modules', 'overage_orders', 'overage_cost', 'discount', 'total',
+                 'optimal_package', 'optimal_total', 'monthly_savings', 'error')
+
+
+def _parse_row(row, tariff, package_index):
+    """(module_mask, package_index, orders, contract_month, discount_codes) for one input row;
+    raises ValueError on bad input"""
+    modules = row.get('modules') or []
+    if isinstance(modules, str):
+        modules = [name.strip() for name in modules.split(';') if name.strip()]
+    unknown = [name for name in modules if name not in tariff.modules]
+    if unknown:
+        raise ValueError(f"unknown modules: {', '.join(unknown)}")
+    package = row.get('package') or None
+    if package is not None and package not in package_index:
+        raise ValueError(f"unknown package: {package}")
+    orders = float(row.get('orders'))
+    if not np.isfinite(orders) or orders < 0:
+        raise ValueError("orders must be a non-negative number")
+    contract_month = float(row.get('contract_month') or 1)
+    if not contract_month.is_integer() or contract_month < 1:
+        raise ValueError("contract_month must be a whole number from 1")
+    codes = row.get('discount_codes') or []
+    if isinstance(codes, str):
+        codes = codes.split(';')
+    return (tariff.module_mask(modules), -1 if package is None else package_index[package], orders,
+            int(contract_month), codes)
+
+
+def price_rows(rows, errors=None):
+    """Price a chunk of row dicts; returns the rows extended with RESULT_FIELDS.
+
+    errors optionally holds an error message per row that could not be read;
+    those rows are not priced and are returned with their error.
+    """
+    tariff = get_tariff()
+    package_index = {name: i for i, name in enumerate(tariff.package_names)}
+    masks = np.zeros(len(rows), dtype=np.uint64)
+    packages = np.full(len(rows), -1, dtype=int)
+    orders = np.zeros(len(rows))
+    months = np.ones(len(rows), dtype=int)
+    active = None
+    errors = list(errors) if errors is not None else [''] * len(rows)
+    for i, row in enumerate(rows):
+        if errors[i]:
+            continue
+        try:
+            masks[i], packages[i], orders[i], months[i], codes = _parse_row(row, tariff, package_index)
+            if codes and tariff.discounts:
+                if active is None:
+                    active = np.tile(tariff.discounts.active(), (len(rows), 1))
+                active[i] = tariff.discounts.active(codes)
+        except (TypeError, ValueError) as e:
+            errors[i] = str(e)
+
+    result = price_quotes(tariff, masks, packages, orders, months, active)
+    names = tariff.package_names
+    columns = {name: values.tolist() for name, values in result.items()}
+    priced = []
+    for i, row in enumerate(rows):
+        out = dict(row)
+        if errors[i]:
+            out.update({field: '' for field in RESULT_FIELDS}, error=errors[i])
+        else:
+            out.update(
+                package=names[columns['package_index'][i]],
+                base_modules=columns['base_modules'][i],
+                overage_orders=columns['overage_orders'][i],
+                overage_cost=columns['overage_cost'][i],
+                discount=columns['discount'][i],
+                total=columns['total'][i],
+                optimal_package=names[columns['optimal_package_index'][i]],
+                optimal_total=columns['optimal_total'][i],
+                monthly_savings=columns['monthly_savings'][i],
+                error=''
+            )
+        priced.append(out)
+    return priced
+
+
+def output_fields(input_fields=None):
+    """CSV output columns: the input columns (CSV header, else INPUT_FIELDS and 'input') then RESULT_FIELDS"""
+    input_fields = input_fields or INPUT_FIELDS + ('input',)
+    return [field for field in input_fields if field not in RESULT_FIELDS] + list(RESULT_FIELDS)
+
+
+def _read_json_row(line):
+    """(row dict, error message) for one JSONL line; unreadable lines keep their text as 'input'"""
+    try:
+        row = json.loads(line)
+    except ValueError as e:
+        return {'input': line.strip()}, f"invalid JSON: {e}"
+    if not isinstance(row, dict):
+        return {'input': line.strip()}, "a quote must be a JSON object"
+    return row, ''
+
+
+def process_chunk(lines, input_fields, fieldnames, input_format, output_format, include_header=False):
+    """Parse, price and format a chunk of raw input lines.
+
+    Runs in worker processes, so only text crosses the process boundary.
+    fieldnames are the CSV output columns, the same for every chunk.
+    Returns (output text, row count, error count).
+    """
+    if input_format == 'csv':
+        rows = list(csv.DictReader(lines, fieldnames=input_fields))
+        read_errors = None
+    else:
+        parsed = [_read_json_row(line) for line in lines if line.strip()]
+        rows = [row for row, _ in parsed]
+        read_errors = [error for _, error in parsed]
+    priced = price_rows(rows, read_errors) if rows else []
+    errors = sum(1 for row in priced if row['error'])
+
+    out = io.StringIO()
+    if output_format == 'jsonl':
+        for row in priced:
+            out.write(json.dumps(row) + '\n')
+    else:
+        writer = csv.DictWriter(out, fieldnames=fieldnames, extrasaction='ignore', lineterminator='\n')
+        if include_header:
+            writer.writeheader()
+        for row in priced:
+            if isinstance(row.get('modules'), list):
+                row = dict(row, modules=';'.join(row['modules']))
+            writer.writerow(row)
+    return out.getvalue(), len(priced), errors
+
+
+def _chunks(lines, chunk_size):
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_quote(args):
+    input_format = args.format or ('jsonl' if args.input and args.input.endswith(('.jsonl', '.json')) else 'csv')
+    output_format = args.output_format or input_format
+    stream = open(args.input, newline='', encoding='utf-8') if args.input else io.TextIOWrapper(
+        sys.stdin.buffer, encoding='utf-8', newline='')
+    started = time.perf_counter()
+    total_rows = 0
+    error_rows = 0
+
+    def emit(result):
+        nonlocal total_rows, error_rows
+        text, rows, errors = result
+        total_rows += rows
+        error_rows += errors
+        sys.stdout.write(text)
+
+    with stream:
+        # CSV rows are one per line; the header is parsed once and shipped with every chunk
+        input_fields = next(csv.reader([stream.readline()])) if input_format == 'csv' else None
+        fieldnames = output_fields(input_fields)
+        chunks = _chunks(iter(stream), args.chunk_size)
+        if args.workers <= 1:
+            for i, chunk in enumerate(chunks):
+                emit(process_chunk(chunk, input_fields, fieldnames, input_format, output_format, i == 0))
+        else:
+            # Keep a bounded window of chunks in flight so memory stays constant and order is kept
+            with ProcessPoolExecutor(args.workers) as pool:
+                in_flight = deque()
+                for i, chunk in enumerate(chunks):
+                    in_flight.append(pool.submit(process_chunk, chunk, input_fields, fieldnames,
+                                                 input_format, output_format, i == 0))
+                    if len(in_flight) >= args.workers * 2:
+                        emit(in_flight.popleft().result())
+                while in_flight:
+                    emit(in_flight.popleft().result())
+    sys.stdout.flush()
+
+    elapsed = time.perf_counter() - started
+    print(f"Priced {total_rows:,} rows ({error_rows:,} errors) with tariff {get_tariff().version} "
+          f"in {elapsed:.2f}s: {total_rows / elapsed if elapsed else 0:,.0f} rows/s "
+          f"({args.workers} worker{'s' if args.workers != 1 else ''}, chunk size {args.chunk_size})",
+          file=sys.stderr)
+    return 1 if error_rows and args.strict else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python cli.py", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    quote = commands.add_parser("quote", help="Price quotes from CSV/JSONL in streaming chunks")
+    quote.add_argument("input", nargs="?", help="Input file (default: stdin)")
+    quote.add_argument("--format", choices=("csv", "jsonl"), help="Input format (default: from extension, else csv)")
+    quote.add_argument("--output-format", choices=("csv", "jsonl"), help="Output format (default: input format)")
+    quote.add_argument("--chunk-size", type=int, default=10_000, help="Rows priced per vectorized chunk")
+    quote.add_argument("--workers", type=int, default=1,
+                       help=f"Worker processes (this machine has {os.cpu_count()} CPUs)")
+    quote.add_argument("--strict", action="store_true", help="Exit with status 1 if any row failed")
+    quote.set_defaults(handler=run_quote)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,8 +3,9 @@ APP_CONFIG = {
     "title": "SaaS Pricing Calculator",
     "icon": "💰",
     "company_name": "Your SaaS Company",
-    "currency": "USD",
-    "currency_symbol": "$"
+    "currency": "DKK",  # Currency the tariff and calculator inputs are expressed in
+    "currency_symbol": "DKK",
+    "display_currencies": ["DKK", "EUR", "SEK", "NOK"]
 }
 
 # Styling configuration
@@ -21,3 +22,41 @@ FEATURES = {
     "allow_custom_modules": False,
     "show_external_fees": True
 }
+
+# Default Customer Revenue Calculator inputs (rates as fractions)
+FORECAST_DEFAULTS = {
+    "monthly_subscription_fee": 39.0,
+    "one_time_setup_fee": 6000.0,
+    "kwh_addon_price": 0.0,
+    "kwh_per_customer_monthly": 400.0,
+    "existing_customers": 0,
+    "existing_model": "count",  # "count" (existing_customers) or "portfolio" (per-customer file, see portfolio.py)
+    "customers_month_1": 20,
+    "monthly_growth_rate": 0.05,
+    "growth_cap": 0,
+    "customer_retention_rate": 1.0,
+    "forecast_months": 24,
+    "charger_type": "NexBlue Edge",
+    "electricity_model": "flat",  # "flat" (kWh/customer/month) or "hourly" (memory-mapped curves)
+    "spot_markup": 0.0,  # Hourly model: share of the spot price kept as margin
+    "start_month": 1,  # Hourly model and daily resolution: calendar month of forecast month 1
+    "resolution": "monthly",  # "monthly" or "daily" (day-level customers with seasonality)
+    "weekly_seasonality": (1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0),  # Daily resolution: Monday..Sunday
+    "annual_seasonality": (1.0,) * 12  # Daily resolution: January..December
+}
+
+# Seasonality presets offered for the daily forecast (multipliers on new customers per day)
+SEASONALITY_PRESETS = {
+    "None": {
+        "weekly_seasonality": (1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0),
+        "annual_seasonality": (1.0,) * 12
+    },
+    "Installer calendar": {
+        # Few weekend installations, a summer holiday dip and a slow Christmas period
+        "weekly_seasonality": (1.2, 1.2, 1.2, 1.2, 1.0, 0.2, 0.0),
+        "annual_seasonality": (0.8, 0.9, 1.1, 1.2, 1.2, 1.1, 0.5, 0.9, 1.2, 1.2, 1.1, 0.7)
+    }
+}
+
+# Annual rate used to discount forecast profits for NPV (a session setting, not a forecast input)
+DEFAULT_DISCOUNT_RATE = 0.10
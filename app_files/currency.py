@@ -0,0 +1,60 @@
+import json
+import os
+
+import numpy as np
+
+from config import APP_CONFIG
+
+BASE_CURRENCY = APP_CONFIG["currency"]
+DEFAULT_FX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fx_rates.json")
+
+_fx_rates = None
+
+
+def load_fx_rates(path=None):
+    """Read the FX table (units of each currency per 1 base-currency unit) once per process"""
+    global _fx_rates
+    if _fx_rates is None or path is not None:
+        path = path or os.environ.get("PRICING_FX_FILE", DEFAULT_FX_FILE)
+        with open(path, encoding="utf-8") as f:
+            table = json.load(f)
+        if table.get("base", BASE_CURRENCY) != BASE_CURRENCY:
+            raise ValueError(f"FX table {path} is based on {table['base']}, expected {BASE_CURRENCY}")
+        rates = {code: float(rate) for code, rate in table["rates"].items()}
+        rates[BASE_CURRENCY] = 1.0
+        _fx_rates = rates
+    return _fx_rates
+
+
+def available_currencies():
+    """Display currencies from APP_CONFIG that have a rate in the FX table"""
+    rates = load_fx_rates()
+    return [code for code in APP_CONFIG["display_currencies"] if code in rates]
+
+
+def fx_rate(currency):
+    """Conversion factor from the base currency to currency"""
+    try:
+        return load_fx_rates()[currency]
+    except KeyError:
+        raise ValueError(f"No FX rate for {currency}") from None
+
+
+def convert_amounts(data, fields, currency):
+    """Return a copy of data with the monetary fields converted by one array multiply each.
+
+    Non-monetary fields are shared with the input, so converting a cached
+    forecast costs one multiply per money column and never recomputes it.
+    """
+    if currency == BASE_CURRENCY:
+        return data
+    rate = fx_rate(currency)
+    converted = dict(data)
+    for field in fields:
+        converted[field] = np.multiply(data[field], rate)
+    return converted
+
+
+def format_money(amount, currency, decimals=0):
+    """Format an amount the way the calculator pages show totals, e.g. '1,234 DKK'"""
+    return f"{amount:,.{decimals}f} {currency}"
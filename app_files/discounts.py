@@ -0,0 +1,201 @@
+"""Declarative discount and promotion rules.
+
+The optional DISCOUNTS tariff section maps a rule name to its conditions and
+one action, for example
+
+    "Bundle of 4+": {"min_modules": 4, "percent_off": 10, "applies_to": "modules"},
+    "Introduction": {"free_months": 2},
+    "Annual prepay": {"code": "ANNUAL", "percent_off": 8},
+    "Partner": {"code": "PARTNER", "packages": ["Business (<200 orders)"], "fixed_off": 1000}
+
+Conditions (all optional; a rule applies when all of them hold):
+    modules                   every listed module is selected
+    any_modules               at least one listed module is selected
+    min_modules               at least this many modules are selected
+    packages                  the priced package is one of these
+    min_orders, max_orders    monthly order volume in this range (inclusive)
+    from_month, to_month      contract month in this range (month 1 is the first)
+    code                      the quote carries this discount code (partner deals, prepay)
+
+Actions (exactly one):
+    percent_off               percent of the monthly price; "applies_to": "total"
+                              (default, modules plus overage) or "modules"
+    fixed_off                 amount off per month, in the base currency
+    free_months               this many months free, starting at from_month
+
+The discounts of all matching rules add up and never exceed the monthly
+price. The rules are compiled once per tariff version into per-rule arrays,
+so evaluate() matches every rule against whole arrays of quotes, packages,
+order volumes and contract months without a Python loop.
+"""
+import numpy as np
+
+CONDITIONS = ('modules', 'any_modules', 'min_modules', 'packages', 'min_orders', 'max_orders',
+              'from_month', 'to_month', 'code')
+ACTIONS = ('percent_off', 'fixed_off', 'free_months')
+APPLIES_TO = ('total', 'modules')
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_name_list(value):
+    return isinstance(value, (list, tuple)) and all(isinstance(name, str) for name in value)
+
+
+def validate_discounts(discounts, package_sizes, modules):
+    """Problems with a DISCOUNTS section, as a list of messages (empty when valid)"""
+    errors = []
+    if not hasattr(discounts, 'items'):
+        return ["DISCOUNTS must map rule names to rules"]
+    for name, rule in discounts.items():
+        if not hasattr(rule, 'items'):
+            errors.append(f"Discount '{name}': must be a mapping of conditions and one action")
+            continue
+        unknown = set(rule) - set(CONDITIONS) - set(ACTIONS) - {'applies_to', 'description'}
+        if unknown:
+            errors.append(f"Discount '{name}': unknown fields {', '.join(sorted(unknown))}")
+
+        actions = [action for action in ACTIONS if action in rule]
+        if len(actions) != 1:
+            errors.append(f"Discount '{name}': needs exactly one of {', '.join(ACTIONS)}")
+        elif actions[0] == 'percent_off' and not (_is_number(rule['percent_off'])
+                                                   and 0 <= rule['percent_off'] <= 100):
+            errors.append(f"Discount '{name}': percent_off must be between 0 and 100")
+        elif actions[0] == 'fixed_off' and not (_is_number(rule['fixed_off']) and rule['fixed_off'] >= 0):
+            errors.append(f"Discount '{name}': fixed_off must be a non-negative number")
+        elif actions[0] == 'free_months':
+            if not (isinstance(rule['free_months'], int) and not isinstance(rule['free_months'], bool)
+                    and rule['free_months'] >= 1):
+                errors.append(f"Discount '{name}': free_months must be a positive whole number")
+            if 'to_month' in rule:
+                errors.append(f"Discount '{name}': free_months sets the end month itself; drop to_month")
+        if rule.get('applies_to', 'total') not in APPLIES_TO:
+            errors.append(f"Discount '{name}': applies_to must be 'total' or 'modules'")
+
+        for field in ('modules', 'any_modules'):
+            if field in rule:
+                if not _is_name_list(rule[field]):
+                    errors.append(f"Discount '{name}': {field} must be a list of module names")
+                else:
+                    errors += [f"Discount '{name}': unknown module '{module}'"
+                               for module in rule[field] if module not in modules]
+        if 'packages' in rule:
+            if not _is_name_list(rule['packages']):
+                errors.append(f"Discount '{name}': packages must be a list of package names")
+            else:
+                errors += [f"Discount '{name}': unknown package '{package}'"
+                           for package in rule['packages'] if package not in package_sizes]
+        for field in ('min_modules', 'min_orders', 'max_orders', 'from_month', 'to_month'):
+            if field in rule and not (_is_number(rule[field]) and rule[field] >= 0):
+                errors.append(f"Discount '{name}': {field} must be a non-negative number")
+        for low, high in (('min_orders', 'max_orders'), ('from_month', 'to_month')):
+            if _is_number(rule.get(low)) and _is_number(rule.get(high)) and rule[low] > rule[high]:
+                errors.append(f"Discount '{name}': {low} is above {high}")
+        if 'code' in rule and not (isinstance(rule['code'], str) and rule['code'].strip()):
+            errors.append(f"Discount '{name}': code must be a non-empty string")
+    return errors
+
+
+def normalize_codes(codes):
+    """Discount codes as a sorted tuple of upper-case strings (accepts a comma-separated string)"""
+    if isinstance(codes, str):
+        codes = codes.split(',')
+    return tuple(sorted({code.strip().upper() for code in codes or () if code and code.strip()}))
+
+
+def _popcount(masks):
+    """Set bits per uint64 mask"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(masks)
+    masks = masks - ((masks >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    masks = (masks & np.uint64(0x3333333333333333)) + ((masks >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    masks = (masks + (masks >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (masks * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+def _month_range(rule):
+    """First and last contract month of a rule (inclusive)"""
+    first = rule.get('from_month', 1)
+    if 'free_months' in rule:
+        return first, first + rule['free_months'] - 1
+    return first, rule.get('to_month', np.inf)
+
+
+def _readonly(array):
+    array.setflags(write=False)
+    return array
+
+
+class CompiledDiscounts:
+    """Discount rules as per-rule arrays, evaluated against arrays of quotes"""
+
+    def __init__(self, discounts, tariff):
+        rules = list(discounts.values())
+        self.names = tuple(discounts)
+        self.descriptions = tuple(rule.get('description', '') for rule in rules)
+        self.codes = tuple(normalize_codes([rule['code']])[0] if 'code' in rule else None for rule in rules)
+
+        def column(values, dtype=float):
+            return _readonly(np.array(values, dtype=dtype).reshape(len(rules)))
+
+        self.required = column([tariff.module_mask(rule.get('modules', ())) for rule in rules], np.uint64)
+        self.any_of = column([tariff.module_mask(rule.get('any_modules', ())) for rule in rules], np.uint64)
+        self.min_modules = column([rule.get('min_modules', 0) for rule in rules], np.uint64)
+        # (packages, rules): whether each rule applies to each package
+        self.packages = _readonly(np.array(
+            [[package in rule['packages'] if 'packages' in rule else True for rule in rules]
+             for package in tariff.package_names], dtype=bool).reshape(len(tariff.package_names), len(rules)))
+        self.min_orders = column([rule.get('min_orders', -np.inf) for rule in rules])
+        self.max_orders = column([rule.get('max_orders', np.inf) for rule in rules])
+        months = [_month_range(rule) for rule in rules]
+        self.from_month = column([first for first, _ in months])
+        self.to_month = column([last for _, last in months])
+
+        # Actions: a share of the modules price, a share of the total and a fixed amount per rule
+        share = column([1.0 if 'free_months' in rule else rule.get('percent_off', 0) / 100 for rule in rules])
+        on_modules = column([rule.get('applies_to', 'total') == 'modules' for rule in rules], bool)
+        self.modules_share = _readonly(np.where(on_modules, share, 0.0))
+        self.total_share = _readonly(np.where(on_modules, 0.0, share))
+        self.fixed_off = column([rule.get('fixed_off', 0) for rule in rules])
+
+    def __len__(self):
+        return len(self.names)
+
+    def active(self, codes=()):
+        """Boolean per rule: rules without a code, plus those whose code is in codes"""
+        codes = set(normalize_codes(codes))
+        return np.array([code is None or code in codes for code in self.codes], dtype=bool).reshape(len(self))
+
+    def matches(self, module_masks, package_indices, orders, months, active=None):
+        """Boolean (..., rules) array of the rules that apply; the arguments broadcast together"""
+        masks = np.asarray(module_masks, dtype=np.uint64)[..., None]
+        hit = (masks & self.required) == self.required
+        hit = hit & (((masks & self.any_of) != 0) | (self.any_of == 0))
+        hit = hit & (_popcount(masks) >= self.min_modules)
+        hit = hit & self.packages[np.asarray(package_indices)]
+        orders = np.asarray(orders, dtype=float)[..., None]
+        hit = hit & (orders >= self.min_orders) & (orders <= self.max_orders)
+        months = np.asarray(months, dtype=float)[..., None]
+        hit = hit & (months >= self.from_month) & (months <= self.to_month)
+        return hit & (self.active() if active is None else active)
+
+    def evaluate(self, module_masks, package_indices, orders, months, base_modules, totals, active=None):
+        """Discount per quote (shaped like totals), capped at the total"""
+        totals = np.asarray(totals, dtype=float)
+        if not len(self):
+            return np.zeros_like(totals)
+        hit = self.matches(module_masks, package_indices, orders, months, active)
+        discount = hit @ self.modules_share * base_modules + hit @ self.total_share * totals + hit @ self.fixed_off
+        return np.minimum(discount, totals)
+
+    def matching_names(self, module_mask, package_index, orders, month, active=None):
+        """Names of the rules that apply to a single quote"""
+        hit = self.matches(module_mask, package_index, orders, month, active)
+        return [name for name, applies in zip(self.names, hit) if applies]
+
+
+def compile_discounts(discounts, tariff):
+    """CompiledDiscounts for a validated DISCOUNTS section; tariff supplies module and package order"""
+    return CompiledDiscounts(discounts or {}, tariff)
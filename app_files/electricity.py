@@ -0,0 +1,188 @@
+"""Hourly electricity revenue from memory-mapped consumption profiles and price curves.
+
+A curves directory holds a ``curves.json`` manifest and raw little-endian
+float32 files with one value per hour of a (non-leap) year:
+
+    {
+        "spot_price": "spot_price.f32",        # DKK/kWh
+        "profiles": "profiles.f32",            # kWh per customer, one row per segment
+        "segments": [{"name": "Residential", "share": 0.7}, ...]
+    }
+
+Generate a synthetic set with ``python electricity.py generate DIR``.
+"""
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+from cache import make_key, shared_cache
+
+HOURS_PER_YEAR = 8760
+DAYS_PER_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+# First hour of each calendar month, plus the end of the year
+MONTH_BOUNDS = np.concatenate(([0], np.cumsum(DAYS_PER_MONTH) * 24))
+
+DEFAULT_CURVES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "curves")
+
+
+class PriceCurves:
+    """Read-only view of a curves directory; the hourly arrays are np.memmap, not loaded into RAM"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        manifest_path = os.path.join(directory, "curves.json")
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        self.segment_names = tuple(segment["name"] for segment in manifest["segments"])
+        shares = np.array([segment["share"] for segment in manifest["segments"]], dtype=float)
+        if shares.sum() <= 0:
+            raise ValueError(f"{manifest_path}: segment shares must sum to a positive number")
+        self.segment_shares = shares / shares.sum()
+
+        self.spot_price = self._map(manifest["spot_price"], (HOURS_PER_YEAR,))
+        self.profiles = self._map(manifest["profiles"], (len(self.segment_names), HOURS_PER_YEAR))
+
+        # Identify the data for cache keys (and reloads) by file size and mtime, without hashing
+        # the hourly files themselves
+        self.files = ("curves.json", manifest["spot_price"], manifest["profiles"])
+        self.stamp = _file_stamp(directory, self.files)
+        self.version = hashlib.sha256(json.dumps([manifest, self.stamp], sort_keys=True).encode()).hexdigest()[:12]
+
+    def _map(self, filename, shape):
+        path = os.path.join(self.directory, filename)
+        expected = int(np.prod(shape)) * 4
+        if os.path.getsize(path) != expected:
+            raise ValueError(f"{path}: expected {expected} bytes of float32 for shape {shape}")
+        return np.memmap(path, dtype="<f4", mode="r", shape=shape)
+
+    def monthly_totals(self):
+        """Per segment and calendar month: kWh and spot cost per customer.
+
+        Returns an array of shape (segments, 12, 2), computed with one matrix
+        product per month over the hourly price columns [1, spot].
+        """
+        prices = np.column_stack((np.ones(HOURS_PER_YEAR), self.spot_price))
+        return np.stack([
+            self.profiles[:, start:end] @ prices[start:end]
+            for start, end in zip(MONTH_BOUNDS[:-1], MONTH_BOUNDS[1:])
+        ], axis=1)
+
+
+def _file_stamp(directory, names):
+    """(name, size, mtime) of each file; None for a file that is missing"""
+    stamp = []
+    for name in names:
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            return None
+        stamp.append((name, stat.st_size, stat.st_mtime_ns))
+    return stamp
+
+
+_curves = {}
+
+
+def load_price_curves(directory=None):
+    """PriceCurves for directory (default PRICING_CURVES_DIR or ./curves), or None if absent.
+
+    Reloaded when the manifest or one of its files changes. While files are
+    missing or half-written, the curves loaded last keep being served.
+    """
+    directory = directory or os.environ.get("PRICING_CURVES_DIR", DEFAULT_CURVES_DIR)
+    curves = _curves.get(directory)
+    if curves is None:
+        if not os.path.exists(os.path.join(directory, "curves.json")):
+            return None
+        curves = _curves[directory] = PriceCurves(directory)
+        return curves
+    stamp = _file_stamp(directory, curves.files)
+    if stamp is not None and stamp != curves.stamp:
+        try:
+            curves = _curves[directory] = PriceCurves(directory)
+        except (OSError, ValueError, KeyError):
+            pass  # An update in progress; the next call retries once its files are complete
+    return curves
+
+
+def segment_revenue_per_customer(curves, kwh_addon_price, spot_markup):
+    """Electricity revenue per customer by segment and calendar month, shape (segments, 12).
+
+    Revenue is the flat kWh add-on plus a markup share of the spot price paid;
+    the spot price itself is passed through and is not revenue.
+    """
+    key = make_key("segment_revenue", curves.version, kwh_addon_price, spot_markup)
+
+    def compute():
+        totals = curves.monthly_totals()
+        return totals[:, :, 0] * kwh_addon_price + totals[:, :, 1] * spot_markup
+
+    return shared_cache.get_or_compute(key, compute)
+
+
+def hourly_electricity_revenue(curves, active_customers, kwh_addon_price, spot_markup, start_month=1):
+    """Monthly electricity revenue for a forecast, split by customer segment.
+
+    active_customers holds the active customer count for each forecast month;
+    forecast month 1 falls in calendar month start_month and later months wrap
+    around the year. Returns (total per month, per month and segment).
+    """
+    per_customer = segment_revenue_per_customer(curves, kwh_addon_price, spot_markup)
+    active_customers = np.asarray(active_customers, dtype=float)
+    calendar_month = (np.arange(len(active_customers)) + start_month - 1) % 12
+    by_segment = (active_customers[:, None] * curves.segment_shares[None, :]
+                  * per_customer[:, calendar_month].T)
+    return by_segment.sum(axis=1), by_segment
+
+
+def write_synthetic_curves(directory, seed=0):
+    """Write a plausible synthetic curves set (for development and benchmarks)"""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    hours = np.arange(HOURS_PER_YEAR)
+    hour_of_day = hours % 24
+    day_of_year = hours // 24
+    weekday = (day_of_year % 7) < 5
+    winter = 1 + 0.35 * np.cos(2 * np.pi * day_of_year / 365)
+
+    # Spot price with morning/evening peaks, winter premium and noise (DKK/kWh)
+    daily_shape = 0.8 + 0.25 * np.exp(-((hour_of_day - 8) / 2.0) ** 2) + 0.45 * np.exp(-((hour_of_day - 18) / 2.5) ** 2)
+    spot = np.clip(daily_shape * winter * 0.9 + rng.normal(0, 0.08, HOURS_PER_YEAR), 0, None)
+    def charging(start, end, kwh_per_day, days_mask=None):
+        in_window = ((hour_of_day - start) % 24) < ((end - start) % 24)
+        profile = in_window.astype(float)
+        if days_mask is not None:
+            profile *= days_mask
+        daily_total = np.bincount(day_of_year, weights=profile, minlength=365)
+        return profile / np.where(daily_total > 0, daily_total, 1)[day_of_year] * kwh_per_day * winter
+
+    profiles = np.stack([
+        charging(18, 24, 12.0),             # Residential: evening charging at home
+        charging(8, 16, 9.0, weekday),      # Commuter: workplace charging on weekdays
+        charging(0, 6, 35.0)                # Fleet: overnight depot charging
+    ])
+
+    spot.astype("<f4").tofile(os.path.join(directory, "spot_price.f32"))
+    profiles.astype("<f4").tofile(os.path.join(directory, "profiles.f32"))
+    manifest = {
+        "spot_price": "spot_price.f32",
+        "profiles": "profiles.f32",
+        "segments": [
+            {"name": "Residential", "share": 0.7},
+            {"name": "Commuter", "share": 0.2},
+            {"name": "Fleet", "share": 0.1}
+        ]
+    }
+    with open(os.path.join(directory, "curves.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "generate":
+        sys.exit("Usage: python electricity.py generate DIR")
+    write_synthetic_curves(sys.argv[2])
+    print(f"Wrote synthetic hourly curves to {sys.argv[2]}")
@@ -0,0 +1,212 @@
+"""Streaming export of forecasts to CSV, Parquet and Excel.
+
+Exports take an iterable of (scenario, forecast) pairs, e.g. a single
+forecast or a lazily computed sweep, and yield the file as byte chunks. Rows
+are regrouped into chunks of chunk_rows, so at most one chunk of columns is
+held in memory whatever the number of scenarios; CSV rows are formatted per
+chunk, and Parquet record batches wrap the NumPy columns without copying.
+
+Parquet needs pyarrow and Excel needs xlsxwriter; both are optional.
+"""
+import csv
+import io
+import tempfile
+
+import numpy as np
+
+DEFAULT_CHUNK_ROWS = 65_536
+XLSX_MAX_ROWS = 1_048_576
+
+# (export column, forecast field); optimal_package is written as the package name
+EXPORT_COLUMNS = (
+    ('month', 'months'),
+    ('new_customers', 'new_customers'),
+    ('active_customers', 'active_customers'),
+    ('subscription_revenue', 'monthly_recurring_revenue'),
+    ('electricity_revenue', 'electricity_revenue'),
+    ('one_time_revenue', 'one_time_revenue'),
+    ('total_revenue', 'total_revenue'),
+    ('optimal_package', 'optimal_package_index'),
+    ('base_platform_cost', 'base_platform_costs'),
+    ('overage_orders', 'overage_orders'),
+    ('overage_cost', 'overage_costs'),
+    ('discount', 'discounts'),
+    ('platform_cost', 'platform_costs'),
+    ('variable_cost', 'variable_costs'),
+    ('total_cost', 'total_costs'),
+    ('profit', 'profit'),
+)
+
+
+class ExportError(ValueError):
+    """Unknown export format, or its optional dependency is not installed"""
+
+
+def forecast_columns(forecast, scenario=None):
+    """Export columns for one forecast as NumPy arrays (views, no copies), with an optional scenario column"""
+    columns = {}
+    if scenario is not None:
+        columns['scenario'] = np.full(len(forecast['months']), scenario)
+    for column, field in EXPORT_COLUMNS:
+        columns[column] = np.asarray(forecast[field])
+    return columns
+
+
+def iter_chunks(forecasts, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Regroup the rows of (scenario, forecast) pairs into column chunks of chunk_rows rows"""
+    pending = []
+    pending_rows = 0
+    for scenario, forecast in forecasts:
+        columns = forecast_columns(forecast, scenario)
+        pending.append(columns)
+        pending_rows += len(columns['month'])
+        while pending_rows >= chunk_rows:
+            merged = {name: np.concatenate([part[name] for part in pending]) for name in pending[0]}
+            yield {name: values[:chunk_rows] for name, values in merged.items()}
+            rest = {name: values[chunk_rows:] for name, values in merged.items()}
+            pending_rows -= chunk_rows
+            pending = [rest] if pending_rows else []
+    if pending_rows:
+        yield {name: np.concatenate([part[name] for part in pending]) for name in pending[0]}
+
+
+def iter_csv(forecasts, package_names, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """CSV bytes, one yielded piece per chunk of rows"""
+    names = np.array(package_names, dtype=object)
+    header = None
+    for chunk in iter_chunks(forecasts, chunk_rows):
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator='\n')
+        if header is None:
+            header = list(chunk)
+            writer.writerow(header)
+        columns = []
+        for name, values in chunk.items():
+            if name == 'optimal_package':
+                values = names[values]
+            elif values.dtype.kind == 'f':
+                values = np.round(values, 2)
+            columns.append(values.tolist())
+        writer.writerows(zip(*columns))
+        yield out.getvalue().encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what has been written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return b''.join(chunks)
+
+
+def _require(module, fmt):
+    try:
+        return __import__(module, fromlist=['_'])
+    except ImportError:
+        raise ExportError(f"{fmt} export needs the optional '{module.split('.')[0]}' package") from None
+
+
+def iter_parquet(forecasts, package_names, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Parquet bytes, one row group (and yielded piece) per chunk of rows"""
+    pa = _require('pyarrow', 'Parquet')
+    pq = _require('pyarrow.parquet', 'Parquet')
+    dictionary = pa.array(list(package_names), type=pa.string())
+    sink = _ChunkSink()
+    writer = None
+    for chunk in iter_chunks(forecasts, chunk_rows):
+        # pa.array wraps contiguous numeric NumPy buffers without copying them
+        arrays = [pa.DictionaryArray.from_arrays(pa.array(values), dictionary) if name == 'optimal_package'
+                  else pa.array(values) for name, values in chunk.items()]
+        batch = pa.RecordBatch.from_arrays(arrays, names=list(chunk))
+        if writer is None:
+            writer = pq.ParquetWriter(sink, batch.schema)
+        writer.write_batch(batch)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def iter_xlsx(forecasts, package_names, chunk_rows=DEFAULT_CHUNK_ROWS, read_size=1024 * 1024):
+    """Excel bytes. The workbook is built in constant-memory mode in a temporary
+    file (an .xlsx is a zip, so it can only be sent once complete) and then read
+    back in pieces. Rows beyond Excel's sheet limit continue on further sheets."""
+    xlsxwriter = _require('xlsxwriter', 'Excel')
+    with tempfile.TemporaryFile() as tmp:
+        workbook = xlsxwriter.Workbook(tmp, {'constant_memory': True})
+        names = np.array(package_names, dtype=object)
+        sheet = None
+        row = XLSX_MAX_ROWS
+        header = None
+        for chunk in iter_chunks(forecasts, chunk_rows):
+            header = header or list(chunk)
+            columns = [names[values].tolist() if name == 'optimal_package' else values.tolist()
+                       for name, values in chunk.items()]
+            for values in zip(*columns):
+                if row >= XLSX_MAX_ROWS:
+                    sheet = workbook.add_worksheet(f"Forecast {len(workbook.worksheets()) + 1}")
+                    sheet.write_row(0, 0, header)
+                    row = 1
+                sheet.write_row(row, 0, values)
+                row += 1
+        if sheet is None:
+            workbook.add_worksheet("Forecast 1")
+        workbook.close()
+        tmp.seek(0)
+        while True:
+            data = tmp.read(read_size)
+            if not data:
+                return
+            yield data
+
+
+# format: (writer, content type, file extension)
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv', 'csv'),
+    'parquet': (iter_parquet, 'application/vnd.apache.parquet', 'parquet'),
+    'xlsx': (iter_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+FORMAT_LABELS = {'csv': 'CSV', 'parquet': 'Parquet', 'xlsx': 'Excel'}
+
+_OPTIONAL_MODULES = {'parquet': 'pyarrow', 'xlsx': 'xlsxwriter'}
+
+
+def available_formats():
+    """Export formats whose optional dependencies are installed"""
+    formats = []
+    for fmt in EXPORT_FORMATS:
+        try:
+            if fmt in _OPTIONAL_MODULES:
+                _require(_OPTIONAL_MODULES[fmt], FORMAT_LABELS[fmt])
+        except ExportError:
+            continue
+        formats.append(fmt)
+    return formats
+
+
+def export_forecasts(forecasts, package_names, fmt='csv', chunk_rows=DEFAULT_CHUNK_ROWS):
+    """(content type, file extension, byte chunk iterator) for an export format"""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    writer, content_type, extension = EXPORT_FORMATS[fmt]
+    if fmt in _OPTIONAL_MODULES:
+        _require(_OPTIONAL_MODULES[fmt], FORMAT_LABELS[fmt])  # Fail before the response starts, not mid-stream
+    return content_type, extension, writer(forecasts, package_names, chunk_rows)
@@ -0,0 +1,122 @@
+"""Discounted cash-flow metrics over monthly profit series.
+
+Every function takes cash flows shaped (..., months), one row per scenario
+(a single forecast, a sweep or Monte Carlo draws), and works on all rows at
+once. Month t (1-based) is discounted by (1 + r) ** -t, i.e. cash flows
+arrive at the end of each month. Rates passed to npv() and returned by irr()
+are per month; use monthly_rate() and annual_rate() to convert.
+"""
+import numpy as np
+
+# Monthly IRR search interval: -50%/month to +100%/month covers any plausible
+# business case while keeping the discount factors finite for long horizons
+IRR_BRACKET = (-0.5, 1.0)
+# Newton starts here: forecast IRRs are a few percent per month at most
+IRR_GUESS = 0.01
+
+
+def monthly_rate(annual_rate):
+    """Monthly rate compounding to annual_rate over 12 months"""
+    return (1 + np.asarray(annual_rate, dtype=float)) ** (1 / 12) - 1
+
+
+def annual_rate(monthly_rate):
+    """Annual rate from a monthly one"""
+    return (1 + np.asarray(monthly_rate, dtype=float)) ** 12 - 1
+
+
+def _discount_factors(rate, months):
+    """(..., months) factors (1 + rate) ** -t for t = 1..months; rate is scalar or (...,)"""
+    t = np.arange(1, months + 1)
+    return (1 + np.asarray(rate, dtype=float))[..., None] ** -t
+
+
+def npv(rate, cash_flows):
+    """Net present value per scenario at a monthly rate (scalar or one per scenario)"""
+    cash_flows = np.asarray(cash_flows, dtype=float)
+    return (cash_flows * _discount_factors(rate, cash_flows.shape[-1])).sum(axis=-1)
+
+
+def cumulative_cash(cash_flows, rate=None):
+    """Running total of the cash flows per month; discounted first when rate is given"""
+    cash_flows = np.asarray(cash_flows, dtype=float)
+    if rate is not None:
+        cash_flows = cash_flows * _discount_factors(rate, cash_flows.shape[-1])
+    return np.cumsum(cash_flows, axis=-1)
+
+
+def payback_month(cash_flows):
+    """First month from which cumulative cash stays non-negative (1 if it never dips), NaN if never"""
+    negative = np.cumsum(np.asarray(cash_flows, dtype=float), axis=-1) < 0
+    months = negative.shape[-1]
+    # 1-based index of the last month still under water (0 when there is none)
+    last_negative = np.where(negative.any(axis=-1), months - negative[..., ::-1].argmax(axis=-1), 0)
+    return np.where(last_negative < months, last_negative + 1, np.nan)
+
+
+def irr(cash_flows, tol=1e-10, max_iter=100):
+    """Monthly internal rate of return per scenario, NaN where none lies in IRR_BRACKET.
+
+    All scenarios are solved together by a safeguarded Newton iteration: each
+    step is a Newton step on the NPV, replaced by bisection of the current
+    sign-change bracket whenever Newton would leave it. Converged scenarios
+    drop out of the batch, so a few slow ones do not keep the rest iterating.
+    Scenarios without a sign change over the bracket (e.g. profitable from
+    month 1) have no IRR.
+    """
+    cash_flows = np.asarray(cash_flows, dtype=float)
+    shape = cash_flows.shape[:-1]
+    flows = cash_flows.reshape(-1, cash_flows.shape[-1])
+    t = np.arange(1, flows.shape[-1] + 1)
+    result = np.full(len(flows), np.nan)
+
+    lo = np.full(len(flows), IRR_BRACKET[0])
+    hi = np.full(len(flows), IRR_BRACKET[1])
+    npv_lo = npv(lo, flows)
+    npv_hi = npv(hi, flows)
+    result[npv_lo == 0] = lo[npv_lo == 0]
+    result[npv_hi == 0] = hi[npv_hi == 0]
+    # Still to solve: a strict sign change over the bracket
+    active = np.flatnonzero(np.sign(npv_lo) * np.sign(npv_hi) < 0)
+    flows, lo, hi, npv_lo = flows[active], lo[active], hi[active], npv_lo[active]
+    rate = np.full(len(active), IRR_GUESS)
+
+    for _ in range(max_iter):
+        if not len(active):
+            break
+        factors = _discount_factors(rate, flows.shape[-1])
+        value = (flows * factors).sum(axis=-1)
+        slope = -(flows * t * factors).sum(axis=-1) / (1 + rate)
+
+        # Keep the root bracketed: the end with the same sign as the value moves to rate
+        same_as_lo = np.sign(value) == np.sign(npv_lo)
+        lo = np.where(same_as_lo, rate, lo)
+        hi = np.where(same_as_lo, hi, rate)
+        npv_lo = np.where(same_as_lo, value, npv_lo)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = rate - value / slope
+        step = np.where((newton > lo) & (newton < hi), newton, (lo + hi) / 2)
+        converged = (np.abs(step - rate) <= tol * (1 + np.abs(rate))) | (value == 0)
+        rate = np.where(value == 0, rate, step)
+        result[active[converged]] = rate[converged]
+        keep = ~converged
+        active, flows, lo, hi, npv_lo, rate = (active[keep], flows[keep], lo[keep], hi[keep],
+                                               npv_lo[keep], rate[keep])
+    result[active] = rate  # Best estimate for any left after max_iter
+    return result.reshape(shape)
+
+
+def cash_flow_metrics(cash_flows, annual_discount_rate):
+    """NPV, IRR (monthly and annualized), payback month and cumulative cash per scenario"""
+    cash_flows = np.asarray(cash_flows, dtype=float)
+    rate = monthly_rate(annual_discount_rate)
+    monthly_irr = irr(cash_flows)
+    return {
+        'npv': npv(rate, cash_flows),
+        'irr_monthly': monthly_irr,
+        'irr_annual': annual_rate(monthly_irr),
+        'payback_month': payback_month(cash_flows),
+        'cumulative_cash': cumulative_cash(cash_flows),
+        'discounted_cumulative_cash': cumulative_cash(cash_flows, rate)
+    }
@@ -0,0 +1,362 @@
+import numpy as np
+
+from cache import make_key, shared_cache
+from config import FORECAST_DEFAULTS
+from currency import convert_amounts
+from electricity import hourly_electricity_revenue, load_price_curves
+from finance import cash_flow_metrics
+from metrics import timed
+from portfolio import UNSPECIFIED_CHARGER, get_portfolio_simulation, load_portfolio
+from seasonality import daily_multipliers, forecast_calendar, retained_total, validate_profile
+from tariff import get_tariff
+
+# Forecast fields holding money (base currency); everything else is counts or indexes
+MONETARY_FIELDS = (
+    'monthly_recurring_revenue', 'electricity_revenue', 'electricity_by_segment',
+    'one_time_revenue', 'total_revenue',
+    'base_platform_costs', 'overage_costs', 'discounts', 'platform_costs', 'variable_cost_per_customer',
+    'variable_costs', 'total_costs', 'profit', 'daily_revenue', 'daily_costs', 'daily_profit',
+    'portfolio_subscription_by_segment', 'portfolio_electricity_by_segment'
+)
+RESOLUTIONS = ('monthly', 'daily')
+ELECTRICITY_MODELS = ('flat', 'hourly')
+EXISTING_MODELS = ('count', 'portfolio')
+# Inputs that must be numbers (the defaults' numeric fields)
+NUMERIC_INPUTS = tuple(name for name, value in FORECAST_DEFAULTS.items()
+                       if isinstance(value, (int, float)) and not isinstance(value, bool))
+# Counts, fees and prices, which cannot be negative
+NON_NEGATIVE_INPUTS = ('monthly_subscription_fee', 'one_time_setup_fee', 'kwh_addon_price',
+                       'kwh_per_customer_monthly', 'existing_customers', 'customers_month_1', 'growth_cap',
+                       'spot_markup')
+# Longest horizon (50 years, the benchmark suite's longest)
+MAX_FORECAST_MONTHS = 600
+
+# Part of the forecast and lookup table cache keys; bump it when their fields change, so results
+# cached by older code (in the disk cache or saved scenarios) are recomputed instead of reused
+RESULT_LAYOUT = 2
+
+
+def forecast_inputs(tariff=None, **overrides):
+    """Return a complete forecast input dict, filling gaps from FORECAST_DEFAULTS.
+
+    Raises ValueError for unknown inputs, values of the wrong type or range,
+    a charger type that is not one of tariff's chargers (default: the current
+    tariff), and hourly or portfolio models whose data files are missing.
+    """
+    unknown = set(overrides) - set(FORECAST_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown forecast inputs: {', '.join(sorted(unknown))}")
+    inputs = dict(FORECAST_DEFAULTS)
+    inputs.update(overrides)
+    for name in NUMERIC_INPUTS:
+        value = inputs[name]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value):
+            raise ValueError(f"{name} must be a number")
+    for name in NON_NEGATIVE_INPUTS:
+        if inputs[name] < 0:
+            raise ValueError(f"{name} must not be negative")
+    if inputs['monthly_growth_rate'] <= -1:
+        raise ValueError("monthly_growth_rate must be above -1 (-100%)")
+    if (inputs['forecast_months'] != int(inputs['forecast_months'])
+            or not 1 <= inputs['forecast_months'] <= MAX_FORECAST_MONTHS):
+        raise ValueError(f"forecast_months must be a whole number of months from 1 to {MAX_FORECAST_MONTHS}")
+    if inputs['start_month'] not in range(1, 13):
+        raise ValueError("start_month must be a calendar month from 1 to 12")
+    if not 0 <= inputs['customer_retention_rate'] <= 1:
+        raise ValueError("customer_retention_rate must be between 0 and 1")
+    tariff = tariff if tariff is not None else get_tariff()
+    if not isinstance(inputs['charger_type'], str) or inputs['charger_type'] not in tariff.charger_types:
+        raise ValueError(f"Unknown charger_type: {inputs['charger_type']!r}")
+    if inputs['resolution'] not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    if inputs['electricity_model'] not in ELECTRICITY_MODELS:
+        raise ValueError(f"electricity_model must be one of {', '.join(ELECTRICITY_MODELS)}")
+    if inputs['existing_model'] not in EXISTING_MODELS:
+        raise ValueError(f"existing_model must be one of {', '.join(EXISTING_MODELS)}")
+    validate_profile('weekly_seasonality', inputs['weekly_seasonality'], 7)
+    validate_profile('annual_seasonality', inputs['annual_seasonality'], 12)
+    # Fail here rather than in the middle of a forecast when the model's data is missing
+    if inputs['electricity_model'] == 'hourly':
+        _required_curves()
+    if inputs['existing_model'] == 'portfolio':
+        _required_portfolio()
+    return inputs
+
+
+def optimal_package_table(calculator, max_orders):
+    """Optimal package breakdown for every order volume 0..max_orders, cached per module selection"""
+    key = make_key('optimal_table', calculator.tariff.version,
+                   sorted(calculator.selected_modules), int(max_orders), RESULT_LAYOUT)
+    return shared_cache.get_or_compute(
+        key, lambda: calculator.find_optimal_packages(np.arange(int(max_orders) + 1)))
+
+
+def optimal_packages(calculator, orders, contract_months=1, max_table_orders=1000):
+    """Optimal package per order volume, using the cached lookup table when it covers the range.
+
+    Discount rules can depend on the contract month, so with discounts every
+    month is priced directly (still one vectorized call).
+    """
+    orders = np.asarray(orders)
+    if calculator.tariff.discounts:
+        return calculator.find_optimal_packages(orders, contract_months)
+    if orders.size and orders.min() >= 0 and orders.max() <= max_table_orders:
+        table = optimal_package_table(calculator, max_table_orders)
+        index = orders.astype(int)
+        return {name: values[index] for name, values in table.items()}
+    return calculator.find_optimal_packages(orders)
+
+
+@timed("forecast")
+def run_forecast(calculator, inputs):
+    """Monthly customer, revenue and cost projection as NumPy arrays.
+
+    New customers are truncated to whole customers for package selection and
+    variable costs, while revenues use the fractional values (as the
+    calculator page always has). In portfolio mode the existing customers
+    come from the portfolio file, each with its own fee, consumption and
+    churn, instead of existing_customers.
+    """
+    tariff = calculator.tariff
+    forecast_months = int(inputs['forecast_months'])
+    months = np.arange(1, forecast_months + 1)
+    portfolio = None
+    existing_customers = inputs['existing_customers']
+    if inputs['existing_model'] == 'portfolio':
+        portfolio = _portfolio_simulation(tariff, inputs, forecast_months)
+        existing_customers = 0
+
+    # New customers per month with optional growth cap (0 means no cap)
+    new_cust = inputs['customers_month_1'] * (1 + inputs['monthly_growth_rate']) ** (months - 1)
+    if inputs['resolution'] == 'daily':
+        daily = _daily_customers(inputs, new_cust, existing_customers)
+        new_cust = daily['new_cust']
+        active = daily['active_end']
+        # Subscriptions and electricity are billed pro rata per day: the month's average customer base
+        billed = daily['active_mean']
+    else:
+        daily = None
+        if inputs['growth_cap'] > 0:
+            new_cust = np.minimum(new_cust, inputs['growth_cap'])
+
+        # Active customers: retained previous base plus this month's new customers
+        active = np.empty(forecast_months)
+        active_customers = existing_customers
+        retention = inputs['customer_retention_rate']
+        for i in range(forecast_months):
+            active_customers = active_customers * retention + new_cust[i]
+            active[i] = active_customers
+        billed = active
+    new_customers = new_cust.astype(int)
+
+    mrr = billed * inputs['monthly_subscription_fee']
+    existing_active = 0
+    if portfolio is not None:
+        # Portfolio customers pay their own fees; they are simulated per month, also at daily resolution
+        existing_active = portfolio['active_by_segment'].sum(axis=0)
+        active = active + existing_active
+        mrr = mrr + portfolio['subscription_by_segment'].sum(axis=0)
+        if daily is not None:
+            daily['active_per_day'] = daily['active_per_day'] + existing_active[daily['calendar']['month_of_day']]
+    if inputs['electricity_model'] == 'hourly':
+        electricity_revenue, electricity_by_segment = hourly_electricity_revenue(
+            _required_curves(), billed + existing_active, inputs['kwh_addon_price'], inputs['spot_markup'],
+            inputs['start_month'])
+    else:
+        electricity_revenue = billed * inputs['kwh_per_customer_monthly'] * inputs['kwh_addon_price']
+        if portfolio is not None:
+            electricity_revenue = (electricity_revenue
+                                   + portfolio['kwh_by_segment'].sum(axis=0) * inputs['kwh_addon_price'])
+        electricity_by_segment = electricity_revenue[:, None]
+    one_time_revenue = new_cust * inputs['one_time_setup_fee']  # Only new customers pay setup fee
+    total_revenue = mrr + electricity_revenue + one_time_revenue
+
+    # Platform cost with automatic package optimization on new customers per month; forecast
+    # month n is contract month n for discount rules
+    optimal = optimal_packages(calculator, new_customers, months)
+
+    variable_cost_per_customer = (tariff.external_fees["Standard installation"]["amount"]
+                                  + tariff.external_fees[inputs['charger_type']]["amount"])
+    variable_costs = new_customers * variable_cost_per_customer
+    total_costs = optimal['total'] + variable_costs
+
+    forecast = {
+        'months': months,
+        'new_customers': new_customers,
+        'active_customers': active.astype(int),
+        'monthly_recurring_revenue': mrr,
+        'electricity_revenue': electricity_revenue,
+        'electricity_by_segment': electricity_by_segment,
+        'one_time_revenue': one_time_revenue,
+        'total_revenue': total_revenue,
+        'optimal_package_index': optimal['package_index'],
+        'base_platform_costs': optimal['base_modules'],
+        'overage_orders': optimal['overage_orders'],
+        'overage_costs': optimal['overage_cost'],
+        'discounts': optimal['discount'],
+        'platform_costs': optimal['total'],
+        'variable_cost_per_customer': variable_cost_per_customer,
+        'variable_costs': variable_costs,
+        'total_costs': total_costs,
+        'profit': total_revenue - total_costs
+    }
+    if portfolio is not None:
+        forecast.update(_portfolio_fields(portfolio, billed + existing_active, electricity_revenue, inputs))
+    if daily is not None:
+        forecast.update(_daily_cash_flow(daily, forecast, inputs))
+    return forecast
+
+
+def _daily_customers(inputs, monthly_new_cust, existing_customers):
+    """Day-level new and active customers for the monthly growth curve, with seasonality.
+
+    Each month's new customers are spread over its days by the seasonality
+    multipliers, the growth cap is applied to the resulting monthly totals,
+    and monthly retention is compounded per day. Monthly figures are summed
+    back from the days with np.add.reduceat over the billing months.
+    """
+    calendar = forecast_calendar(len(monthly_new_cust), inputs['start_month'])
+    month_of_day, starts = calendar['month_of_day'], calendar['month_starts']
+    days_in_month = calendar['days_in_month']
+
+    season = daily_multipliers(calendar, inputs['weekly_seasonality'], inputs['annual_seasonality'])
+    new_per_day = (monthly_new_cust / days_in_month)[month_of_day] * season
+    if inputs['growth_cap'] > 0:
+        # Scale down the days of months whose seasonal total exceeds the cap
+        totals = np.add.reduceat(new_per_day, starts)
+        scale = np.minimum(1.0, inputs['growth_cap'] / np.maximum(totals, 1e-12))
+        new_per_day = new_per_day * scale[month_of_day]
+
+    retention_per_day = (inputs['customer_retention_rate'] ** (1.0 / days_in_month))[month_of_day]
+    active_per_day = retained_total(new_per_day, retention_per_day, existing_customers)
+    return {
+        'calendar': calendar,
+        'new_per_day': new_per_day,
+        'active_per_day': active_per_day,
+        # Rounded so summation error cannot drop a whole customer when truncated to int
+        'new_cust': np.round(np.add.reduceat(new_per_day, starts), 9),
+        'active_end': active_per_day[starts + days_in_month - 1],
+        'active_mean': np.add.reduceat(active_per_day, starts) / days_in_month
+    }
+
+
+def _spread(monthly, weights, calendar):
+    """Distribute monthly amounts over their days in proportion to weights (evenly where they are 0)"""
+    month_of_day = calendar['month_of_day']
+    weight_sums = np.add.reduceat(weights, calendar['month_starts'])
+    even = 1.0 / calendar['days_in_month']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = np.where(weight_sums[month_of_day] > 0, weights / weight_sums[month_of_day], even[month_of_day])
+    return monthly[month_of_day] * share
+
+
+def _daily_cash_flow(daily, forecast, inputs):
+    """Daily revenue, cost and profit that sum exactly to the monthly forecast figures"""
+    calendar = daily['calendar']
+    days = len(calendar['month_of_day'])
+    revenue = (_spread(forecast['monthly_recurring_revenue'] + forecast['electricity_revenue'],
+                       daily['active_per_day'], calendar)
+               + daily['new_per_day'] * inputs['one_time_setup_fee'])
+    # The package is billed for the month; installations happen on the days customers join
+    costs = (_spread(forecast['platform_costs'], np.ones(days), calendar)
+             + _spread(forecast['variable_costs'], daily['new_per_day'], calendar))
+    return {
+        'day_month': calendar['month_of_day'] + 1,
+        'month_starts': calendar['month_starts'],
+        'daily_new_customers': daily['new_per_day'],
+        'daily_active_customers': daily['active_per_day'],
+        'daily_revenue': revenue,
+        'daily_costs': costs,
+        'daily_profit': revenue - costs
+    }
+
+
+def _required_curves():
+    curves = load_price_curves()
+    if curves is None:
+        raise ValueError("The hourly electricity model needs a curves directory (see electricity.py)")
+    return curves
+
+
+def _required_portfolio():
+    portfolio = load_portfolio()
+    if portfolio is None:
+        raise ValueError("Portfolio mode needs a portfolio file (see portfolio.py)")
+    return portfolio
+
+
+def _portfolio_simulation(tariff, inputs, forecast_months):
+    """Cached per-customer simulation of the portfolio; missing values take the forecast inputs"""
+    portfolio = _required_portfolio()
+    unknown = set(portfolio.charger_names) - set(tariff.external_fees) - {UNSPECIFIED_CHARGER}
+    if unknown:
+        raise ValueError(f"Unknown charger types in the portfolio: {', '.join(sorted(unknown))}")
+    simulation = get_portfolio_simulation(portfolio, forecast_months, inputs['kwh_per_customer_monthly'],
+                                          1 - inputs['customer_retention_rate'])
+    return dict(simulation, segments=portfolio.segment_names, chargers=portfolio.charger_names)
+
+
+def _portfolio_fields(portfolio, billed, electricity_revenue, inputs):
+    """Forecast fields with the portfolio's customers and revenue by segment (and charger type)"""
+    if inputs['electricity_model'] == 'hourly':
+        # Hourly revenue is per billed customer, so the portfolio's share follows its survivors
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(billed > 0, portfolio['active_by_segment'] / billed, 0.0)
+        electricity = share * electricity_revenue
+    else:
+        electricity = portfolio['kwh_by_segment'] * inputs['kwh_addon_price']
+    return {
+        'portfolio_segments': np.array(portfolio['segments']),
+        'portfolio_chargers': np.array(portfolio['chargers']),
+        'portfolio_active_by_segment': portfolio['active_by_segment'],
+        'portfolio_active_by_charger': portfolio['active_by_charger'],
+        'portfolio_subscription_by_segment': portfolio['subscription_by_segment'],
+        'portfolio_electricity_by_segment': electricity
+    }
+
+
+def forecast_key(calculator, inputs):
+    """Cache key for a forecast; the selected package does not affect the projection"""
+    curves_version = _required_curves().version if inputs['electricity_model'] == 'hourly' else None
+    portfolio_version = _required_portfolio().version if inputs['existing_model'] == 'portfolio' else None
+    return make_key('forecast', calculator.tariff.version, sorted(calculator.selected_modules),
+                    inputs, curves_version, portfolio_version, calculator.discount_codes, RESULT_LAYOUT)
+
+
+def get_forecast(calculator, inputs):
+    """run_forecast backed by the shared cache"""
+    return shared_cache.get_or_compute(forecast_key(calculator, inputs),
+                                       lambda: run_forecast(calculator, inputs))
+
+
+def sweep_forecasts(calculator, inputs, parameter, values, currency=None):
+    """Lazily yield (index, forecast) with one input varied over values.
+
+    Sweep forecasts are not cached (there can be very many of them); each is
+    computed when the consumer, e.g. a streaming export, asks for it.
+    """
+    if parameter not in FORECAST_DEFAULTS:
+        raise ValueError(f"Unknown forecast input: {parameter}")
+    for index, value in enumerate(values):
+        forecast = run_forecast(calculator, dict(inputs, **{parameter: value}))
+        yield index, forecast if currency is None else convert_forecast(forecast, currency)
+
+
+def sweep_metrics(calculator, inputs, parameter, values, annual_discount_rate):
+    """Cash-flow metrics (finance.cash_flow_metrics) for every sweep value in one batch.
+
+    The profit series are stacked into a (values, months) matrix, zero-padded
+    when forecast_months is the swept input; trailing zero months change none
+    of the metrics.
+    """
+    profits = [forecast['profit'] for _, forecast in sweep_forecasts(calculator, inputs, parameter, values)]
+    matrix = np.zeros((len(profits), max(len(profit) for profit in profits)))
+    for row, profit in zip(matrix, profits):
+        row[:len(profit)] = profit
+    return cash_flow_metrics(matrix, annual_discount_rate)
+
+
+@timed("forecast_convert")
+def convert_forecast(forecast, currency):
+    """Express a (cached) forecast in currency with one vectorized multiply per money column"""
+    return convert_amounts(forecast, [field for field in MONETARY_FIELDS if field in forecast], currency)
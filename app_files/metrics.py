@@ -0,0 +1,230 @@
+"""Lightweight span timers exported in the Prometheus text format.
+
+    with span("forecast"):
+        ...
+
+    @timed("find_optimal_packages")
+    def find_optimal_packages(...):
+
+Spans record nothing unless PRICING_METRICS=1, or the current Streamlit rerun
+is being recorded for the sidebar timing panel; otherwise span() returns a
+shared no-op context manager. Enabled spans feed per-span call counters and
+latency histograms, which are served at http://host:PRICING_METRICS_PORT/metrics
+and/or written to PRICING_METRICS_FILE (at most every PRICING_METRICS_FILE_SECONDS).
+The API exposes the same text at GET /metrics.
+"""
+import bisect
+import functools
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache import shared_cache
+
+ENABLED = os.environ.get("PRICING_METRICS", "").lower() in ("1", "true", "yes")
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_local = threading.local()
+
+
+class SpanRegistry:
+    """Call counts and latency histograms per span name (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+            stats['buckets'][bisect.bisect_left(BUCKETS, seconds)] += 1
+            stats['sum'] += seconds
+            stats['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: {'buckets': list(stats['buckets']), 'sum': stats['sum'], 'count': stats['count']}
+                    for name, stats in self._spans.items()}
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+registry = SpanRegistry()
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'started', 'depth', 'entry')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.depth = getattr(_local, 'depth', 0)
+        _local.depth = self.depth + 1
+        rerun = getattr(_local, 'rerun', None)
+        # Reserve the slot on entry so the breakdown lists spans in call order
+        self.entry = None
+        if rerun is not None:
+            self.entry = [self.name, self.depth, None]
+            rerun.append(self.entry)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        _local.depth = self.depth
+        if self.entry is not None:
+            self.entry[2] = elapsed
+        if ENABLED:
+            registry.observe(self.name, elapsed)
+        return False
+
+
+def span(name):
+    """Context manager timing a block under name (a shared no-op when nothing is recording)"""
+    if ENABLED or getattr(_local, 'rerun', None) is not None:
+        return _Span(name)
+    return _NOOP
+
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def begin_rerun(record=False):
+    """Start a Streamlit rerun on this thread; record=True collects its span breakdown"""
+    _local.depth = 0
+    _local.rerun = [] if record else None
+
+
+def end_rerun():
+    """Finish the rerun: returns its breakdown [(name, depth, seconds)] (empty unless recorded)"""
+    rerun = getattr(_local, 'rerun', None)
+    _local.rerun = None
+    if ENABLED:
+        _maybe_write_file()
+    return [tuple(entry) for entry in rerun or () if entry[2] is not None]
+
+
+def _format_le(bound):
+    return f"{bound:g}"
+
+
+def render_prometheus():
+    """All span histograms plus result cache counters in Prometheus text exposition format"""
+    lines = [
+        "# HELP pricing_span_duration_seconds Time spent in instrumented code paths",
+        "# TYPE pricing_span_duration_seconds histogram",
+    ]
+    for name, stats in sorted(registry.snapshot().items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), stats['buckets']):
+            cumulative += count
+            le = "+Inf" if bound == float('inf') else _format_le(bound)
+            lines.append(f'pricing_span_duration_seconds_bucket{{span="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'pricing_span_duration_seconds_sum{{span="{name}"}} {stats["sum"]:.6f}')
+        lines.append(f'pricing_span_duration_seconds_count{{span="{name}"}} {stats["count"]}')
+
+    cache_stats = shared_cache.stats()
+    tiers = [('memory', cache_stats)]
+    if 'shared' in cache_stats:
+        tiers.append(('disk', cache_stats['shared']))
+    for metric, field, description in (('pricing_cache_hits_total', 'hits', "Result cache hits"),
+                                       ('pricing_cache_misses_total', 'misses', "Result cache misses")):
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+        lines += [f'{metric}{{tier="{tier}"}} {stats[field]}' for tier, stats in tiers]
+    lines += [
+        "# HELP pricing_cache_entries Entries in the in-process result cache",
+        "# TYPE pricing_cache_entries gauge",
+        f"pricing_cache_entries {cache_stats['entries']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+_file_state = {'written': 0.0}
+_file_lock = threading.Lock()
+
+
+def _maybe_write_file():
+    path = os.environ.get("PRICING_METRICS_FILE")
+    if not path:
+        return
+    interval = float(os.environ.get("PRICING_METRICS_FILE_SECONDS", "5"))
+    with _file_lock:
+        now = time.monotonic()
+        if now - _file_state['written'] < interval:
+            return
+        _file_state['written'] = now
+    write_metrics_file(path)
+
+
+def write_metrics_file(path):
+    """Write the metrics atomically (for a node_exporter textfile collector or similar)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are too frequent to log
+
+
+_server = {}
+_server_lock = threading.Lock()
+
+
+def start_metrics_server():
+    """Serve /metrics on PRICING_METRICS_PORT in a daemon thread (once per process); no-op if unset"""
+    port = os.environ.get("PRICING_METRICS_PORT")
+    if not ENABLED or not port:
+        return None
+    with _server_lock:
+        if 'server' not in _server:
+            server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+            _server['server'] = server
+        return _server['server']
@@ -0,0 +1,257 @@
+"""Per-customer simulation of an existing customer base (portfolio mode).
+
+A portfolio file is a Parquet, Feather/Arrow or CSV table with one row per
+existing customer:
+
+    monthly_fee        subscription fee in the base currency (required)
+    segment            customer segment name (default "All")
+    charger_type       installed charger, an EXTERNAL_FEES name (optional)
+    kwh_per_month      electricity consumption (default: the forecast's kWh/customer/month)
+    churn_rate         monthly churn probability 0..1 (default: 1 - the forecast's retention)
+
+Other columns (e.g. customer_id) are ignored. Empty values take the
+defaults. Reading needs the optional pyarrow package.
+
+Each customer still subscribes after m months with probability
+(1 - churn_rate) ** m, so the simulation returns expected active
+customers, subscription revenue and kWh per (segment, month) and active
+customers per (charger type, month). Customers are kept sorted by
+(segment, charger type) as flat NumPy columns (about 30 bytes each), and
+the months are simulated in chunks sized so the (months, customers) survival
+matrix stays under max_elements; each chunk is summed per group with
+np.add.reduceat and weighted by fee and kWh in one matrix product per group.
+
+Generate a synthetic file with ``python portfolio.py generate FILE [CUSTOMERS]``.
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from cache import make_key, shared_cache
+
+DEFAULT_PORTFOLIO_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "portfolio.parquet")
+COLUMNS = ("monthly_fee", "segment", "charger_type", "kwh_per_month", "churn_rate")
+DEFAULT_SEGMENT = "All"
+UNSPECIFIED_CHARGER = "Unspecified"
+# Survival matrix budget per chunk of months: 8M float64 values = 64 MB
+MAX_ELEMENTS = 8_000_000
+
+
+class PortfolioError(ValueError):
+    """The portfolio file cannot be read or has invalid values"""
+
+
+def _require(module):
+    try:
+        return __import__(module, fromlist=['_'])
+    except ImportError:
+        raise PortfolioError(f"Portfolio files need the optional '{module.split('.')[0]}' package") from None
+
+
+def read_portfolio_table(path):
+    """pyarrow Table of the COLUMNS present in a .parquet, .feather/.arrow or .csv file"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        pq = _require('pyarrow.parquet')
+        names = pq.read_schema(path).names
+        return pq.read_table(path, columns=[name for name in COLUMNS if name in names])
+    if extension in (".feather", ".arrow"):
+        names = _require('pyarrow.ipc').open_file(path).schema.names
+        return _require('pyarrow.feather').read_table(path, columns=[name for name in COLUMNS if name in names])
+    if extension == ".csv":
+        return _require('pyarrow.csv').read_csv(path)
+    raise PortfolioError(f"{path}: unsupported portfolio file type (use .parquet, .feather, .arrow or .csv)")
+
+
+def _numbers(table, name):
+    """Float64 column with NaN for missing values (all NaN when the column is absent)"""
+    pa = _require('pyarrow')
+    if name not in table.column_names:
+        return np.full(table.num_rows, np.nan)
+    try:
+        return table.column(name).cast(pa.float64()).to_numpy()
+    except pa.ArrowInvalid:
+        raise PortfolioError(f"Portfolio column '{name}' must be numeric") from None
+
+
+def _categories(table, name, default):
+    """(codes, names) for a text column; missing or empty values and an absent column take default"""
+    pa = _require('pyarrow')
+    pc = _require('pyarrow.compute')
+    if name not in table.column_names:
+        return np.zeros(table.num_rows, dtype=np.int32), (default,)
+    column = pc.utf8_trim_whitespace(table.column(name).cast(pa.string()))
+    column = pc.if_else(pc.equal(column, ""), default, column).fill_null(default)
+    # Dictionary encoding keeps a million customers out of Python strings
+    encoded = column.combine_chunks().dictionary_encode()
+    return encoded.indices.to_numpy().astype(np.int32), tuple(encoded.dictionary.to_pylist())
+
+
+class Portfolio:
+    """Columns of a portfolio file, sorted by (segment, charger type)"""
+
+    def __init__(self, path):
+        self.path = path
+        table = read_portfolio_table(path)
+        if 'monthly_fee' not in table.column_names:
+            raise PortfolioError(f"{path}: a 'monthly_fee' column is required")
+        if table.num_rows == 0:
+            raise PortfolioError(f"{path}: the portfolio has no customers")
+
+        segments, self.segment_names = _categories(table, 'segment', DEFAULT_SEGMENT)
+        chargers, self.charger_names = _categories(table, 'charger_type', UNSPECIFIED_CHARGER)
+        fee = _numbers(table, 'monthly_fee')
+        kwh = _numbers(table, 'kwh_per_month')
+        churn = _numbers(table, 'churn_rate')
+        del table
+
+        if np.isnan(fee).any() or (fee < 0).any():
+            raise PortfolioError(f"{path}: monthly_fee must be a non-negative number for every customer")
+        if (kwh < 0).any():
+            raise PortfolioError(f"{path}: kwh_per_month must not be negative")
+        if ((churn < 0) | (churn > 1)).any():
+            raise PortfolioError(f"{path}: churn_rate must be between 0 and 1")
+
+        # One group per (segment, charger type) pair present, customers contiguous per group
+        group = segments * len(self.charger_names) + chargers
+        order = np.argsort(group, kind='stable')
+        group = group[order]
+        self.monthly_fee = fee[order]
+        self.kwh_per_month = kwh[order]
+        self.churn_rate = churn[order]
+        self.group_starts = np.flatnonzero(np.concatenate(([True], group[1:] != group[:-1])))
+        self.group_segment = group[self.group_starts] // len(self.charger_names)
+        self.group_charger = group[self.group_starts] % len(self.charger_names)
+
+        # Identify the file for cache keys without hashing its contents
+        stat = os.stat(path)
+        fingerprint = [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+        self.version = hashlib.sha256(json.dumps(fingerprint).encode()).hexdigest()[:12]
+
+    def __len__(self):
+        return len(self.monthly_fee)
+
+    def customers_by_segment(self):
+        counts = np.diff(np.append(self.group_starts, len(self)))
+        return np.bincount(self.group_segment, weights=counts, minlength=len(self.segment_names))
+
+
+_portfolios = {}
+
+
+def load_portfolio(path=None):
+    """Portfolio for path (default PRICING_PORTFOLIO_FILE or ./portfolio.parquet), or None if absent.
+
+    Reloaded when the file changes.
+    """
+    path = path or os.environ.get("PRICING_PORTFOLIO_FILE", DEFAULT_PORTFOLIO_FILE)
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    cached = _portfolios.get(path)
+    if cached is None or cached[0] != (stat.st_size, stat.st_mtime_ns):
+        cached = _portfolios[path] = ((stat.st_size, stat.st_mtime_ns), Portfolio(path))
+    return cached[1]
+
+
+def simulate_portfolio(portfolio, months, default_kwh, default_churn, max_elements=MAX_ELEMENTS):
+    """Expected survivors, subscription revenue and kWh per segment and month.
+
+    Returns a dict of arrays: 'active_by_segment', 'subscription_by_segment'
+    and 'kwh_by_segment' shaped (segments, months), and 'active_by_charger'
+    shaped (chargers, months); month m is m months after today.
+    """
+    survive = 1 - np.where(np.isnan(portfolio.churn_rate), default_churn, portfolio.churn_rate)
+    kwh = np.where(np.isnan(portfolio.kwh_per_month), default_kwh, portfolio.kwh_per_month)
+    weights = np.stack([portfolio.monthly_fee, kwh])
+
+    groups = len(portfolio.group_starts)
+    ends = np.append(portfolio.group_starts[1:], len(portfolio))
+    active = np.zeros((groups, months))
+    amounts = np.zeros((2, groups, months))
+    step = max(1, min(months, max_elements // len(portfolio)))
+    survival = np.empty((step, len(portfolio)))  # (months in chunk, customers), reused per chunk
+    survivors = np.ones(len(portfolio))
+    for first in range(0, months, step):
+        count = min(step, months - first)
+        # Each month's survival probabilities are the previous month's times (1 - churn)
+        for row in survival[:count]:
+            survivors = np.multiply(survivors, survive, out=row)
+        survivors = survivors.copy()
+        chunk = slice(first, first + count)
+        active[:, chunk] = np.add.reduceat(survival[:count], portfolio.group_starts, axis=1).T
+        for index, (start, end) in enumerate(zip(portfolio.group_starts, ends)):
+            # Fee- and kWh-weighted survivor sums of the group in one matrix product
+            amounts[:, index, chunk] = weights[:, start:end] @ survival[:count, start:end].T
+
+    def by(labels, count, values):
+        totals = np.zeros((count, months))
+        np.add.at(totals, labels, values)
+        return totals
+
+    segments = len(portfolio.segment_names)
+    return {
+        'active_by_segment': by(portfolio.group_segment, segments, active),
+        'subscription_by_segment': by(portfolio.group_segment, segments, amounts[0]),
+        'kwh_by_segment': by(portfolio.group_segment, segments, amounts[1]),
+        'active_by_charger': by(portfolio.group_charger, len(portfolio.charger_names), active)
+    }
+
+
+def get_portfolio_simulation(portfolio, months, default_kwh, default_churn):
+    """simulate_portfolio backed by the shared cache"""
+    key = make_key("portfolio", portfolio.version, int(months), float(default_kwh), float(default_churn))
+    return shared_cache.get_or_compute(
+        key, lambda: simulate_portfolio(portfolio, int(months), default_kwh, default_churn))
+
+
+def write_synthetic_portfolio(path, customers=1_000_000, seed=0):
+    """Synthetic portfolio: three segments with their own fee, consumption and churn levels"""
+    pa = _require('pyarrow')
+    rng = np.random.default_rng(seed)
+    segment_names = ["Residential", "Commuter", "Fleet"]
+    segment = rng.choice(len(segment_names), customers, p=[0.7, 0.2, 0.1])
+    fee = np.array([39.0, 49.0, 99.0])[segment] * rng.choice([0.8, 1.0, 1.2], customers)
+    kwh = rng.gamma(4.0, np.array([100.0, 75.0, 300.0])[segment])
+    churn = rng.beta(2.0, np.array([150.0, 100.0, 300.0])[segment])
+    charger = rng.choice(["NexBlue Edge", "Zaptec Go"], customers, p=[0.6, 0.4])
+    table = pa.table({
+        'customer_id': np.arange(1, customers + 1),
+        'segment': pa.DictionaryArray.from_arrays(segment.astype(np.int32), segment_names),
+        'monthly_fee': fee,
+        'charger_type': charger,
+        'kwh_per_month': np.round(kwh, 1),
+        'churn_rate': np.round(churn, 4)
+    })
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        _require('pyarrow.csv').write_csv(table, path)
+    elif extension in (".feather", ".arrow"):
+        _require('pyarrow.feather').write_feather(table, path)
+    else:
+        _require('pyarrow.parquet').write_table(table, path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or sys.argv[1] not in ("generate", "simulate"):
+        sys.exit("Usage: python portfolio.py generate FILE [CUSTOMERS] | simulate FILE [MONTHS]")
+    if sys.argv[1] == "generate":
+        write_synthetic_portfolio(sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else 1_000_000)
+        print(f"Wrote a synthetic portfolio to {sys.argv[2]}")
+    else:
+        months = int(sys.argv[3]) if len(sys.argv) == 4 else 36
+        started = time.perf_counter()
+        portfolio = Portfolio(sys.argv[2])
+        loaded = time.perf_counter()
+        result = simulate_portfolio(portfolio, months, default_kwh=0.0, default_churn=0.0)
+        done = time.perf_counter()
+        print(f"{len(portfolio):,} customers loaded in {loaded - started:.2f}s, "
+              f"{months} months simulated in {done - loaded:.2f}s")
+        for name, count, active, revenue in zip(portfolio.segment_names, portfolio.customers_by_segment(),
+                                                result['active_by_segment'], result['subscription_by_segment']):
+            print(f"  {name}: {count:,.0f} customers, {active[-1]:,.0f} left in month {months}, "
+                  f"{revenue.sum():,.0f} subscription revenue")
@@ -1,52 +1,75 @@
-from pricing_config import MODULES, PACKAGE_SIZES
+import numpy as np
+
+from currency import BASE_CURRENCY, format_money, fx_rate
+from discounts import normalize_codes
+from metrics import timed
+from tariff import get_tariff, overage_bands
 
 class PricingCalculator:
     
-    def __init__(self, selected_modules, selected_package):
+    def __init__(self, selected_modules, selected_package, tariff=None, currency=BASE_CURRENCY, discount_codes=()):
+        self.tariff = tariff if tariff is not None else get_tariff()
+        self.currency = currency  # Only used for human-readable text; amounts stay in the base currency
+        self.modules = self.tariff.modules
+        self.package_sizes = self.tariff.package_sizes
         self.selected_modules = selected_modules
         self.selected_package = selected_package
-        self.package_info = PACKAGE_SIZES[selected_package]
+        self.package_info = self.package_sizes[selected_package]
+        # Discount rules see the selection as a bitmask; coded rules apply only with their code
+        self.discount_codes = normalize_codes(discount_codes)
+        self.module_mask = self.tariff.module_mask([name for name in selected_modules if name in self.modules])
+        self.active_discounts = self.tariff.discounts.active(self.discount_codes)
+    
+    def _discount(self, package_index, orders, contract_months, base_modules, totals):
+        """Discount from the tariff's rules for this selection; arguments broadcast like totals"""
+        return self.tariff.discounts.evaluate(self.module_mask, package_index, orders, contract_months,
+                                              base_modules, totals, self.active_discounts)
     
-    def calculate_cost_for_package(self, package_name, expected_orders):
+    def calculate_cost_for_package(self, package_name, expected_orders, contract_month=1):
         """Calculate total cost for a specific package and order volume"""
-        package_info = PACKAGE_SIZES[package_name]
+        package_info = self.package_sizes[package_name]
         
         # Calculate base module costs for this package
         base_modules = 0
         for module_name in self.selected_modules:
-            if module_name in MODULES:
-                module_price = MODULES[module_name]['prices'][package_name]
+            if module_name in self.modules:
+                module_price = self.modules[module_name]['prices'][package_name]
                 base_modules += module_price
         
         # Calculate overage costs
         order_limit = package_info['order_limit']
-        overage_fee = package_info['overage_fee']
         
         if expected_orders > order_limit:
             overage_orders = expected_orders - order_limit
-            overage_cost = overage_orders * overage_fee
+            overage_cost = float(self.tariff.overage_cost(self.tariff.package_index(package_name), overage_orders))
         else:
             overage_orders = 0
             overage_cost = 0
         
         total_cost = base_modules + overage_cost
+        discount = 0
+        if self.tariff.discounts:
+            discount = float(self._discount(self.tariff.package_index(package_name), expected_orders,
+                                            contract_month, base_modules, total_cost))
+            total_cost -= discount
         
         return {
             'package_name': package_name,
             'base_modules': base_modules,
             'overage_orders': overage_orders,
             'overage_cost': overage_cost,
+            'discount': discount,
             'total': total_cost
         }
     
-    def find_optimal_package(self, expected_orders):
+    def find_optimal_package(self, expected_orders, contract_month=1):
         """Find the most cost-effective package for the given order volume"""
         package_costs = {}
-        package_names = list(PACKAGE_SIZES.keys())
+        package_names = list(self.package_sizes.keys())
         
         # Calculate costs for all packages
         for package_name in package_names:
-            cost_info = self.calculate_cost_for_package(package_name, expected_orders)
+            cost_info = self.calculate_cost_for_package(package_name, expected_orders, contract_month)
             package_costs[package_name] = cost_info
         
         # Find the package with minimum total cost
@@ -59,6 +82,43 @@ class PricingCalculator:
             'savings': self._calculate_savings(package_costs, optimal_package)
         }
     
+    @timed("find_optimal_packages")
+    def find_optimal_packages(self, orders, contract_months=1):
+        """Vectorized find_optimal_package over an array of order volumes.
+
+        contract_months (broadcast against orders) only matters when discount
+        rules depend on the contract month.
+        """
+        orders = np.asarray(orders, dtype=float)
+        tariff = self.tariff
+        
+        # Base module cost per package for the selected modules
+        base_modules = tariff.module_prices[tariff.module_indices(self.selected_modules)].sum(axis=0)
+        
+        # Overage per (order volume, package)
+        overage_orders = np.maximum(orders[..., None] - tariff.order_limits, 0)
+        overage_cost = tariff.overage_costs(overage_orders)
+        totals = base_modules + overage_cost
+        if tariff.discounts:
+            # Discounts per (order volume, package), so the cheapest package is chosen after discounts
+            discount = self._discount(np.arange(len(tariff.package_names)), orders[..., None],
+                                      np.asarray(contract_months, dtype=float)[..., None], base_modules, totals)
+            totals = totals - discount
+        
+        # argmin keeps the first package on ties, like min() in find_optimal_package
+        package_index = totals.argmin(axis=-1)
+        pick = package_index[..., None]
+        
+        return {
+            'package_index': package_index,
+            'base_modules': base_modules[package_index],
+            'overage_orders': np.take_along_axis(overage_orders, pick, axis=-1)[..., 0],
+            'overage_cost': np.take_along_axis(overage_cost, pick, axis=-1)[..., 0],
+            'discount': (np.take_along_axis(discount, pick, axis=-1)[..., 0] if tariff.discounts
+                         else np.zeros(package_index.shape)),
+            'total': np.take_along_axis(totals, pick, axis=-1)[..., 0]
+        }
+    
     def _calculate_savings(self, package_costs, optimal_package):
         """Calculate savings compared to other packages"""
         optimal_cost = package_costs[optimal_package]['total']
@@ -76,10 +136,10 @@ class PricingCalculator:
         
         return savings_info
     
-    def should_upgrade_package(self, expected_orders):
+    def should_upgrade_package(self, expected_orders, contract_month=1):
         """Check if current package should be upgraded for better cost efficiency"""
-        current_cost = self.calculate_monthly_cost(expected_orders)
-        optimal_info = self.find_optimal_package(expected_orders)
+        current_cost = self.calculate_monthly_cost(expected_orders, contract_month)
+        optimal_info = self.find_optimal_package(expected_orders, contract_month)
         
         optimal_package = optimal_info['optimal_package']
         optimal_cost = optimal_info['cost_breakdown']['total']
@@ -109,7 +169,10 @@ class PricingCalculator:
     def _get_upgrade_reason(self, current_cost, optimal_cost):
         """Generate human-readable reason for package upgrade"""
         if optimal_cost['overage_cost'] < current_cost['overage_cost']:
-            return f"High overage fees (DKK{current_cost['overage_cost']:,.0f}) make upgrade cost-effective"
+            overage = format_money(current_cost['overage_cost'] * fx_rate(self.currency), self.currency)
+            return f"High overage fees ({overage}) make upgrade cost-effective"
+        elif optimal_cost['discount'] > current_cost['discount']:
+            return "Discounts on the recommended package make it cheaper"
         elif optimal_cost['base_modules'] + optimal_cost['overage_cost'] < current_cost['total']:
             return "Better module pricing at higher tier reduces total cost"
         else:
@@ -118,19 +181,20 @@ class PricingCalculator:
     def calculate_base_module_cost(self):
         total = 0
         for module_name in self.selected_modules:
-            if module_name in MODULES:
+            if module_name in self.modules:
                 # Get the price for this module at the selected package tier
-                module_price = MODULES[module_name]['prices'][self.selected_package]
+                module_price = self.modules[module_name]['prices'][self.selected_package]
                 total += module_price
         return total
     
     def calculate_overage_cost(self, actual_orders):
         order_limit = self.package_info['order_limit']
-        overage_fee = self.package_info['overage_fee']
         
         if actual_orders > order_limit:
             overage_orders = actual_orders - order_limit
-            overage_cost = overage_orders * overage_fee
+            # Graduated bands are priced from the tariff's precomputed band costs
+            overage_cost = float(self.tariff.overage_cost(self.tariff.package_index(self.selected_package),
+                                                          overage_orders))
         else:
             overage_orders = 0
             overage_cost = 0
@@ -140,20 +204,26 @@ class PricingCalculator:
             'overage_cost': overage_cost
         }
     
-    def calculate_monthly_cost(self, expected_orders):
+    def calculate_monthly_cost(self, expected_orders, contract_month=1):
         # Base module costs
         base_modules = self.calculate_base_module_cost()
         
         # Overage costs
         overage_info = self.calculate_overage_cost(expected_orders)
         
-        # Total calculation (no package fee anymore)
+        # Total calculation (no package fee anymore), less any discounts for this contract month
         total = base_modules + overage_info['overage_cost']
+        discount = 0
+        if self.tariff.discounts:
+            discount = float(self._discount(self.tariff.package_index(self.selected_package), expected_orders,
+                                            contract_month, base_modules, total))
+            total -= discount
         
         return {
             'base_modules': base_modules,
             'overage_orders': overage_info['overage_orders'],
             'overage_cost': overage_info['overage_cost'],
+            'discount': discount,
             'total': total
         }
     
@@ -161,21 +231,80 @@ class PricingCalculator:
         return {
             'name': self.selected_package,
             'order_limit': self.package_info['order_limit'],
-            'overage_fee': self.package_info['overage_fee']
+            # Fee of the first overage order for packages with graduated overage_bands
+            'overage_fee': overage_bands(self.package_info)[0][1]
         }
     
     def get_selected_modules_info(self):
         modules_info = {}
         for module_name in self.selected_modules:
-            if module_name in MODULES:
-                modules_info[module_name] = MODULES[module_name]
+            if module_name in self.modules:
+                modules_info[module_name] = self.modules[module_name]
         return modules_info
     
-    def calculate_yearly_cost(self, expected_orders):
+    def calculate_yearly_cost(self, expected_orders, first_month=1):
         monthly_costs = self.calculate_monthly_cost(expected_orders)
+        list_price = monthly_costs['base_modules'] + monthly_costs['overage_cost']
+        
+        # Discounts can differ per contract month (e.g. introductory months), so sum all twelve
+        discount_yearly = 0
+        if self.tariff.discounts:
+            discount_yearly = float(self._discount(
+                self.tariff.package_index(self.selected_package), expected_orders,
+                np.arange(first_month, first_month + 12), monthly_costs['base_modules'], list_price).sum())
         
         return {
             'base_modules_yearly': monthly_costs['base_modules'] * 12,
             'overage_cost_yearly': monthly_costs['overage_cost'] * 12,
-            'total_yearly': monthly_costs['total'] * 12
+            'discount_yearly': discount_yearly,
+            'total_yearly': list_price * 12 - discount_yearly
         }
+
+
+def price_quotes(tariff, module_masks, package_indices, orders, contract_months=1, active_discounts=None):
+    """Price a batch of quotes at once.
+
+    module_masks are module bitmasks (see CompiledTariff.module_mask),
+    package_indices index tariff.package_names (-1 picks the optimal package)
+    and orders are monthly order volumes; all three are equal-length arrays.
+    contract_months is the month each quote prices (scalar or array) and
+    active_discounts the discount rules each quote may use, from
+    tariff.discounts.active(codes): one row for all quotes or one per quote
+    (default: the rules without a code).
+    Returns a dict of arrays with the cost breakdown for the requested package
+    and the optimal package for each quote.
+    """
+    module_masks = np.asarray(module_masks, dtype=np.uint64)
+    package_indices = np.asarray(package_indices, dtype=int)
+    orders = np.asarray(orders, dtype=float)
+    rows = np.arange(len(orders))
+
+    # (quotes, packages) cost matrices from one membership @ price product
+    base_modules = tariff.module_membership(module_masks) @ tariff.module_prices
+    overage_orders = np.maximum(orders[:, None] - tariff.order_limits, 0)
+    overage_cost = tariff.overage_costs(overage_orders)
+    totals = base_modules + overage_cost
+    discount = None
+    if tariff.discounts:
+        months = np.broadcast_to(np.asarray(contract_months, dtype=float), orders.shape)
+        if active_discounts is not None and np.ndim(active_discounts) == 2:
+            active_discounts = np.asarray(active_discounts)[:, None, :]  # one row per quote, for every package
+        discount = tariff.discounts.evaluate(module_masks[:, None], np.arange(len(tariff.package_names)),
+                                             orders[:, None], months[:, None], base_modules, totals,
+                                             active_discounts)
+        totals = totals - discount
+
+    optimal_index = totals.argmin(axis=1)
+    chosen = np.where(package_indices < 0, optimal_index, package_indices)
+
+    return {
+        'package_index': chosen,
+        'base_modules': base_modules[rows, chosen],
+        'overage_orders': overage_orders[rows, chosen],
+        'overage_cost': overage_cost[rows, chosen],
+        'discount': discount[rows, chosen] if discount is not None else np.zeros(len(orders)),
+        'total': totals[rows, chosen],
+        'optimal_package_index': optimal_index,
+        'optimal_total': totals[rows, optimal_index],
+        'monthly_savings': totals[rows, chosen] - totals[rows, optimal_index]
+    }
@@ -114,3 +114,6 @@ EXTERNAL_FEES = {
         "description": "Monthly email service subscription"
     }
 }
+
+# Discount and promotion rules (bundles, prepay, introductory months, partner codes); see discounts.py
+DISCOUNTS = {}
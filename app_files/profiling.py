@@ -0,0 +1,195 @@
+"""On-demand profiling of a single Streamlit rerun.
+
+profile_call() runs a function under cProfile (exact call counts and
+cumulative times, saved as pstats) while a background thread samples the
+calling thread's stack every PRICING_PROFILE_INTERVAL_MS (default 1 ms); the
+samples are saved in the speedscope format, which https://www.speedscope.app
+and most flamegraph viewers open directly. Each profile is written to its own
+directory under PRICING_PROFILE_DIR (default profiles/ next to this file)
+together with metadata.json, so the session, inputs and tariff version it was
+taken with can be reproduced.
+
+Samples include cProfile's own overhead, which inflates Python-heavy frames
+relative to NumPy-heavy ones; compare them with the pstats timings.
+"""
+import cProfile
+import io
+import json
+import os
+import sys
+import threading
+import time
+import zipfile
+from datetime import datetime, timezone
+
+PROFILE_DIR = os.environ.get("PRICING_PROFILE_DIR",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+
+ENABLED = os.environ.get("PRICING_PROFILING", "").lower() in ("1", "true", "yes")
+
+PSTATS_FILE = "rerun.pstats"
+SPEEDSCOPE_FILE = "rerun.speedscope.json"
+METADATA_FILE = "metadata.json"
+
+
+class ProfilerBusyError(RuntimeError):
+    """Another rerun in this process is already being profiled"""
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread.
+
+    Stacks are stored root-first as indexes into a shared frame table, cut off
+    at (and excluding) the frame of stop_code so callers do not show the
+    server's own frames above the profiled function.
+    """
+
+    def __init__(self, thread_id, stop_code, interval=0.001):
+        self.thread_id = thread_id
+        self.stop_code = stop_code
+        self.interval = interval
+        self.frames = []
+        self.samples = []
+        self.weights = []
+        self._frame_index = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _frame_id(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({'name': code.co_qualname, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return index
+
+    def _run(self):
+        last = self.started
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            stack = []
+            while frame is not None and frame.f_code is not self.stop_code:
+                stack.append(self._frame_id(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.samples.append(stack)
+                self.weights.append(now - last)
+            last = now
+
+    def speedscope(self, name):
+        """The samples as a speedscope file (https://www.speedscope.app/file-format-schema.json)"""
+        return {
+            '$schema': "https://www.speedscope.app/file-format-schema.json",
+            'name': name,
+            'exporter': "pricing-app profiling",
+            'activeProfileIndex': 0,
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': self.elapsed,
+                'samples': self.samples,
+                'weights': self.weights,
+            }],
+        }
+
+
+_busy = threading.Lock()
+
+
+def _profiled(func, profiler, sampler):
+    # Sampled stacks are cut off at this frame
+    profiler.enable()
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        sampler.stop()
+
+
+def profile_call(func, describe, directory=None, interval=None):
+    """Run func() under cProfile and the stack sampler and save the profile.
+
+    describe() is called after func to collect the metadata saved with the
+    profile. Returns (func's result, profile info). The profile is also saved
+    when func raises (Streamlit ends some reruns with control-flow exceptions);
+    last_profile() then still returns its info. Only one call per process is
+    profiled at a time; a concurrent call raises ProfilerBusyError without
+    running func.
+    """
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusyError("Another rerun is being profiled; try again in a moment")
+    try:
+        interval = interval or float(os.environ.get("PRICING_PROFILE_INTERVAL_MS", "1")) / 1000
+        profiler = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(), _profiled.__code__, interval)
+        sampler.start()
+        try:
+            result = _profiled(func, profiler, sampler)
+        finally:
+            info = save_profile(profiler, sampler, describe(), directory or PROFILE_DIR)
+        return result, info
+    finally:
+        _busy.release()
+
+
+_last = threading.local()
+
+
+def last_profile():
+    """Info for the most recent profile saved on this thread (or None)"""
+    return getattr(_last, 'info', None)
+
+
+def save_profile(profiler, sampler, metadata, directory):
+    """Write pstats, speedscope JSON and metadata into a new directory; returns the profile info"""
+    now = datetime.now(timezone.utc)
+    session = ''.join(c for c in str(metadata.get('session_id') or 'nosession') if c.isalnum())[:8]
+    name = f"{now.strftime('%Y%m%dT%H%M%S.%f')[:-3]}Z-{session}"
+    path = os.path.join(directory, name)
+    os.makedirs(path, exist_ok=True)
+
+    profiler.dump_stats(os.path.join(path, PSTATS_FILE))
+    with open(os.path.join(path, SPEEDSCOPE_FILE), 'w', encoding='utf-8') as f:
+        json.dump(sampler.speedscope(f"rerun {name}"), f)
+    metadata = dict(metadata, profiled_at=now.isoformat(), wall_seconds=round(sampler.elapsed, 6),
+                    samples=len(sampler.samples), sample_interval_ms=sampler.interval * 1000,
+                    python=sys.version.split()[0])
+    with open(os.path.join(path, METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, sort_keys=True, default=str)
+
+    info = {'name': name, 'path': path, 'seconds': sampler.elapsed, 'samples': len(sampler.samples)}
+    _last.info = info
+    return info
+
+
+def top_functions(path, limit=15, sort='cumulative'):
+    """The pstats report of a saved profile, limited to its top entries"""
+    import pstats
+
+    out = io.StringIO()
+    stats = pstats.Stats(os.path.join(path, PSTATS_FILE), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def profile_archive(path):
+    """Zip bytes with all files of a saved profile"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for filename in sorted(os.listdir(path)):
+            archive.write(os.path.join(path, filename), os.path.join(os.path.basename(path), filename))
+    return buffer.getvalue()
@@ -0,0 +1,260 @@
+"""Branded PDF quotes, rendered in the background.
+
+build_quote_document() collects what a quote shows from the calculator state
+into plain data, and render_quote_pdf() turns it into PDF bytes with
+matplotlib's PDF backend (figure objects only, no pyplot state). Rendering
+runs on a bounded process pool (PRICING_PDF_WORKERS, default 2) so it never
+competes for the Streamlit server's GIL, and finished PDFs are cached by quote
+inputs, so generating the same quote again is instant.
+"""
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import multiprocessing
+
+import numpy as np
+
+from cache import ResultCache, make_key, shared_cache
+from currency import format_money
+from view_models import get_configurator_view, load_logo_bytes
+
+A4_PORTRAIT = (8.27, 11.69)
+BRAND_COLOR = "#1111D6"
+
+
+class QuoteBusyError(RuntimeError):
+    """Too many PDF quotes are already waiting to be rendered"""
+
+
+def quote_key(calculator, inputs, currency, customer=''):
+    """Cache key for a PDF quote; the quote date is part of it, so cached quotes are never backdated"""
+    return make_key('quote_pdf', calculator.tariff.version, sorted(calculator.selected_modules),
+                    calculator.selected_package, inputs, currency, customer, date.today().isoformat(),
+                    calculator.discount_codes)
+
+
+def build_quote_document(calculator, inputs, forecast, currency, customer=''):
+    """Everything the PDF shows, as picklable plain data; forecast is already in currency"""
+    tariff = calculator.tariff
+    package_view = get_configurator_view(tariff, currency).packages[calculator.selected_package]
+    modules = [(name, package_view.module_prices[name]) for name in calculator.selected_modules]
+    module_total = sum(price for _, price in modules)
+
+    total_revenue = float(forecast['total_revenue'].sum())
+    total_costs = float(forecast['total_costs'].sum())
+    profit = total_revenue - total_costs
+    months = int(inputs['forecast_months'])
+    return {
+        'customer': customer,
+        'date': date.today().isoformat(),
+        'tariff_version': tariff.version,
+        'currency': currency,
+        'logo': load_logo_bytes(),
+        'package': calculator.selected_package,
+        'package_lines': [
+            ("Order limit", package_view.order_limit_text),
+            ("Overage fee", package_view.overage_fee_text),
+            ("Monthly module cost", f"{format_money(module_total, currency)}/month"),
+        ],
+        'modules': [(name, f"{format_money(price, currency)}/month") for name, price in modules],
+        'metrics': [
+            ("Forecast period", f"{months} months"),
+            ("Total revenue", format_money(total_revenue, currency)),
+            ("Average monthly revenue", format_money(total_revenue / months, currency)),
+            ("Total platform cost", format_money(forecast['platform_costs'].sum(), currency)),
+            ("Total discounts", format_money(forecast['discounts'].sum(), currency)),
+            ("Total variable cost", format_money(forecast['variable_costs'].sum(), currency)),
+            ("Total profit", format_money(profit, currency)),
+            ("Profit margin", f"{profit / total_revenue * 100 if total_revenue > 0 else 0:.1f}%"),
+            ("New customers", f"{int(forecast['new_customers'].sum()):,}"),
+        ],
+        'series': {name: np.asarray(forecast[name]) for name in (
+            'months', 'new_customers', 'active_customers', 'monthly_recurring_revenue',
+            'electricity_revenue', 'one_time_revenue', 'total_costs', 'profit')}
+    }
+
+
+def _summary_page(document, Figure):
+    import matplotlib.image as mpimg
+
+    fig = Figure(figsize=A4_PORTRAIT)
+    if document['logo']:
+        logo_ax = fig.add_axes([0.35, 0.86, 0.3, 0.1])
+        logo_ax.imshow(mpimg.imread(io.BytesIO(document['logo']), format='png'))
+        logo_ax.axis('off')
+
+    fig.text(0.08, 0.82, "Price Quote", fontsize=22, weight='bold', color=BRAND_COLOR)
+    details = f"Date: {document['date']}    Prices: {document['tariff_version']}    Currency: {document['currency']}"
+    if document['customer']:
+        details = f"Customer: {document['customer']}    " + details
+    fig.text(0.08, 0.795, details, fontsize=9, color="#555555")
+    fig.text(0.08, 0.775, "All prices exclude VAT", fontsize=9, color="#555555")
+
+    y = 0.73
+
+    def section(title):
+        nonlocal y
+        fig.text(0.08, y, title, fontsize=13, weight='bold', color=BRAND_COLOR)
+        y -= 0.03
+
+    def line(label, value, bold=False):
+        nonlocal y
+        fig.text(0.10, y, label, fontsize=10, weight='bold' if bold else 'normal')
+        fig.text(0.92, y, value, fontsize=10, ha='right', weight='bold' if bold else 'normal')
+        y -= 0.022
+
+    section(f"Package: {document['package']}")
+    for label, value in document['package_lines']:
+        line(label, value)
+    y -= 0.015
+    section("Modules")
+    for label, value in document['modules']:
+        line(label, value)
+    y -= 0.015
+    section("Forecast")
+    for label, value in document['metrics']:
+        line(label, value, bold=label == "Total profit")
+    return fig
+
+
+def _chart_page(document, Figure):
+    series = document['series']
+    currency = document['currency']
+    months = series['months']
+    fig = Figure(figsize=A4_PORTRAIT)
+    revenue_ax, profit_ax, customer_ax = fig.subplots(3, 1)
+
+    bottom = np.zeros(len(months))
+    for name, label, color in (('monthly_recurring_revenue', "Subscriptions", "#2E8B57"),
+                               ('electricity_revenue', "Electricity", "#F4B400"),
+                               ('one_time_revenue', "One-time fees", "#7FB3D5")):
+        revenue_ax.bar(months, series[name], bottom=bottom, label=label, color=color)
+        bottom = bottom + series[name]
+    revenue_ax.plot(months, series['total_costs'], color="#C0392B", marker='o', markersize=3, label="Total cost")
+    revenue_ax.set_title("Monthly revenue and cost", loc='left', fontsize=11)
+    revenue_ax.set_ylabel(currency)
+    revenue_ax.legend(fontsize=8, ncols=4, loc='upper left')
+
+    profit = series['profit']
+    profit_ax.bar(months, profit, color=np.where(profit >= 0, "#2E8B57", "#C0392B"), label="Monthly profit")
+    profit_ax.plot(months, np.cumsum(profit), color=BRAND_COLOR, label="Cumulative profit")
+    profit_ax.axhline(0, color="#999999", linewidth=0.8)
+    profit_ax.set_title("Profit", loc='left', fontsize=11)
+    profit_ax.set_ylabel(currency)
+    profit_ax.legend(fontsize=8, loc='upper left')
+
+    customer_ax.bar(months, series['new_customers'], color="#7FB3D5", label="New customers")
+    customer_ax.plot(months, series['active_customers'], color=BRAND_COLOR, label="Active customers")
+    customer_ax.set_title("Customers", loc='left', fontsize=11)
+    customer_ax.set_xlabel("Month")
+    customer_ax.legend(fontsize=8, loc='upper left')
+
+    for ax in (revenue_ax, profit_ax, customer_ax):
+        ax.tick_params(labelsize=8)
+        ax.yaxis.set_major_formatter(lambda value, _: f"{value:,.0f}")
+        ax.spines[['top', 'right']].set_visible(False)
+    fig.subplots_adjust(left=0.14, right=0.95, top=0.95, bottom=0.06, hspace=0.35)
+    return fig
+
+
+def render_quote_pdf(document):
+    """PDF bytes for a quote document (runs in a worker process)"""
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+
+    buffer = io.BytesIO()
+    title = f"Price quote {document['customer']}".strip()
+    with PdfPages(buffer, metadata={'Title': title, 'Subject': f"Prices {document['tariff_version']}"}) as pdf:
+        pdf.savefig(_summary_page(document, Figure))
+        pdf.savefig(_chart_page(document, Figure))
+    return buffer.getvalue()
+
+
+class QuoteJobs:
+    """Bounded background rendering of PDF quotes with a cache of finished PDFs.
+
+    submit() returns immediately; poll status() for progress. Identical quotes
+    (same key) share one job and one cached PDF. Progress while rendering is
+    estimated from recent render times.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None):
+        self.max_workers = max_workers or int(os.environ.get("PRICING_PDF_WORKERS", "2"))
+        self.max_pending = max_pending or int(os.environ.get("PRICING_PDF_MAX_PENDING", "32"))
+        # Finished PDFs; shared with other replicas when the on-disk shared cache is configured
+        self.cache = ResultCache(max_entries=64, backend=shared_cache.backend)
+        self._executor = None
+        self._jobs = {}
+        self._durations = deque([2.0], maxlen=20)
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            # Spawned workers: forking a threaded server process is unsafe
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def submit(self, key, build_document):
+        """Queue a quote unless it is cached or already queued; build_document is only called when needed"""
+        if self.cache.get(key) is not None:
+            return
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job['future'].done():
+                return
+            pending = sum(1 for job in self._jobs.values() if not job['future'].done())
+            if pending >= self.max_pending:
+                raise QuoteBusyError("Too many PDF quotes are being generated; please try again shortly")
+            future = self._pool().submit(render_quote_pdf, build_document())
+            self._jobs[key] = {'future': future, 'submitted': time.monotonic(), 'started': None}
+        future.add_done_callback(lambda done: self._finished(key, done))
+
+    def _finished(self, key, future):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job['future'] is not future:
+                return
+            if future.exception() is None:
+                self.cache.set(key, future.result())
+                self._durations.append(time.monotonic() - (job['started'] or job['submitted']))
+                del self._jobs[key]
+
+    def status(self, key):
+        """{'state': 'none'|'queued'|'rendering'|'done'|'failed', 'progress': 0..1, 'pdf': bytes|None, 'error': str|None}"""
+        pdf = self.cache.get(key)
+        if pdf is not None:
+            return {'state': 'done', 'progress': 1.0, 'pdf': pdf, 'error': None}
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return {'state': 'none', 'progress': 0.0, 'pdf': None, 'error': None}
+            future = job['future']
+            if future.done():
+                pdf = None if future.exception() else future.result()
+                if pdf is None:
+                    return {'state': 'failed', 'progress': 0.0, 'pdf': None, 'error': str(future.exception())}
+                return {'state': 'done', 'progress': 1.0, 'pdf': pdf, 'error': None}
+            if not future.running():
+                return {'state': 'queued', 'progress': 0.0, 'pdf': None, 'error': None}
+            if job['started'] is None:
+                job['started'] = time.monotonic()
+            expected = sum(self._durations) / len(self._durations)
+            progress = min(0.95, 0.05 + (time.monotonic() - job['started']) / expected)
+            return {'state': 'rendering', 'progress': progress, 'pdf': None, 'error': None}
+
+
+_quote_jobs = None
+_quote_jobs_lock = threading.Lock()
+
+
+def get_quote_jobs():
+    """Process-wide PDF quote pool shared by all sessions"""
+    global _quote_jobs
+    with _quote_jobs_lock:
+        if _quote_jobs is None:
+            _quote_jobs = QuoteJobs()
+        return _quote_jobs
@@ -0,0 +1,210 @@
+"""Persistent scenario store (SQLite).
+
+A saved scenario keeps the module selection, package, discount codes, forecast
+inputs and the computed forecast arrays, keyed by a hash of the inputs and
+tariff version.
+Reloading a scenario puts its arrays back into the shared result cache, so the
+app does not recompute the forecast.
+
+The database lives at PRICING_SCENARIO_DB (default ./scenarios.db) and runs in
+WAL mode so listing and loading never wait for a concurrent save.
+"""
+import io
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from cache import make_key, shared_cache
+from forecast import forecast_key
+
+DEFAULT_SCENARIO_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    scenario_key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    customer TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,          -- ISO 8601 UTC, sorts chronologically
+    tariff_version TEXT NOT NULL,
+    modules TEXT NOT NULL,             -- JSON list
+    package TEXT NOT NULL,
+    discount_codes TEXT NOT NULL DEFAULT '[]',  -- JSON list of the discount codes priced with
+    inputs TEXT NOT NULL,              -- JSON forecast inputs
+    forecast_key TEXT NOT NULL,        -- shared cache key the results belong to
+    total_revenue REAL NOT NULL,
+    total_costs REAL NOT NULL,
+    profit REAL NOT NULL,
+    results BLOB NOT NULL              -- forecast arrays as an .npz archive
+);
+CREATE INDEX IF NOT EXISTS idx_scenarios_customer ON scenarios (customer, created_at);
+CREATE INDEX IF NOT EXISTS idx_scenarios_created_at ON scenarios (created_at);
+CREATE INDEX IF NOT EXISTS idx_scenarios_tariff_version ON scenarios (tariff_version, created_at);
+"""
+
+# Columns returned when listing; the results blob is only read when a scenario is loaded
+SUMMARY_COLUMNS = ('scenario_key', 'name', 'customer', 'created_at', 'tariff_version',
+                   'package', 'total_revenue', 'total_costs', 'profit')
+
+
+def _pack_results(forecast):
+    buffer = io.BytesIO()
+    np.savez(buffer, **{name: np.asarray(values) for name, values in forecast.items()})
+    return buffer.getvalue()
+
+
+def _unpack_results(blob):
+    with np.load(io.BytesIO(blob), allow_pickle=False) as archive:
+        return {name: archive[name].item() if archive[name].ndim == 0 else archive[name]
+                for name in archive.files}
+
+
+class SQLiteStore:
+    """SQLite database in WAL mode with a small connection pool, shared between threads"""
+
+    schema = ""
+
+    def __init__(self, path, pool_size=4):
+        self.path = path
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        with self.connection() as conn:
+            conn.executescript(self.schema)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; commits on success and rolls back on error"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class ScenarioStore(SQLiteStore):
+    """Save, list and load scenarios; safe to share between threads (Streamlit sessions)"""
+
+    schema = SCHEMA
+
+    def __init__(self, path, pool_size=4):
+        super().__init__(path, pool_size)
+        with self.connection() as conn:
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(scenarios)")}
+            if 'discount_codes' not in columns:
+                # Databases created before scenarios kept their discount codes
+                conn.execute("ALTER TABLE scenarios ADD COLUMN discount_codes TEXT NOT NULL DEFAULT '[]'")
+
+    def save(self, name, calculator, inputs, forecast, customer=''):
+        """Store a scenario with its base-currency forecast; returns the scenario key.
+
+        Saving the same inputs and discount codes for the same customer again
+        replaces the earlier entry.
+        """
+        tariff = calculator.tariff
+        modules = sorted(calculator.selected_modules)
+        codes = list(calculator.discount_codes)
+        key = make_key('scenario', tariff.version, modules, calculator.selected_package, inputs, customer, codes)
+        total_revenue = float(np.sum(forecast['total_revenue']))
+        total_costs = float(np.sum(forecast['total_costs']))
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO scenarios (scenario_key, name, customer, created_at, tariff_version, "
+                "modules, package, discount_codes, inputs, forecast_key, total_revenue, total_costs, profit, "
+                "results) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, name, customer, datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                 tariff.version, json.dumps(modules), calculator.selected_package, json.dumps(codes),
+                 json.dumps(inputs), forecast_key(calculator, inputs), total_revenue, total_costs,
+                 total_revenue - total_costs, _pack_results(forecast))
+            )
+        return key
+
+    def list(self, customer=None, tariff_version=None, since=None, limit=100, offset=0):
+        """Newest-first scenario summaries (no arrays), optionally filtered"""
+        clauses, params = [], []
+        if customer is not None:
+            clauses.append("customer = ?")
+            params.append(customer)
+        if tariff_version is not None:
+            clauses.append("tariff_version = ?")
+            params.append(tariff_version)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.connection() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM scenarios {where} "
+                f"ORDER BY created_at DESC LIMIT ? OFFSET ?", (*params, limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def customers(self):
+        with self.connection() as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT customer FROM scenarios ORDER BY customer")]
+
+    def load(self, scenario_key):
+        """Full scenario including its forecast arrays, or None if unknown"""
+        with self.connection() as conn:
+            row = conn.execute("SELECT * FROM scenarios WHERE scenario_key = ?", (scenario_key,)).fetchone()
+        if row is None:
+            return None
+        scenario = {name: row[name] for name in SUMMARY_COLUMNS}
+        scenario.update(
+            modules=json.loads(row['modules']),
+            discount_codes=json.loads(row['discount_codes']),
+            inputs=json.loads(row['inputs']),
+            forecast_key=row['forecast_key'],
+            forecast=_unpack_results(row['results'])
+        )
+        return scenario
+
+    def delete(self, scenario_key):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM scenarios WHERE scenario_key = ?", (scenario_key,))
+
+
+def prime_forecast_cache(scenario):
+    """Put a loaded scenario's forecast into the shared cache under the key it was computed for.
+
+    The key includes the tariff (and curves) version, so a scenario saved
+    against older prices is simply recomputed instead of being served stale.
+    """
+    shared_cache.set(scenario['forecast_key'], scenario['forecast'])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_scenario_store():
+    """Process-wide store at PRICING_SCENARIO_DB"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScenarioStore(os.environ.get("PRICING_SCENARIO_DB", DEFAULT_SCENARIO_DB))
+        return _store
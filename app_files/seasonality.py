@@ -0,0 +1,85 @@
+"""Daily calendar and seasonality profiles for the daily-resolution forecast.
+
+The forecast calendar is a repeating non-leap year whose first day is a
+Monday (the same year the hourly curves in electricity.py describe).
+Forecast month 1 starts on the 1st of calendar month start_month.
+
+Seasonality is two sets of multipliers on the daily rate of new customers:
+seven weekday values (Monday first) and twelve calendar-month values, which
+are interpolated linearly between mid-month points so the year has no steps
+at month boundaries. Both are normalized to average 1 over a week and a
+year, so they move installations around the calendar without changing the
+yearly volume.
+"""
+import numpy as np
+
+from electricity import DAYS_PER_MONTH
+
+DAYS_PER_YEAR = sum(DAYS_PER_MONTH)
+# Day of year (0-based) on which each calendar month starts, and its midpoint
+MONTH_START_DAY = np.concatenate(([0], np.cumsum(DAYS_PER_MONTH)[:-1]))
+MONTH_MID_DAY = MONTH_START_DAY + np.array(DAYS_PER_MONTH) / 2
+
+FLAT_WEEK = (1.0,) * 7
+FLAT_YEAR = (1.0,) * 12
+
+
+def validate_profile(name, values, length):
+    """Raise ValueError unless values is a list of length non-negative numbers, not all zero"""
+    if (not isinstance(values, (list, tuple)) or len(values) != length
+            or not all(isinstance(v, (int, float)) and not isinstance(v, bool) and v >= 0 for v in values)):
+        raise ValueError(f"{name} must be a list of {length} non-negative multipliers")
+    if not any(values):
+        raise ValueError(f"{name} must not be all zero")
+
+
+def forecast_calendar(forecast_months, start_month=1):
+    """Day-level layout of a forecast.
+
+    Returns a dict of arrays: 'days_in_month' (per forecast month),
+    'month_starts' (index of each month's first day, for np.add.reduceat),
+    'month_of_day' (forecast month index of each day), 'day_of_year' and
+    'weekday' (0 = Monday) of each day.
+    """
+    calendar_month = (np.arange(forecast_months) + start_month - 1) % 12
+    days_in_month = np.array(DAYS_PER_MONTH)[calendar_month]
+    month_starts = np.concatenate(([0], np.cumsum(days_in_month)[:-1]))
+    month_of_day = np.repeat(np.arange(forecast_months), days_in_month)
+    day_index = np.arange(days_in_month.sum())
+    first_day = MONTH_START_DAY[start_month - 1]
+    return {
+        'days_in_month': days_in_month,
+        'month_starts': month_starts,
+        'month_of_day': month_of_day,
+        'day_of_year': (first_day + day_index) % DAYS_PER_YEAR,
+        'weekday': (first_day + day_index) % 7
+    }
+
+
+def daily_multipliers(calendar, weekly=FLAT_WEEK, annual=FLAT_YEAR):
+    """Seasonality multiplier for every day of the calendar (weekly x annual, each averaging 1)"""
+    weekly = np.asarray(weekly, dtype=float)
+    weekly = weekly / weekly.mean()
+    annual = np.asarray(annual, dtype=float)
+    # Periodic interpolation between month midpoints, normalized over the whole year
+    year = np.interp(np.arange(DAYS_PER_YEAR) + 0.5, MONTH_MID_DAY, annual, period=DAYS_PER_YEAR)
+    year = year / year.mean()
+    return weekly[calendar['weekday']] * year[calendar['day_of_year']]
+
+
+def retained_total(inflow, retention, initial=0.0):
+    """Running total x[d] = retention[d] * x[d - 1] + inflow[d], with x[-1] = initial.
+
+    Solved as a parallel prefix scan over the (retention, inflow) pairs: log2(days)
+    vectorized passes instead of a loop over days. Only retention factors
+    (<= 1) are multiplied together, so it is stable for any horizon.
+    """
+    decay = np.array(retention, dtype=float)
+    total = np.array(inflow, dtype=float)
+    shift = 1
+    while shift < len(total):
+        # Combine each element with the one shift steps back (both sides use the previous pass)
+        total[shift:] = total[shift:] + decay[shift:] * total[:-shift]
+        decay[shift:] = decay[shift:] * decay[:-shift]
+        shift *= 2
+    return total + decay * initial
@@ -0,0 +1,26 @@
+"""Start the pricing app with warm caches.
+
+Usage: python serve.py [streamlit run options]
+
+Warmup runs in this process before the Streamlit server binds its port, so
+the caches it fills are the ones the app sessions read and the health check
+(/_stcore/health) cannot go green before warmup has finished.
+"""
+import os
+import sys
+
+from warmup import run_warmup
+
+
+def main():
+    run_warmup()
+
+    from streamlit.web import cli as stcli
+
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    sys.argv = ["streamlit", "run", app_path] + sys.argv[1:]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
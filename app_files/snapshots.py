@@ -0,0 +1,105 @@
+"""Session snapshots keyed by a URL token, for restoring a page after a dropped websocket.
+
+A snapshot is the session's inputs (module and package names, forecast
+inputs, display settings) plus the shared-cache key of its forecast, as
+one small JSON document. It never holds result arrays: a restored session
+recomputes the same cache key and finds its forecast and charts in the
+shared result cache.
+
+The page writes its snapshot at the end of every rerun, but only when the
+JSON differs from the last one it wrote, so an unchanged rerun costs one
+json.dumps and a string comparison. A changed one costs a single-row
+upsert. Snapshots older than PRICING_SNAPSHOT_TTL_HOURS (default 168) are
+pruned. The database lives at PRICING_SNAPSHOT_DB (default ./snapshots.db).
+Point it at a volume shared by the replicas, because a reconnecting client
+may land on another one.
+"""
+import json
+import os
+import re
+import secrets
+import threading
+import time
+
+from scenarios import SQLiteStore
+
+DEFAULT_SNAPSHOT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    token TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,          -- Unix time of the last write
+    state TEXT NOT NULL                -- JSON snapshot
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_updated_at ON snapshots (updated_at);
+"""
+
+# Bumped when the snapshot fields change; older snapshots are ignored
+SNAPSHOT_FORMAT = 1
+TOKEN_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+# Expired snapshots are pruned once per this many writes
+PRUNE_EVERY = 500
+
+
+def new_token():
+    """Unguessable URL-safe session token"""
+    return secrets.token_urlsafe(16)
+
+
+def valid_token(token):
+    return isinstance(token, str) and TOKEN_PATTERN.match(token) is not None
+
+
+def encode_snapshot(state):
+    """Canonical JSON for a snapshot dict (stable, so unchanged state compares equal)"""
+    return json.dumps(dict(state, format=SNAPSHOT_FORMAT), sort_keys=True, separators=(',', ':'))
+
+
+class SnapshotStore(SQLiteStore):
+    """Latest snapshot per session token"""
+
+    schema = SCHEMA
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, pool_size=4):
+        super().__init__(path, pool_size)
+        self.ttl_seconds = ttl_seconds
+        self._writes = 0
+        self.prune()
+
+    def save(self, token, encoded):
+        """Store an encode_snapshot() document under token, replacing the previous one"""
+        with self.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)", (token, time.time(), encoded))
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            self.prune()
+
+    def load(self, token):
+        """The snapshot dict for token, or None if unknown, expired or from another format"""
+        if not valid_token(token):
+            return None
+        with self.connection() as conn:
+            row = conn.execute("SELECT updated_at, state FROM snapshots WHERE token = ?", (token,)).fetchone()
+        if row is None or row['updated_at'] < time.time() - self.ttl_seconds:
+            return None
+        state = json.loads(row['state'])
+        return state if state.get('format') == SNAPSHOT_FORMAT else None
+
+    def prune(self):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM snapshots WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store():
+    """Process-wide store at PRICING_SNAPSHOT_DB"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            ttl_hours = float(os.environ.get("PRICING_SNAPSHOT_TTL_HOURS", "168"))
+            _store = SnapshotStore(os.environ.get("PRICING_SNAPSHOT_DB", DEFAULT_SNAPSHOT_DB),
+                                   ttl_seconds=ttl_hours * 3600)
+        return _store
@@ -0,0 +1,409 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import numpy as np
+
+from discounts import compile_discounts, validate_discounts
+from pricing_config import DISCOUNTS, MODULES, PACKAGE_SIZES, EXTERNAL_FEES
+
+
+TARIFF_SECTIONS = ("PACKAGE_SIZES", "MODULES", "EXTERNAL_FEES")
+# Sections a tariff file may leave out (read as empty)
+OPTIONAL_SECTIONS = ("DISCOUNTS",)
+
+# Names the calculator pages depend on; a tariff file without them is rejected
+REQUIRED_MODULES = ("System Access",)
+REQUIRED_EXTERNAL_FEES = ("Standard installation",)
+
+
+class TariffError(ValueError):
+    """Raised when a tariff file cannot be parsed or fails validation"""
+
+
+def _freeze(value):
+    """Recursively convert dicts/lists into read-only mappings/tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _readonly(array):
+    array.setflags(write=False)
+    return array
+
+
+def overage_bands(package_info):
+    """[(first overage order, fee)] for a package: its overage_bands, or one band at overage_fee"""
+    bands = package_info.get('overage_bands')
+    if not bands:
+        return [(0, package_info['overage_fee'])]
+    starts = [0] + [band['up_to'] for band in bands[:-1]]
+    return [(start, band['fee']) for start, band in zip(starts, bands)]
+
+
+class CompiledTariff:
+    """Immutable, array-backed snapshot of the pricing configuration.
+
+    The dict views (``package_sizes``, ``modules``, ``external_fees``) keep the
+    shape of ``pricing_config`` so existing lookups keep working, while the
+    arrays let the calculator price many order volumes at once.
+    """
+
+    def __init__(self, package_sizes, modules, external_fees, discounts=None, source=None):
+        self.source = source
+        self.loaded_at = time.time()
+        self.package_sizes = _freeze(package_sizes)
+        self.modules = _freeze(modules)
+        self.external_fees = _freeze(external_fees)
+        self.discount_rules = _freeze(discounts or {})
+
+        self.package_names = tuple(package_sizes.keys())
+        self.module_names = tuple(modules.keys())
+        # External fees other than the required ones are the chargers a forecast can pick from
+        self.charger_types = tuple(name for name in external_fees if name not in REQUIRED_EXTERNAL_FEES)
+        if len(self.module_names) > 64:
+            raise TariffError("At most 64 modules are supported (selections are stored as 64-bit masks)")
+
+        # Per-package limits and fees, indexed like package_names
+        self.order_limits = _readonly(np.array(
+            [package_sizes[pkg]['order_limit'] for pkg in self.package_names], dtype=float))
+
+        # Graduated overage bands of all packages, concatenated package by package. Band starts are
+        # shifted by a per-package offset, so one searchsorted over band_keys finds the band of any
+        # (overage orders, package) pair; band_costs are prefix sums, the cost of all overage orders
+        # below each band's start.
+        bands = [overage_bands(package_sizes[pkg]) for pkg in self.package_names]
+        span = max(start for package_bands in bands for start, _ in package_bands) + 1
+        self.band_offsets = _readonly(np.arange(len(bands)) * float(span))
+        self.last_band_starts = _readonly(np.array(
+            [package_bands[-1][0] for package_bands in bands], dtype=float))
+        starts, fees, costs = [], [], []
+        for package_bands in bands:
+            package_starts, package_fees = (np.array(column, dtype=float) for column in zip(*package_bands))
+            starts.append(package_starts)
+            fees.append(package_fees)
+            costs.append(np.concatenate(([0.0], np.cumsum(np.diff(package_starts) * package_fees[:-1]))))
+        self.band_starts = _readonly(np.concatenate(starts))
+        self.band_fees = _readonly(np.concatenate(fees))
+        self.band_costs = _readonly(np.concatenate(costs))
+        self.band_keys = _readonly(np.concatenate(
+            [package_starts + offset for package_starts, offset in zip(starts, self.band_offsets)]))
+        self.flat_overage = all(len(package_bands) == 1 for package_bands in bands)
+        # Fee of the first overage order (the flat overage_fee unless the package has bands)
+        self.overage_fees = _readonly(np.array([package_fees[0] for package_fees in fees]))
+        self._package_range = _readonly(np.arange(len(bands)))
+
+        # Module price matrix: one row per module, one column per package
+        self.module_prices = _readonly(np.array(
+            [[modules[mod]['prices'][pkg] for pkg in self.package_names] for mod in self.module_names],
+            dtype=float))
+
+        self._package_index = {name: i for i, name in enumerate(self.package_names)}
+        self._module_index = {name: i for i, name in enumerate(self.module_names)}
+
+        # Discount rules compiled into per-rule arrays (see discounts.py)
+        self.discounts = compile_discounts(discounts, self)
+
+        # Content hash; names are listed separately because their order is significant. Discounts
+        # are only hashed when there are any, so tariffs without them keep their version.
+        content = {'package_names': self.package_names, 'module_names': self.module_names,
+                   'packages': package_sizes, 'modules': modules, 'external_fees': external_fees}
+        if discounts:
+            content['discounts'] = discounts
+        payload = json.dumps(content, sort_keys=True, default=str)
+        self.version = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]
+
+    def package_index(self, package_name):
+        return self._package_index[package_name]
+
+    def overage_cost(self, package_index, overage_orders):
+        """Cost of overage_orders orders over the package limit.
+
+        package_index may be an array broadcasting against overage_orders.
+        Orders past the start of a package's last band fall in that band, so
+        they are clamped there before the band lookup.
+        """
+        overage_orders = np.asarray(overage_orders, dtype=float)
+        if self.flat_overage:
+            return overage_orders * self.overage_fees[package_index]
+        keys = np.minimum(overage_orders, self.last_band_starts[package_index]) + self.band_offsets[package_index]
+        band = np.searchsorted(self.band_keys, keys, side='right') - 1
+        within = overage_orders - self.band_starts[band]
+        return self.band_costs[band] + within * self.band_fees[band]
+
+    def overage_costs(self, overage_orders):
+        """overage_cost() for every package: overage_orders and the result are (..., packages) arrays"""
+        return self.overage_cost(self._package_range, overage_orders)
+
+    def module_indices(self, module_names):
+        """Row indices of the known modules in module_names (unknown names are skipped)"""
+        return [self._module_index[name] for name in module_names if name in self._module_index]
+
+    def module_mask(self, module_names):
+        """Encode a module selection as a bitmask (bit i = module_names[i]); unknown names raise KeyError"""
+        mask = 0
+        for name in module_names:
+            mask |= 1 << self._module_index[name]
+        return mask
+
+    def mask_to_modules(self, mask):
+        """Decode a bitmask back into module names, in tariff order"""
+        return [name for i, name in enumerate(self.module_names) if mask >> i & 1]
+
+    def module_membership(self, masks):
+        """Boolean (len(masks), n_modules) matrix from an array of module bitmasks"""
+        masks = np.asarray(masks, dtype=np.uint64)
+        bits = np.arange(len(self.module_names), dtype=np.uint64)
+        return ((masks[..., None] >> bits) & np.uint64(1)).astype(bool)
+
+    def __repr__(self):
+        return (f"CompiledTariff(version={self.version!r}, packages={len(self.package_names)}, "
+                f"modules={len(self.module_names)}, source={self.source!r})")
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _validate_overage_bands(package_name, bands):
+    if not isinstance(bands, (list, tuple)) or not bands or not all(isinstance(band, Mapping) for band in bands):
+        return [f"Package '{package_name}': overage_bands must be a non-empty list of bands"]
+    errors = []
+    previous = 0
+    for number, band in enumerate(bands, 1):
+        if not _is_number(band.get("fee")) or band["fee"] < 0:
+            errors.append(f"Package '{package_name}': overage band {number} needs a non-negative fee")
+        if number == len(bands):
+            if band.get("up_to") is not None:
+                errors.append(f"Package '{package_name}': the last overage band must be open-ended (no up_to)")
+        elif not _is_number(band.get("up_to")) or band["up_to"] <= previous:
+            errors.append(f"Package '{package_name}': overage band {number} needs an up_to above {previous}")
+        else:
+            previous = band["up_to"]
+    return errors
+
+
+def validate_tariff(package_sizes, modules, external_fees, discounts=None):
+    """Check a tariff definition for the structure the calculator relies on"""
+    errors = []
+    if not package_sizes:
+        errors.append("PACKAGE_SIZES must define at least one package")
+    for package_name, package_info in package_sizes.items():
+        fields = ("order_limit",) if "overage_bands" in package_info else ("order_limit", "overage_fee")
+        for field in fields:
+            value = package_info.get(field)
+            if not _is_number(value) or value < 0:
+                errors.append(f"Package '{package_name}': {field} must be a non-negative number")
+        if "overage_bands" in package_info:
+            errors += _validate_overage_bands(package_name, package_info["overage_bands"])
+
+    for module_name, module_info in modules.items():
+        if not isinstance(module_info.get("description"), str):
+            errors.append(f"Module '{module_name}': missing description")
+        prices = module_info.get("prices") or {}
+        for package_name in package_sizes:
+            if not _is_number(prices.get(package_name)) or prices[package_name] < 0:
+                errors.append(f"Module '{module_name}': missing or invalid price for '{package_name}'")
+        for package_name in set(prices) - set(package_sizes):
+            errors.append(f"Module '{module_name}': price for unknown package '{package_name}'")
+    for module_name in REQUIRED_MODULES:
+        if module_name not in modules:
+            errors.append(f"MODULES must include '{module_name}'")
+
+    for fee_name, fee_info in external_fees.items():
+        if fee_info.get("type") not in ("fixed", "per_order"):
+            errors.append(f"External fee '{fee_name}': type must be 'fixed' or 'per_order'")
+        if not _is_number(fee_info.get("amount")):
+            errors.append(f"External fee '{fee_name}': amount must be a number")
+    for fee_name in REQUIRED_EXTERNAL_FEES:
+        if fee_name not in external_fees:
+            errors.append(f"EXTERNAL_FEES must include '{fee_name}'")
+    if discounts:
+        errors += validate_discounts(discounts, package_sizes, modules)
+
+    if errors:
+        raise TariffError("Invalid tariff:\n  " + "\n  ".join(errors))
+
+
+def compile_tariff(package_sizes=None, modules=None, external_fees=None, discounts=None, source=None):
+    """Validate pricing definitions (defaults to pricing_config) and compile them into a CompiledTariff.
+
+    discounts defaults to pricing_config's DISCOUNTS only when all other sections do too.
+    """
+    if discounts is None and package_sizes is None and modules is None and external_fees is None:
+        discounts = DISCOUNTS
+    package_sizes = PACKAGE_SIZES if package_sizes is None else package_sizes
+    modules = MODULES if modules is None else modules
+    external_fees = EXTERNAL_FEES if external_fees is None else external_fees
+    validate_tariff(package_sizes, modules, external_fees, discounts)
+    return CompiledTariff(package_sizes, modules, external_fees, discounts, source=source)
+
+
+def read_tariff_file(path):
+    """Parse a JSON, YAML or TOML tariff file into its sections (optional ones default to empty)"""
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == ".json":
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        elif extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise TariffError("YAML tariff files require PyYAML (pip install pyyaml)")
+            with open(path, encoding="utf-8") as f:
+                data = yaml.safe_load(f)
+        elif extension == ".toml":
+            import tomllib
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        else:
+            raise TariffError(f"Unsupported tariff file type '{extension}' (use .json, .yaml or .toml)")
+    except TariffError:
+        raise
+    except Exception as e:
+        raise TariffError(f"Could not read tariff file {path}: {e}") from e
+
+    if not isinstance(data, dict):
+        raise TariffError(f"Tariff file {path} must contain a mapping")
+    missing = [section for section in TARIFF_SECTIONS if section not in data]
+    if missing:
+        raise TariffError(f"Tariff file {path} is missing: {', '.join(missing)}")
+    sections = {section: data[section] for section in TARIFF_SECTIONS}
+    sections.update({section: data.get(section) or {} for section in OPTIONAL_SECTIONS})
+    return sections
+
+
+def load_tariff_file(path):
+    """Read, validate and compile a tariff file into an immutable snapshot"""
+    data = read_tariff_file(path)
+    return compile_tariff(data["PACKAGE_SIZES"], data["MODULES"], data["EXTERNAL_FEES"], data["DISCOUNTS"],
+                          source=path)
+
+
+_current_tariff = None
+_tariff_lock = threading.Lock()
+_watcher = None
+
+
+def set_tariff(tariff):
+    """Atomically make tariff the snapshot handed to new sessions"""
+    global _current_tariff
+    _current_tariff = tariff
+
+
+def get_tariff():
+    """Return the current process-wide tariff snapshot, loading it on first use.
+
+    If PRICING_TARIFF_FILE is set the tariff is read from that file and watched
+    for changes; otherwise pricing_config is compiled.
+    """
+    if _current_tariff is None:
+        with _tariff_lock:
+            if _current_tariff is None:
+                path = os.environ.get("PRICING_TARIFF_FILE")
+                if path:
+                    set_tariff(load_tariff_file(path))
+                    start_tariff_watcher(path)
+                else:
+                    set_tariff(compile_tariff())
+    return _current_tariff
+
+
+class TariffWatcher(threading.Thread):
+    """Poll a tariff file and swap in a new snapshot whenever its content changes.
+
+    Invalid edits are reported and ignored, so the last good tariff stays live.
+    Sessions that already hold a snapshot keep using it.
+    """
+
+    def __init__(self, path, interval=2.0, log=print):
+        super().__init__(name="tariff-watcher", daemon=True)
+        self.path = path
+        self.interval = interval
+        self.log = log
+        self._stop_event = threading.Event()
+        self._last_mtime = self._mtime()
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def check(self):
+        """Reload the file if it changed since the last check; returns True when a new snapshot went live"""
+        mtime = self._mtime()
+        if mtime is None or mtime == self._last_mtime:
+            return False
+        self._last_mtime = mtime
+        try:
+            tariff = load_tariff_file(self.path)
+        except TariffError as e:
+            self.log(f"Keeping tariff {get_tariff().version}: {e}")
+            return False
+        if tariff.version == get_tariff().version:
+            return False
+        set_tariff(tariff)
+        self.log(f"Loaded tariff {tariff.version} from {self.path}")
+        return True
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_tariff_watcher(path, interval=None):
+    """Start (once per process) the background watcher for path"""
+    global _watcher
+    if _watcher is None:
+        if interval is None:
+            interval = float(os.environ.get("PRICING_TARIFF_POLL_SECONDS", "2"))
+        _watcher = TariffWatcher(path, interval)
+        _watcher.start()
+    return _watcher
+
+
+def export_tariff(path, tariff=None):
+    """Write a tariff (default: pricing_config) as JSON, as a starting point for a tariff file"""
+    tariff = tariff or compile_tariff()
+    data = {
+        "PACKAGE_SIZES": tariff.package_sizes,
+        "MODULES": tariff.modules,
+        "EXTERNAL_FEES": tariff.external_fees,
+        "DISCOUNTS": tariff.discount_rules,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False, default=_thaw)
+
+
+def _thaw(value):
+    if isinstance(value, MappingProxyType):
+        return dict(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3 or sys.argv[1] not in ("check", "export"):
+        sys.exit("Usage: python tariff.py check|export FILE")
+    if sys.argv[1] == "export":
+        export_tariff(sys.argv[2])
+        print(f"Wrote pricing_config tariff to {sys.argv[2]}")
+    else:
+        try:
+            tariff = load_tariff_file(sys.argv[2])
+        except TariffError as e:
+            sys.exit(str(e))
+        print(f"{sys.argv[2]} is valid: {tariff!r}")
@@ -0,0 +1,155 @@
+"""API status codes and error bodies, called in-process through LocalClient."""
+import asyncio
+import threading
+
+import pytest
+
+from api import LocalClient, MAX_SWEEP_VALUES, PricingAPI, ROUTES
+from tariff import get_tariff
+
+
+@pytest.fixture(scope="module")
+def client():
+    return LocalClient()
+
+
+@pytest.fixture(scope="module")
+def package():
+    return get_tariff().package_names[0]
+
+
+def test_health(client):
+    status, body = client.get('/health')
+    assert status == 200
+    assert body == {'status': 'ok', 'tariff_version': get_tariff().version}
+
+
+def test_unknown_route_and_method(client):
+    assert client.get('/nope') == (404, {'error': "Not found"})
+    assert client.get('/quote') == (405, {'error': "Method not allowed"})
+
+
+def test_quote(client, package):
+    status, body = client.post('/quote', {'modules': ['System Access'], 'package': package, 'orders': 40})
+    assert status == 200
+    assert body['monthly']['total'] == pytest.approx(body['yearly']['total_yearly'] / 12)
+
+
+@pytest.mark.parametrize("payload, error", [
+    ({'modules': 'System Access', 'orders': 10}, "'modules' must be a list of module names"),
+    ({'modules': [1], 'orders': 10}, "'modules' must be a list of module names"),
+    ({'modules': ['Teleportation'], 'orders': 10}, "Unknown modules: Teleportation"),
+    ({'modules': ['System Access'], 'package': 'Gold', 'orders': 10}, "Unknown package: 'Gold'"),
+    ({'modules': ['System Access'], 'orders': -1}, "'orders' must be a non-negative number"),
+    ({'modules': ['System Access'], 'orders': float('nan')}, "'orders' must be a non-negative number"),
+    ({'modules': ['System Access'], 'orders': float('inf')}, "'orders' must be a non-negative number"),
+    ({'modules': ['System Access'], 'orders': 10, 'contract_month': 0},
+     "'contract_month' must be a whole number from 1"),
+])
+def test_quote_errors(client, package, payload, error):
+    payload = dict({'package': package}, **payload)
+    assert client.post('/quote', payload) == (400, {'error': error})
+
+
+@pytest.mark.parametrize("inputs, error", [
+    ({'forecast_months': 0}, "forecast_months must be a whole number of months from 1 to 600"),
+    ({'forecast_months': 100_000}, "forecast_months must be a whole number of months from 1 to 600"),
+    ({'customers_month_1': -5}, "customers_month_1 must not be negative"),
+    ({'growth_cap': -1}, "growth_cap must not be negative"),
+    ({'monthly_subscription_fee': -39}, "monthly_subscription_fee must not be negative"),
+    ({'monthly_growth_rate': -1}, "monthly_growth_rate must be above -1"),
+    ({'kwh_addon_price': float('nan')}, "kwh_addon_price must be a number"),
+    ({'charger_type': 'Standard installation'}, "Unknown charger_type: 'Standard installation'"),
+    ({'forecast_months': 'many'}, "forecast_months"),
+    ({'customer_retention_rate': 1.5}, "customer_retention_rate"),
+    ({'start_month': 13}, "start_month"),
+    ({'charger_type': 'Foo'}, "Unknown charger_type: 'Foo'"),
+    ({'no_such_input': 1}, "no_such_input"),
+])
+def test_forecast_input_errors(client, inputs, error):
+    status, body = client.post('/forecast', {'modules': ['System Access'], 'inputs': inputs})
+    assert status == 400
+    assert error in body['error']
+
+
+def test_forecast(client):
+    status, body = client.post('/forecast', {'modules': ['System Access'], 'inputs': {'forecast_months': 12}})
+    assert status == 200
+    assert len(body['forecast']['months']) == 12
+
+
+def test_sweep_errors(client):
+    payload = {'modules': ['System Access'], 'inputs': {'forecast_months': 6}}
+    status, body = client.post('/forecast/metrics', dict(payload, sweep={'input': 'forecast_months',
+                                                                           'values': [6, 0]}))
+    assert status == 400
+    assert body['error'].startswith("Invalid sweep value at index 1: ")
+    status, body = client.post('/forecast/metrics', dict(payload, sweep={'input': 'nope', 'values': [1]}))
+    assert (status, body) == (400, {'error': "Unknown forecast input: 'nope'"})
+    status, body = client.post('/forecast/metrics', dict(payload, discount_rate=float('nan')))
+    assert (status, body) == (400, {'error': "'discount_rate' must be an annual rate above -1, e.g. 0.1"})
+    status, _ = client.post('/forecast/export', dict(payload, sweep={'input': 'forecast_months',
+                                                                      'values': [6] * (MAX_SWEEP_VALUES + 1)}))
+    assert status == 413
+
+
+def test_forecast_export_streams_csv(client):
+    status, body = client.post('/forecast/export', {'modules': ['System Access'], 'inputs': {'forecast_months': 6}})
+    assert status == 200
+    lines = body.decode('utf-8').splitlines()
+    assert lines[0].startswith('month,') and len(lines) == 7
+    status, body = client.post('/forecast/export', {'modules': ['System Access'], 'format': 'pdf'})
+    assert status == 400 and 'error' in body
+
+
+def test_quote_batch(client, package):
+    status, body = client.post('/quotes/batch', {'quotes': [
+        {'modules': ['System Access'], 'package': package, 'orders': 10},
+        {'modules': ['System Access'], 'orders': 300},
+    ]})
+    assert status == 200
+    assert body['count'] == 2 and body['package'][0] == package
+    status, body = client.post('/quotes/batch', {'quotes': [{'orders': 1}, {'orders': -5}]})
+    assert status == 400
+    assert body['error'].startswith("Invalid quote at index 1: ")
+    status, body = client.post('/quotes/batch', {'quotes': [{'modules': 'System Access', 'orders': 1}]})
+    assert (status, body) == (400, {'error': "Invalid quote at index 0: 'modules' must be a list of module names"})
+    status, body = client.post('/quotes/batch', {'quotes': [{'orders': float('inf')}]})
+    assert (status, body) == (400, {'error': "Invalid quote at index 0: 'orders' must be a non-negative number"})
+    assert client.post('/quotes/batch', {'quotes': []}) == (400, {'error': "'quotes' must be a non-empty list"})
+
+
+def test_invalid_body(client):
+    assert client.post('/quote', [1, 2]) == (400, {'error': "Request body must be a JSON object"})
+
+
+def test_unexpected_handler_errors_are_client_errors():
+    def broken(payload):
+        return {}['missing']
+    routes = dict(ROUTES)
+    routes[('GET', '/broken')] = broken
+    status, body = LocalClient(PricingAPI(routes)).get('/broken')
+    assert status == 400
+    assert body['error'].startswith("Invalid request: ")
+
+
+def test_plain_handlers_run_off_the_event_loop():
+    released = threading.Event()
+
+    def slow(payload):
+        return {'released': released.wait(timeout=5)}
+
+    def release(payload):
+        released.set()
+        return {}
+
+    routes = dict(ROUTES)
+    routes[('GET', '/slow')] = slow
+    routes[('GET', '/release')] = release
+    client = LocalClient(PricingAPI(routes))
+
+    async def both():
+        return await asyncio.gather(client.request('GET', '/slow'), client.request('GET', '/release'))
+
+    (status, body), _ = asyncio.run(both())
+    assert (status, body) == (200, {'released': True})
@@ -0,0 +1,68 @@
+"""Quote micro-batcher: concurrent quotes are priced in one batch with the same results as alone."""
+import asyncio
+
+import numpy as np
+import pytest
+
+from batcher import QuoteBatcher
+from pricing_calculator import price_quotes
+from pricing_config import EXTERNAL_FEES, MODULES, PACKAGE_SIZES
+from tariff import compile_tariff, get_tariff
+
+
+def quotes(tariff, count):
+    rng = np.random.default_rng(count)
+    return [(tariff.module_mask(rng.choice(tariff.module_names, rng.integers(1, 4), replace=False)),
+             int(rng.integers(-1, len(tariff.package_names))), float(rng.integers(0, 600)), int(rng.integers(1, 13)))
+            for _ in range(count)]
+
+
+def run_batched(batcher, requests):
+    async def all_quotes():
+        return await asyncio.gather(*(batcher.quote(tariff, mask, package, orders, month)
+                                      for tariff, (mask, package, orders, month) in requests))
+    return asyncio.run(all_quotes())
+
+
+def test_concurrent_quotes_share_one_batch():
+    tariff = get_tariff()
+    batch = quotes(tariff, 50)
+    batcher = QuoteBatcher(max_batch_size=512, max_wait_ms=50)
+    results = run_batched(batcher, [(tariff, quote) for quote in batch])
+
+    assert batcher.metrics.batches == 1 and batcher.metrics.quotes == 50
+    for (mask, package, orders, month), result in zip(batch, results):
+        alone = price_quotes(tariff, [mask], [package], [orders], [month])
+        assert result == {name: values.tolist()[0] for name, values in alone.items()}
+
+
+def test_full_batches_flush_without_waiting():
+    tariff = get_tariff()
+    batcher = QuoteBatcher(max_batch_size=8, max_wait_ms=10_000)
+    results = run_batched(batcher, [(tariff, quote) for quote in quotes(tariff, 24)])
+    assert len(results) == 24
+    assert batcher.metrics.batches == 3 and batcher.metrics.max_batch_size == 8
+
+
+def test_tariff_snapshots_are_priced_separately():
+    old = get_tariff()
+    cheaper = {name: dict(info, prices={package: price / 2 for package, price in info['prices'].items()})
+               for name, info in MODULES.items()}
+    new = compile_tariff(PACKAGE_SIZES, cheaper, EXTERNAL_FEES)
+    quote = (old.module_mask(['System Access']), 0, 10.0, 1)
+    batcher = QuoteBatcher(max_wait_ms=50)
+    before, after = run_batched(batcher, [(old, quote), (new, quote)])
+    assert batcher.metrics.batches == 1
+    assert after['base_modules'] == pytest.approx(before['base_modules'] / 2)
+
+
+def test_errors_reach_every_waiting_quote():
+    tariff = get_tariff()
+    batcher = QuoteBatcher(max_wait_ms=50)
+    bad = (tariff.module_mask(['System Access']), len(tariff.package_names) + 5, 10.0, 1)
+
+    async def both():
+        return await asyncio.gather(batcher.quote(tariff, *bad), batcher.quote(tariff, *bad),
+                                    return_exceptions=True)
+    results = asyncio.run(both())
+    assert all(isinstance(result, IndexError) for result in results)
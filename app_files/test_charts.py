@@ -0,0 +1,37 @@
+"""Cached charts: every call gets its own figures, built from one cached spec."""
+from cache import shared_cache
+from charts import get_cash_figure, get_figures
+from finance import cash_flow_metrics
+from forecast import forecast_inputs, forecast_key, get_forecast
+from pricing_calculator import PricingCalculator
+from tariff import get_tariff
+
+
+def forecast_and_key():
+    tariff = get_tariff()
+    calculator = PricingCalculator(['System Access'], tariff.package_names[0], tariff)
+    inputs = forecast_inputs(tariff, forecast_months=18, customers_month_1=7)
+    return get_forecast(calculator, inputs), forecast_key(calculator, inputs)
+
+
+def test_figures_are_not_shared_between_calls():
+    forecast, key = forecast_and_key()
+    first = get_figures(key, forecast)
+    first['total'].update_layout(title="changed by one session")
+    first['total'].add_bar(x=[1], y=[1])
+    second = get_figures(key, forecast)
+    assert second['total'] is not first['total']
+    assert second['total'].layout.title.text != "changed by one session"
+    assert len(second['total'].data) == len(first['total'].data) - 1
+    assert set(second) == {'fixed', 'variable', 'total', 'customers'}
+
+
+def test_cash_figure_key_ignores_float_noise():
+    forecast, key = forecast_and_key()
+    metrics = cash_flow_metrics(forecast['profit'], 0.07)
+    first = get_cash_figure(key, forecast, metrics, 0.07)
+    misses = shared_cache.stats()['misses']
+    second = get_cash_figure(key, forecast, metrics, 0.07 + 1e-12)
+    assert shared_cache.stats()['misses'] == misses
+    assert first is not second
+    assert first.to_plotly_json() == second.to_plotly_json()
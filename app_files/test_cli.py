@@ -0,0 +1,68 @@
+"""Batch quoting CLI: priced rows, error rows and one output schema across chunks."""
+import csv
+import io
+import json
+
+import pytest
+
+from cli import RESULT_FIELDS, main
+from tariff import get_tariff
+
+
+@pytest.fixture
+def package():
+    return get_tariff().package_names[0]
+
+
+def run(tmp_path, capsys, name, text, *options):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    status = main(['quote', str(path), *options])
+    return status, capsys.readouterr().out
+
+
+def test_csv_rows_are_priced_and_errors_reported(tmp_path, capsys, package):
+    text = ("customer,modules,package,orders,contract_month\n"
+            f"a,System Access;API Integration,{package},40,\n"
+            "b,System Access,,300,2\n"
+            "c,Teleportation,,10,\n"
+            "d,System Access,,nan,\n"
+            "e,System Access,,inf,\n"
+            "f,System Access,,10,1.5\n")
+    status, out = run(tmp_path, capsys, "quotes.csv", text, "--chunk-size", "2", "--strict")
+    rows = list(csv.DictReader(io.StringIO(out)))
+    assert status == 1
+    assert list(rows[0]) == ['customer', 'modules', 'orders', 'contract_month'] + list(RESULT_FIELDS)
+    assert [row['customer'] for row in rows] == list("abcdef")
+    assert rows[0]['package'] == package and rows[0]['error'] == ''
+    assert float(rows[1]['total']) == float(rows[1]['optimal_total'])
+    assert rows[2]['error'] == "unknown modules: Teleportation"
+    assert rows[3]['error'] == rows[4]['error'] == "orders must be a non-negative number"
+    assert rows[5]['error'] == "contract_month must be a whole number from 1"
+
+
+@pytest.mark.parametrize("chunk_size", ["1", "2", "100"])
+def test_jsonl_to_csv_keeps_one_schema_across_chunks(tmp_path, capsys, package, chunk_size):
+    lines = ["{not json", json.dumps({'modules': ['System Access'], 'package': package, 'orders': 10}),
+             "[1, 2]", json.dumps({'modules': ['System Access'], 'orders': 20, 'contract_month': 3})]
+    status, out = run(tmp_path, capsys, "quotes.jsonl", "\n".join(lines) + "\n",
+                      "--output-format", "csv", "--chunk-size", chunk_size)
+    assert status == 0
+    header, *records = list(csv.reader(io.StringIO(out)))
+    assert header == ['modules', 'orders', 'contract_month', 'discount_codes', 'input'] + list(RESULT_FIELDS)
+    assert all(len(record) == len(header) for record in records)
+    rows = [dict(zip(header, record)) for record in records]
+    assert rows[0]['input'] == "{not json" and rows[0]['error'].startswith("invalid JSON")
+    assert rows[1]['modules'] == 'System Access' and rows[1]['package'] == package and rows[1]['error'] == ''
+    assert rows[2]['error'] == "a quote must be a JSON object"
+    assert rows[3]['orders'] == '20' and rows[3]['contract_month'] == '3' and rows[3]['error'] == ''
+
+
+def test_jsonl_output_and_workers_match_serial(tmp_path, capsys):
+    lines = [json.dumps({'modules': ['System Access'], 'orders': orders}) for orders in range(0, 500, 7)]
+    _, serial = run(tmp_path, capsys, "quotes.jsonl", "\n".join(lines), "--chunk-size", "8")
+    _, parallel = run(tmp_path, capsys, "quotes.jsonl", "\n".join(lines), "--chunk-size", "8", "--workers", "2")
+    assert serial == parallel
+    rows = [json.loads(line) for line in serial.splitlines()]
+    assert [row['orders'] for row in rows] == list(range(0, 500, 7))
+    assert all(row['error'] == '' for row in rows)
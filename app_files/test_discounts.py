@@ -0,0 +1,73 @@
+"""Discount rule masks: the compiled array matcher against each rule's conditions read one quote at a time."""
+import itertools
+
+import numpy as np
+
+from discounts import normalize_codes
+from pricing_config import EXTERNAL_FEES, MODULES, PACKAGE_SIZES
+from tariff import compile_tariff
+
+PACKAGES = list(PACKAGE_SIZES)
+DISCOUNTS = {
+    "Bundle": {'min_modules': 3, 'percent_off': 10, 'applies_to': 'modules'},
+    "Integrations": {'modules': ['System Access', 'API Integration'], 'fixed_off': 100},
+    "Any returns": {'any_modules': ['Return Management', 'Inventory Management'], 'percent_off': 5},
+    "Volume": {'packages': PACKAGES[2:], 'min_orders': 150, 'max_orders': 400, 'fixed_off': 250},
+    "Introduction": {'from_month': 2, 'free_months': 2},
+    "Partner": {'code': 'partner', 'to_month': 12, 'percent_off': 20},
+}
+
+
+def discount_tariff():
+    return compile_tariff(PACKAGE_SIZES, MODULES, EXTERNAL_FEES, DISCOUNTS)
+
+
+def rule_applies(rule, modules, package, orders, month, codes):
+    last = rule['from_month'] + rule['free_months'] - 1 if 'free_months' in rule else rule.get('to_month', np.inf)
+    return (set(rule.get('modules', ())) <= set(modules)
+            and (not rule.get('any_modules') or bool(set(rule['any_modules']) & set(modules)))
+            and len(modules) >= rule.get('min_modules', 0)
+            and package in rule.get('packages', PACKAGES)
+            and rule.get('min_orders', -np.inf) <= orders <= rule.get('max_orders', np.inf)
+            and rule.get('from_month', 1) <= month <= last
+            and ('code' not in rule or rule['code'].upper() in codes))
+
+
+def test_matches_agree_with_rule_conditions():
+    tariff = discount_tariff()
+    discounts = tariff.discounts
+    selections = [(), ('System Access',), ('System Access', 'API Integration'),
+                  ('System Access', 'Return Management', 'Marketplace'), tuple(MODULES)]
+    for codes in ((), ('PARTNER',)):
+        active = discounts.active(codes)
+        for modules, package, orders, month in itertools.product(
+                selections, range(len(PACKAGES)), (0, 150, 400, 401), (1, 2, 3, 4, 12, 13)):
+            hit = discounts.matches(tariff.module_mask(modules), package, orders, month, active)
+            expected = [rule_applies(rule, modules, PACKAGES[package], orders, month, codes)
+                        for rule in DISCOUNTS.values()]
+            assert hit.tolist() == expected, (modules, PACKAGES[package], orders, month, codes)
+
+
+def test_matches_broadcast_over_quotes():
+    tariff = discount_tariff()
+    masks = np.array([tariff.module_mask(MODULES), tariff.module_mask(['System Access'])], dtype=np.uint64)
+    hit = tariff.discounts.matches(masks[:, None], np.arange(len(PACKAGES)), 200, 1)
+    assert hit.shape == (2, len(PACKAGES), len(DISCOUNTS))
+    for row, mask in enumerate(masks):
+        for package in range(len(PACKAGES)):
+            assert (hit[row, package] == tariff.discounts.matches(mask, package, 200, 1)).all()
+
+
+def test_evaluate_adds_actions_and_caps_at_total():
+    tariff = discount_tariff()
+    mask = tariff.module_mask(['System Access', 'API Integration', 'Return Management'])
+    # Month 1 without code: Bundle (10% of modules), Integrations (100) and Any returns (5% of total)
+    discount = tariff.discounts.evaluate(mask, 0, 10, 1, 1000.0, 1500.0)
+    assert discount == 0.1 * 1000 + 100 + 0.05 * 1500
+    # A free month covers the whole price and no more
+    assert tariff.discounts.evaluate(mask, 0, 10, 2, 1000.0, 1500.0) == 1500.0
+
+
+def test_codes_are_normalized():
+    assert normalize_codes(" partner, annual,,PARTNER ") == ('ANNUAL', 'PARTNER')
+    assert discount_tariff().discounts.active("partner").all()
@@ -0,0 +1,50 @@
+"""Hourly electricity revenue against an hour-by-hour sum, and reloading of changed curves."""
+import os
+
+import numpy as np
+import pytest
+
+from electricity import (HOURS_PER_YEAR, MONTH_BOUNDS, hourly_electricity_revenue, load_price_curves,
+                         write_synthetic_curves)
+
+
+@pytest.fixture
+def curves_dir(tmp_path):
+    write_synthetic_curves(str(tmp_path))
+    return str(tmp_path)
+
+
+def test_revenue_matches_hourly_sum(curves_dir):
+    curves = load_price_curves(curves_dir)
+    active = np.array([100.0, 120.0, 150.0, 90.0])
+    total, by_segment = hourly_electricity_revenue(curves, active, 0.5, 0.1, start_month=11)
+
+    spot = np.asarray(curves.spot_price, dtype=float)
+    for month, customers in enumerate(active):
+        calendar_month = (month + 10) % 12
+        hours = slice(MONTH_BOUNDS[calendar_month], MONTH_BOUNDS[calendar_month + 1])
+        for segment, share in enumerate(curves.segment_shares):
+            kwh = np.asarray(curves.profiles[segment, hours], dtype=float)
+            expected = customers * share * (kwh.sum() * 0.5 + (kwh * spot[hours]).sum() * 0.1)
+            assert by_segment[month, segment] == pytest.approx(expected, rel=1e-5)
+    np.testing.assert_allclose(total, by_segment.sum(axis=1))
+
+
+def test_changed_curves_are_reloaded(curves_dir):
+    curves = load_price_curves(curves_dir)
+    assert load_price_curves(curves_dir) is curves
+    spot = np.full(HOURS_PER_YEAR, 2.0, dtype="<f4")
+    spot.tofile(os.path.join(curves_dir, "spot_price.f32"))
+    os.utime(os.path.join(curves_dir, "spot_price.f32"), ns=(1, 1))
+    reloaded = load_price_curves(curves_dir)
+    assert reloaded is not curves and reloaded.version != curves.version
+    assert (reloaded.spot_price == 2.0).all()
+
+
+def test_missing_or_broken_files_keep_the_last_curves(curves_dir):
+    curves = load_price_curves(curves_dir)
+    os.remove(os.path.join(curves_dir, "profiles.f32"))
+    assert load_price_curves(curves_dir) is curves
+    # A half-written file (wrong size) is not loaded either
+    np.zeros(10, dtype="<f4").tofile(os.path.join(curves_dir, "profiles.f32"))
+    assert load_price_curves(curves_dir) is curves
@@ -0,0 +1,68 @@
+"""CSV and Parquet exports read back to the forecast columns, across chunk boundaries."""
+import csv
+import io
+
+import numpy as np
+import pytest
+
+from exports import EXPORT_COLUMNS, iter_csv, iter_parquet
+
+PACKAGES = ("Small", "Medium", "Large")
+
+
+def forecast(months, seed):
+    rng = np.random.default_rng(seed)
+    result = {field: rng.uniform(-1000, 1000, months).round(2) for _, field in EXPORT_COLUMNS}
+    result['months'] = np.arange(1, months + 1)
+    result['optimal_package_index'] = rng.integers(0, len(PACKAGES), months)
+    return result
+
+
+def scenarios():
+    return [(value, forecast(months, seed)) for seed, (value, months) in enumerate([(10, 7), (20, 12), (30, 5)])]
+
+
+def expected_rows(pairs):
+    for scenario, data in pairs:
+        for month in range(len(data['months'])):
+            row = {'scenario': scenario}
+            for column, field in EXPORT_COLUMNS:
+                row[column] = data[field][month]
+            row['optimal_package'] = PACKAGES[row['optimal_package']]
+            yield row
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 5, 24, 1000])
+def test_csv_round_trip(chunk_rows):
+    pieces = list(iter_csv(scenarios(), PACKAGES, chunk_rows))
+    assert len(pieces) == -(-24 // chunk_rows)
+    rows = list(csv.DictReader(io.StringIO(b''.join(pieces).decode('utf-8'))))
+    expected = list(expected_rows(scenarios()))
+    assert len(rows) == len(expected)
+    for row, want in zip(rows, expected):
+        assert list(row) == list(want)
+        assert row['optimal_package'] == want['optimal_package']
+        for column in want:
+            if column != 'optimal_package':
+                assert float(row[column]) == pytest.approx(float(want[column]))
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 5, 1000])
+def test_parquet_round_trip(chunk_rows):
+    pq = pytest.importorskip('pyarrow.parquet')
+    table = pq.read_table(io.BytesIO(b''.join(iter_parquet(scenarios(), PACKAGES, chunk_rows))))
+    assert table.num_rows == 24
+    assert table.column_names == ['scenario'] + [column for column, _ in EXPORT_COLUMNS]
+    expected = list(expected_rows(scenarios()))
+    for column in table.column_names:
+        values = table.column(column).to_pylist()
+        if column == 'optimal_package':
+            assert values == [row[column] for row in expected]
+        else:
+            np.testing.assert_allclose(values, [row[column] for row in expected])
+
+
+def test_empty_export_writes_nothing():
+    assert list(iter_csv([], PACKAGES)) == []
+    pytest.importorskip('pyarrow')
+    assert list(iter_parquet([], PACKAGES)) == []
@@ -0,0 +1,52 @@
+"""NPV, IRR and payback on small cash-flow series with known answers."""
+import numpy as np
+import pytest
+
+from finance import annual_rate, cash_flow_metrics, irr, monthly_rate, npv, payback_month
+
+
+def test_npv_discounts_end_of_month_flows():
+    assert npv(0.0, [1.0, 2.0, 3.0]) == pytest.approx(6.0)
+    assert npv(0.1, [110.0, 121.0]) == pytest.approx(200.0)
+    # One rate per scenario row
+    np.testing.assert_allclose(npv([0.0, 0.1], [[110.0, 121.0], [110.0, 121.0]]), [231.0, 200.0])
+
+
+def test_rate_conversions_round_trip():
+    assert annual_rate(monthly_rate(0.1)) == pytest.approx(0.1)
+    assert monthly_rate(annual_rate(0.01)) == pytest.approx(0.01)
+
+
+def test_irr_is_the_rate_with_zero_npv():
+    rng = np.random.default_rng(1)
+    flows = np.concatenate([-rng.uniform(500, 2000, (50, 6)), rng.uniform(50, 400, (50, 54))], axis=1)
+    rates = irr(flows)
+    assert not np.isnan(rates).any()
+    np.testing.assert_allclose(npv(rates, flows), 0.0, atol=1e-6)
+    # Solving rows one at a time gives the same rates
+    np.testing.assert_allclose([irr(row) for row in flows], rates, rtol=1e-8)
+
+
+def test_irr_known_value():
+    # -100 in month 1 and 110 in month 2: 10% per month
+    assert irr([-100.0, 110.0]) == pytest.approx(0.1)
+
+
+def test_irr_is_nan_without_sign_change_or_outside_bracket():
+    assert np.isnan(irr([100.0, 100.0, 100.0]))
+    assert np.isnan(irr([-100.0, -100.0]))
+    # Root at 200% per month, outside the solver bracket
+    assert np.isnan(irr([-1.0, 3.0]))
+
+
+def test_payback_month():
+    np.testing.assert_array_equal(payback_month([[5, 5, 5], [-5, 2, 4], [-5, 6, -2], [-5, 1, 1]]),
+                                  [1, 3, np.nan, np.nan])
+    assert payback_month([-5, 6, -2, 3]) == 4
+
+
+def test_cash_flow_metrics_shapes():
+    metrics = cash_flow_metrics(np.ones((3, 24)) * np.r_[-10.0, np.ones(23)], 0.1)
+    assert metrics['npv'].shape == metrics['irr_annual'].shape == (3,)
+    assert metrics['cumulative_cash'].shape == (3, 24)
+    assert metrics['cumulative_cash'][0, -1] == pytest.approx(13.0)
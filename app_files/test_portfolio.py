@@ -0,0 +1,68 @@
+"""simulate_portfolio against a customer-by-customer reference."""
+import numpy as np
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq
+
+from portfolio import Portfolio, PortfolioError, simulate_portfolio
+
+
+def write_portfolio(path, customers=500, seed=0):
+    rng = np.random.default_rng(seed)
+    kwh = rng.uniform(100, 500, customers)
+    churn = rng.uniform(0.0, 0.05, customers)
+    # Some customers leave consumption and churn to the forecast defaults
+    kwh[rng.random(customers) < 0.2] = np.nan
+    churn[rng.random(customers) < 0.2] = np.nan
+    pq.write_table(pa.table({
+        'customer_id': np.arange(customers),
+        'segment': rng.choice(['Residential', 'Fleet', ''], customers),
+        'charger_type': rng.choice(['Zaptec Go', 'NexBlue Edge', None], customers),
+        'monthly_fee': rng.choice([39.0, 49.0, 99.0], customers),
+        'kwh_per_month': pa.array(kwh, from_pandas=True),
+        'churn_rate': pa.array(churn, from_pandas=True),
+    }), path)
+    return path
+
+
+def reference(table, months, default_kwh, default_churn):
+    segments, chargers = {}, {}
+    for row in table.to_pylist():
+        segment = row['segment'] or "All"
+        charger = row['charger_type'] or "Unspecified"
+        survive = 1 - (default_churn if row['churn_rate'] is None else row['churn_rate'])
+        kwh = default_kwh if row['kwh_per_month'] is None else row['kwh_per_month']
+        active = survive ** np.arange(1, months + 1)
+        totals = segments.setdefault(segment, np.zeros((3, months)))
+        totals += [active, active * row['monthly_fee'], active * kwh]
+        chargers[charger] = chargers.get(charger, 0) + active
+    return segments, chargers
+
+
+@pytest.mark.parametrize("max_elements", [1, 1000, 10_000_000])
+def test_simulation_matches_reference(tmp_path, max_elements):
+    path = write_portfolio(str(tmp_path / "portfolio.parquet"))
+    portfolio = Portfolio(path)
+    result = simulate_portfolio(portfolio, 30, default_kwh=250.0, default_churn=0.02, max_elements=max_elements)
+    segments, chargers = reference(pq.read_table(path), 30, 250.0, 0.02)
+
+    assert sorted(portfolio.segment_names) == sorted(segments)
+    for index, name in enumerate(portfolio.segment_names):
+        active, subscription, kwh = segments[name]
+        np.testing.assert_allclose(result['active_by_segment'][index], active)
+        np.testing.assert_allclose(result['subscription_by_segment'][index], subscription)
+        np.testing.assert_allclose(result['kwh_by_segment'][index], kwh)
+    assert sorted(portfolio.charger_names) == sorted(chargers)
+    for index, name in enumerate(portfolio.charger_names):
+        np.testing.assert_allclose(result['active_by_charger'][index], chargers[name])
+
+
+def test_invalid_portfolio_is_rejected(tmp_path):
+    path = str(tmp_path / "portfolio.parquet")
+    pq.write_table(pa.table({'monthly_fee': [10.0, 20.0], 'churn_rate': [0.1, 1.5]}), path)
+    with pytest.raises(PortfolioError, match="churn_rate"):
+        Portfolio(path)
+    pq.write_table(pa.table({'segment': ["Fleet"]}), path)
+    with pytest.raises(PortfolioError, match="monthly_fee"):
+        Portfolio(path)
@@ -0,0 +1,75 @@
+"""The vectorized pricing paths agree with the scalar calculator, quote by quote."""
+import numpy as np
+import pytest
+
+from pricing_calculator import PricingCalculator, price_quotes
+from pricing_config import EXTERNAL_FEES, MODULES, PACKAGE_SIZES
+from tariff import compile_tariff
+
+FIRST_PACKAGE = next(iter(PACKAGE_SIZES))
+BANDED_PACKAGES = dict(PACKAGE_SIZES, **{FIRST_PACKAGE: {
+    'order_limit': 25, 'overage_bands': [{'up_to': 40, 'fee': 450}, {'up_to': 120, 'fee': 300}, {'fee': 150}]}})
+DISCOUNTS = {
+    "Bundle": {'min_modules': 4, 'percent_off': 10, 'applies_to': 'modules'},
+    "Introduction": {'free_months': 1},
+    "Partner": {'code': 'PARTNER', 'packages': list(PACKAGE_SIZES)[1:], 'fixed_off': 700},
+}
+TARIFFS = {
+    'flat': lambda: compile_tariff(),
+    'banded': lambda: compile_tariff(BANDED_PACKAGES, MODULES, EXTERNAL_FEES),
+    'discounts': lambda: compile_tariff(BANDED_PACKAGES, MODULES, EXTERNAL_FEES, DISCOUNTS),
+}
+SELECTIONS = [['System Access'], ['System Access', 'API Integration', 'Return Management', 'Marketplace'],
+              list(MODULES)]
+ORDERS = [0, 10, 25, 26, 64.5, 100, 180, 250, 400, 1200]
+MONTHS = [1, 2, 13]
+
+
+@pytest.fixture(params=sorted(TARIFFS))
+def tariff(request):
+    return TARIFFS[request.param]()
+
+
+@pytest.mark.parametrize("codes", [(), ('PARTNER',)])
+def test_find_optimal_packages_matches_find_optimal_package(tariff, codes):
+    for modules in SELECTIONS:
+        calculator = PricingCalculator(modules, FIRST_PACKAGE, tariff, discount_codes=codes)
+        orders = np.repeat(ORDERS, len(MONTHS))
+        months = np.tile(MONTHS, len(ORDERS))
+        result = calculator.find_optimal_packages(orders, months)
+        for i, (value, month) in enumerate(zip(orders, months)):
+            scalar = calculator.find_optimal_package(value, month)
+            assert tariff.package_names[result['package_index'][i]] == scalar['optimal_package']
+            for field in ('base_modules', 'overage_orders', 'overage_cost', 'discount', 'total'):
+                assert result[field][i] == pytest.approx(scalar['cost_breakdown'][field]), (field, value, month)
+
+
+def test_price_quotes_matches_calculate_cost_for_package(tariff):
+    quotes = [(modules, package, value, month)
+              for modules in SELECTIONS for package in range(-1, len(tariff.package_names))
+              for value in ORDERS for month in MONTHS]
+    masks = [tariff.module_mask(modules) for modules, _, _, _ in quotes]
+    result = price_quotes(tariff, masks, [package for _, package, _, _ in quotes],
+                          [value for _, _, value, _ in quotes], [month for _, _, _, month in quotes])
+    for i, (modules, package, value, month) in enumerate(quotes):
+        calculator = PricingCalculator(modules, FIRST_PACKAGE, tariff)
+        optimal = calculator.find_optimal_package(value, month)
+        name = optimal['optimal_package'] if package < 0 else tariff.package_names[package]
+        expected = calculator.calculate_cost_for_package(name, value, month)
+        assert tariff.package_names[result['package_index'][i]] == name
+        assert tariff.package_names[result['optimal_package_index'][i]] == optimal['optimal_package']
+        for field in ('base_modules', 'overage_orders', 'overage_cost', 'discount', 'total'):
+            assert result[field][i] == pytest.approx(expected[field]), (field, modules, name, value, month)
+        assert result['monthly_savings'][i] == pytest.approx(expected['total'] - optimal['cost_breakdown']['total'])
+
+
+def test_price_quotes_uses_per_quote_discount_codes():
+    tariff = TARIFFS['discounts']()
+    package = 1
+    active = np.stack([tariff.discounts.active(()), tariff.discounts.active(('PARTNER',))])
+    result = price_quotes(tariff, [tariff.module_mask(['System Access'])] * 2, [package] * 2, [50, 50], 5, active)
+    for i, codes in enumerate([(), ('PARTNER',)]):
+        calculator = PricingCalculator(['System Access'], FIRST_PACKAGE, tariff, discount_codes=codes)
+        expected = calculator.calculate_cost_for_package(tariff.package_names[package], 50, 5)
+        assert result['total'][i] == pytest.approx(expected['total'])
+    assert result['discount'][1] > result['discount'][0]
@@ -0,0 +1,74 @@
+"""Background PDF quotes: rendering on the process pool, shared jobs, the pending limit and failures."""
+import time
+
+import pytest
+
+from currency import BASE_CURRENCY
+from forecast import forecast_inputs, get_forecast
+from pricing_calculator import PricingCalculator
+from quote_pdf import QuoteBusyError, QuoteJobs, build_quote_document, quote_key, render_quote_pdf
+from tariff import get_tariff
+
+
+@pytest.fixture
+def jobs():
+    jobs = QuoteJobs(max_workers=1, max_pending=2)
+    yield jobs
+    if jobs._executor is not None:
+        jobs._executor.shutdown(cancel_futures=True)
+
+
+def document(customer="ACME"):
+    tariff = get_tariff()
+    calculator = PricingCalculator(['System Access', 'API Integration'], tariff.package_names[0], tariff)
+    inputs = forecast_inputs(tariff, forecast_months=12)
+    return (quote_key(calculator, inputs, BASE_CURRENCY, customer),
+            build_quote_document(calculator, inputs, get_forecast(calculator, inputs), BASE_CURRENCY, customer))
+
+
+def wait(jobs, key, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = jobs.status(key)
+        if status['state'] in ('done', 'failed'):
+            return status
+        assert status['state'] in ('queued', 'rendering') and 0 <= status['progress'] < 1
+        time.sleep(0.05)
+    raise AssertionError("PDF quote did not finish")
+
+
+def test_render_quote_pdf():
+    _, doc = document()
+    assert render_quote_pdf(doc).startswith(b"%PDF")
+
+
+def test_identical_quotes_share_one_job_and_cached_pdf(jobs):
+    key, doc = document("Shared job")
+    builds = []
+
+    def build():
+        builds.append(1)
+        return doc
+
+    assert jobs.status(key)['state'] == 'none'
+    jobs.submit(key, build)
+    jobs.submit(key, build)
+    status = wait(jobs, key)
+    assert status['state'] == 'done' and status['pdf'].startswith(b"%PDF")
+    jobs.submit(key, build)
+    assert builds == [1]
+    assert jobs.status(key)['pdf'] == status['pdf']
+
+
+def test_pending_limit_and_failures(jobs):
+    # Documents without their fields fail in the worker
+    jobs.submit("broken-1", dict)
+    jobs.submit("broken-2", dict)
+    with pytest.raises(QuoteBusyError):
+        jobs.submit("broken-3", dict)
+    status = wait(jobs, "broken-1")
+    assert status['state'] == 'failed' and status['error']
+    assert wait(jobs, "broken-2")['state'] == 'failed'
+    # Failed jobs no longer count as pending
+    jobs.submit("broken-3", dict)
+    assert wait(jobs, "broken-3")['state'] == 'failed'
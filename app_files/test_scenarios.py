@@ -0,0 +1,115 @@
+"""Scenario store: round trips of forecast arrays, listing filters and concurrent saves."""
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+
+from cache import shared_cache
+from forecast import forecast_inputs, forecast_key, get_forecast
+from pricing_calculator import PricingCalculator
+from scenarios import SCHEMA, ScenarioStore, prime_forecast_cache
+from tariff import get_tariff
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ScenarioStore(str(tmp_path / "scenarios.db"))
+    yield store
+    store.close()
+
+
+def calculator(modules=('System Access',)):
+    tariff = get_tariff()
+    return PricingCalculator(list(modules), tariff.package_names[0], tariff)
+
+
+def test_save_and_load_round_trip(store):
+    calc = calculator()
+    inputs = forecast_inputs(calc.tariff, forecast_months=12, customers_month_1=9)
+    forecast = get_forecast(calc, inputs)
+    key = store.save("Base case", calc, inputs, forecast, customer="ACME")
+
+    scenario = store.load(key)
+    assert scenario['name'] == "Base case" and scenario['customer'] == "ACME"
+    assert scenario['modules'] == ['System Access']
+    # Inputs come back from JSON (tuples as lists) and still map to the same forecast
+    assert scenario['forecast_key'] == forecast_key(calc, inputs) == forecast_key(calc, scenario['inputs'])
+    assert scenario['profit'] == pytest.approx(float(np.sum(forecast['total_revenue'] - forecast['total_costs'])))
+    assert set(scenario['forecast']) == set(forecast)
+    for name, values in forecast.items():
+        np.testing.assert_array_equal(scenario['forecast'][name], values)
+    assert store.load("unknown") is None
+
+
+def test_same_inputs_replace_and_listing_filters(store):
+    calc = calculator()
+    inputs = forecast_inputs(calc.tariff, forecast_months=6)
+    forecast = get_forecast(calc, inputs)
+    first = store.save("v1", calc, inputs, forecast, customer="ACME")
+    assert store.save("v2", calc, inputs, forecast, customer="ACME") == first
+    store.save("Other", calc, inputs, forecast, customer="Globex")
+
+    assert [row['name'] for row in store.list(customer="ACME")] == ["v2"]
+    assert len(store.list()) == 2
+    assert store.customers() == ["ACME", "Globex"]
+    assert store.list(tariff_version="nope") == []
+    store.delete(first)
+    assert store.load(first) is None
+
+
+def test_loading_primes_the_shared_cache(store):
+    calc = calculator(('System Access', 'API Integration'))
+    inputs = forecast_inputs(calc.tariff, forecast_months=7)
+    key = store.save("Cached", calc, inputs, get_forecast(calc, inputs))
+    scenario = store.load(key)
+    shared_cache.clear()
+    prime_forecast_cache(scenario)
+    misses = shared_cache.stats()['misses']
+    assert get_forecast(calc, inputs) is scenario['forecast']
+    assert shared_cache.stats()['misses'] == misses
+
+
+def test_concurrent_saves_and_reads(store):
+    calc = calculator()
+    forecasts = {}
+    for months in range(1, 17):
+        inputs = forecast_inputs(calc.tariff, forecast_months=months)
+        forecasts[months] = inputs, get_forecast(calc, inputs)
+    errors = []
+
+    def worker(months):
+        try:
+            inputs, forecast = forecasts[months]
+            key = store.save(f"{months} months", calc, inputs, forecast)
+            assert len(store.load(key)['forecast']['months']) == months
+            store.list(limit=5)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(months,)) for months in forecasts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(store.list(limit=100)) == len(forecasts)
+
+
+def test_discount_codes_are_saved_and_old_databases_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as conn:
+        # A database created before scenarios kept their discount codes
+        conn.executescript(SCHEMA.replace("    discount_codes TEXT NOT NULL DEFAULT '[]',  "
+                                          "-- JSON list of the discount codes priced with\n", ""))
+    store = ScenarioStore(path)
+    tariff = get_tariff()
+    inputs = forecast_inputs(tariff, forecast_months=6)
+    plain = PricingCalculator(['System Access'], tariff.package_names[0], tariff)
+    coded = PricingCalculator(['System Access'], tariff.package_names[0], tariff, discount_codes="annual, partner")
+    plain_key = store.save("Plain", plain, inputs, get_forecast(plain, inputs))
+    coded_key = store.save("Coded", coded, inputs, get_forecast(coded, inputs))
+    assert plain_key != coded_key
+    assert store.load(plain_key)['discount_codes'] == []
+    assert store.load(coded_key)['discount_codes'] == ['ANNUAL', 'PARTNER']
+    store.close()
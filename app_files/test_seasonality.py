@@ -0,0 +1,31 @@
+"""retained_total's prefix scan against the day-by-day recurrence."""
+import numpy as np
+import pytest
+
+from seasonality import retained_total
+
+
+def recurrence(inflow, retention, initial):
+    totals = []
+    total = initial
+    for added, kept in zip(inflow, retention):
+        total = kept * total + added
+        totals.append(total)
+    return np.array(totals)
+
+
+@pytest.mark.parametrize("days", [0, 1, 2, 3, 7, 64, 365, 1000])
+def test_retained_total_matches_recurrence(days):
+    rng = np.random.default_rng(days)
+    inflow = rng.uniform(0, 10, days)
+    retention = rng.uniform(0.9, 1.0, days)
+    np.testing.assert_allclose(retained_total(inflow, retention, 50.0), recurrence(inflow, retention, 50.0),
+                               rtol=1e-10)
+
+
+def test_retained_total_keeps_inputs_and_handles_full_churn():
+    inflow = np.array([1.0, 2.0, 3.0, 4.0])
+    retention = np.array([1.0, 0.0, 1.0, 0.5])
+    np.testing.assert_allclose(retained_total(inflow, retention, 10.0), [11.0, 2.0, 5.0, 6.5])
+    np.testing.assert_array_equal(inflow, [1.0, 2.0, 3.0, 4.0])
+    np.testing.assert_array_equal(retention, [1.0, 0.0, 1.0, 0.5])
@@ -0,0 +1,42 @@
+"""Two processes on one PRICING_SHARED_CACHE_DIR: the second reuses the first one's results."""
+import multiprocessing
+
+
+def replica(results):
+    # Imported in the child so its cache is built from the environment it was started with
+    from cache import shared_cache
+    from charts import get_figures
+    from forecast import forecast_inputs, forecast_key, get_forecast
+    from pricing_calculator import PricingCalculator
+    from tariff import get_tariff
+
+    tariff = get_tariff()
+    calculator = PricingCalculator(list(tariff.module_names[:2]), tariff.package_names[0], tariff)
+    inputs = forecast_inputs(tariff, customers_month_1=50, forecast_months=36)
+    get_figures(forecast_key(calculator, inputs), get_forecast(calculator, inputs))
+    results.put(shared_cache.stats())
+
+
+def run_replica(context):
+    results = context.Queue()
+    process = context.Process(target=replica, args=(results,))
+    process.start()
+    stats = results.get(timeout=120)
+    process.join(timeout=30)
+    assert process.exitcode == 0
+    return stats
+
+
+def test_second_process_hits_shared_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("PRICING_SHARED_CACHE_DIR", str(tmp_path))
+    context = multiprocessing.get_context("spawn")
+
+    first = run_replica(context)
+    assert first['shared']['hits'] == 0
+    assert first['shared']['writes'] > 0
+
+    second = run_replica(context)
+    # Every in-process miss of the second replica is served from the first one's entries
+    assert second['misses'] > 0
+    assert second['shared']['hits'] == second['misses']
+    assert second['shared']['misses'] == 0
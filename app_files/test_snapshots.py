@@ -0,0 +1,73 @@
+"""Session snapshot store: tokens, expiry, format changes and concurrent writers."""
+import json
+import threading
+import time
+
+import pytest
+
+import snapshots
+from snapshots import SnapshotStore, encode_snapshot, new_token, valid_token
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.db"), ttl_seconds=60)
+    yield store
+    store.close()
+
+
+def test_tokens():
+    token = new_token()
+    assert valid_token(token) and token != new_token()
+    assert not valid_token("short")
+    assert not valid_token("x" * 20 + "'; DROP TABLE snapshots; --")
+    assert not valid_token(None)
+
+
+def test_encoding_is_canonical():
+    assert encode_snapshot({'b': 1, 'a': [1, 2]}) == encode_snapshot({'a': [1, 2], 'b': 1})
+
+
+def test_latest_snapshot_wins(store):
+    token = new_token()
+    store.save(token, encode_snapshot({'inputs': {'forecast_months': 12}}))
+    store.save(token, encode_snapshot({'inputs': {'forecast_months': 24}}))
+    assert store.load(token)['inputs'] == {'forecast_months': 24}
+    assert store.load(new_token()) is None
+    assert store.load("not a token") is None
+
+
+def test_expired_and_other_format_snapshots_are_ignored(store, monkeypatch):
+    token, old_format = new_token(), new_token()
+    store.save(token, encode_snapshot({'inputs': {}}))
+    store.save(old_format, json.dumps({'inputs': {}, 'format': snapshots.SNAPSHOT_FORMAT - 1}))
+    assert store.load(old_format) is None
+
+    later = time.time() + 120
+    monkeypatch.setattr(snapshots.time, 'time', lambda: later)
+    assert store.load(token) is None
+    store.prune()
+    with store.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0] == 0
+
+
+def test_concurrent_sessions(store):
+    tokens = [new_token() for _ in range(16)]
+    errors = []
+
+    def session(token):
+        try:
+            for rerun in range(20):
+                store.save(token, encode_snapshot({'token': token, 'rerun': rerun}))
+                assert store.load(token)['rerun'] == rerun
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=session, args=(token,)) for token in tokens]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert all(store.load(token) == {'token': token, 'rerun': 19, 'format': snapshots.SNAPSHOT_FORMAT}
+               for token in tokens)
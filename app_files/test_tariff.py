@@ -0,0 +1,58 @@
+"""Graduated overage bands: the vectorized lookup against a band-by-band sum."""
+import numpy as np
+import pytest
+
+from pricing_config import EXTERNAL_FEES, MODULES, PACKAGE_SIZES
+from tariff import TariffError, compile_tariff, overage_bands
+
+BANDS = [{'up_to': 50, 'fee': 500}, {'up_to': 150, 'fee': 350}, {'fee': 200}]
+
+
+def banded_tariff():
+    package_sizes = {name: dict(info) for name, info in PACKAGE_SIZES.items()}
+    first = next(iter(package_sizes))
+    package_sizes[first] = {'order_limit': package_sizes[first]['order_limit'], 'overage_bands': BANDS}
+    return compile_tariff(package_sizes, MODULES, EXTERNAL_FEES)
+
+
+def reference_cost(bands, orders):
+    cost = 0.0
+    for number, (start, fee) in enumerate(bands):
+        end = bands[number + 1][0] if number + 1 < len(bands) else np.inf
+        cost += max(0.0, min(orders, end) - start) * fee
+    return cost
+
+
+def test_overage_bands_default_to_one_flat_band():
+    assert overage_bands({'order_limit': 25, 'overage_fee': 500}) == [(0, 500)]
+    assert overage_bands({'order_limit': 25, 'overage_bands': BANDS}) == [(0, 500), (50, 350), (150, 200)]
+
+
+def test_overage_cost_matches_band_by_band_sum():
+    tariff = banded_tariff()
+    orders = np.array([0, 1, 49.5, 50, 51, 149, 150, 151, 1000])
+    costs = tariff.overage_costs(orders[:, None])
+    for index, name in enumerate(tariff.package_names):
+        bands = overage_bands(tariff.package_sizes[name])
+        expected = [reference_cost(bands, value) for value in orders]
+        np.testing.assert_allclose(costs[:, index], expected)
+
+
+def test_flat_tariff_charges_overage_fee_per_order():
+    tariff = compile_tariff()
+    assert tariff.flat_overage
+    np.testing.assert_allclose(tariff.overage_costs(np.array([[10.0]]))[0], tariff.overage_fees * 10)
+
+
+@pytest.mark.parametrize("bands", [
+    [],
+    [{'up_to': 50, 'fee': 500}],
+    [{'up_to': 50, 'fee': 500}, {'up_to': 40, 'fee': 300}, {'fee': 100}],
+    [{'up_to': 50, 'fee': -1}, {'fee': 100}],
+])
+def test_invalid_bands_are_rejected(bands):
+    package_sizes = dict(PACKAGE_SIZES)
+    first = next(iter(package_sizes))
+    package_sizes[first] = {'order_limit': 25, 'overage_bands': bands}
+    with pytest.raises(TariffError):
+        compile_tariff(package_sizes, MODULES, EXTERNAL_FEES)
@@ -0,0 +1,54 @@
+"""Warmup fills every cache entry the calculator page reads for the configured selections."""
+import json
+
+from cache import shared_cache
+from charts import get_cash_figure, get_figures
+from config import DEFAULT_DISCOUNT_RATE
+from finance import cash_flow_metrics
+from forecast import forecast_inputs, forecast_key, get_forecast, optimal_package_table
+from pricing_calculator import PricingCalculator
+from tariff import get_tariff
+from view_models import get_configurator_view
+from warmup import load_warmup_config, run_warmup
+
+CONFIG = {
+    'optimal_table_max_orders': 300,
+    'module_selections': [["System Access"], ["System Access", "Marketplace"]],
+    'forecast_inputs': [{'forecast_months': 13}, {'forecast_months': 13, 'charger_type': "Zaptec Go"}],
+}
+
+
+def render_page(modules, overrides):
+    """The cached lookups of one calculator page render"""
+    tariff = get_tariff()
+    get_configurator_view(tariff)
+    calculator = PricingCalculator(modules, tariff.package_names[0], tariff)
+    optimal_package_table(calculator, CONFIG['optimal_table_max_orders'])
+    inputs = forecast_inputs(tariff, **overrides)
+    forecast = get_forecast(calculator, inputs)
+    key = forecast_key(calculator, inputs)
+    get_figures(key, forecast)
+    # The page's discount rate comes from a percent input
+    discount_rate = DEFAULT_DISCOUNT_RATE * 100 / 100
+    get_cash_figure(key, forecast, cash_flow_metrics(forecast['profit'], discount_rate), discount_rate)
+
+
+def test_page_renders_hit_the_warm_cache():
+    shared_cache.clear()
+    messages = []
+    stats = run_warmup(CONFIG, log=messages.append)
+    assert stats['entries'] > 0 and messages[0].startswith("Warmup complete")
+
+    misses = shared_cache.stats()['misses']
+    for modules in CONFIG['module_selections']:
+        for overrides in CONFIG['forecast_inputs']:
+            render_page(modules, overrides)
+    assert shared_cache.stats()['misses'] == misses
+
+
+def test_warmup_config_file(tmp_path, monkeypatch):
+    path = tmp_path / "warmup.json"
+    monkeypatch.setenv("PRICING_WARMUP_FILE", str(path))
+    assert load_warmup_config() == {}
+    path.write_text(json.dumps(CONFIG), encoding="utf-8")
+    assert load_warmup_config() == CONFIG
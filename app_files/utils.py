@@ -1,12 +1,8 @@
 import streamlit as st
 
-def format_currency(amount, currency_symbol="$"):
-    """Format amount as currency string"""
-    return f"{currency_symbol}{amount:,.2f}"
-
 def reset_session_state():
     """Reset all session state variables"""
-    keys_to_reset = ['step', 'selected_modules', 'selected_package']
+    keys_to_reset = ['step', 'module_mask', 'package_id']
     for key in keys_to_reset:
         if key in st.session_state:
             del st.session_state[key]
@@ -0,0 +1,109 @@
+import io
+import os
+from collections import namedtuple
+from types import MappingProxyType
+
+from cache import make_key, shared_cache
+from currency import BASE_CURRENCY, fx_rate
+from tariff import overage_bands
+
+MANDATORY_MODULE = "System Access"
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO_CANDIDATES = ("logo.png", "./logo.png", "app_files/logo.png", "../logo.png")
+# Display width of the header logo; st.image() passes PNG bytes at most this wide through untouched
+LOGO_WIDTH = 1000
+
+# One checkbox row in the module grid, with every display string preformatted
+ModuleRow = namedtuple("ModuleRow", ["name", "label", "mandatory", "price_text", "description", "summary_text"])
+
+# Everything the configurator needs to render a package, built once per tariff version and currency
+PackageView = namedtuple("PackageView", [
+    "order_limit_text", "overage_fee_text", "module_prices", "module_columns", "rows_by_name"
+])
+ConfiguratorView = namedtuple("ConfiguratorView", ["tariff_version", "currency", "logo", "package_names", "packages"])
+
+_logo_cache = {}
+
+
+def _scale_logo(data, width=LOGO_WIDTH):
+    """PNG bytes scaled down to width, as st.image() would otherwise do on every rerun"""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    if image.width <= width and image.format == "PNG":
+        return data
+    if image.width > width:
+        image = image.resize((width, int(1.0 * image.height * width / image.width)), resample=Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def load_logo_bytes():
+    """Read and scale logo.png once per process (next to this file first, then the historical locations)"""
+    if 'logo' not in _logo_cache:
+        logo = None
+        for path in (os.path.join(APP_DIR, "logo.png"),) + LOGO_CANDIDATES:
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    logo = _scale_logo(f.read())
+                break
+        _logo_cache['logo'] = logo
+    return _logo_cache['logo']
+
+
+def _overage_fee_text(package_info, rate, currency):
+    """'300 DKK/order', or per band for graduated overage: '400 DKK/order (1–50), 300 (51–200), 200 (201+)'"""
+    bands = overage_bands(package_info)
+    if len(bands) == 1:
+        return f"{bands[0][1] * rate:,.0f} {currency}/order"
+    parts = []
+    for (start, fee), (end, _) in zip(bands, bands[1:] + [(None, None)]):
+        orders = f"{start + 1:,}–{end:,}" if end is not None else f"{start + 1:,}+"
+        unit = f" {currency}/order" if not parts else ""
+        parts.append(f"{fee * rate:,.0f}{unit} ({orders})")
+    return ", ".join(parts)
+
+
+def _build_package_view(tariff, package_name, currency):
+    package_index = tariff.package_index(package_name)
+    rate = fx_rate(currency)
+    # One multiply converts the whole price column for this package
+    prices = tariff.module_prices[:, package_index] * rate
+    rows = []
+    for module_name, module_price in zip(tariff.module_names, prices):
+        mandatory = module_name == MANDATORY_MODULE
+        rows.append(ModuleRow(
+            name=module_name,
+            label=f"**{module_name}** (Mandatory)" if mandatory else f"**{module_name}**",
+            mandatory=mandatory,
+            price_text=f" {module_price:,.0f} {currency}/month",
+            description=tariff.modules[module_name]['description'],
+            summary_text=f"• **{module_name}**: {module_price:,.0f} {currency}/month"
+        ))
+    return PackageView(
+        order_limit_text=f"{tariff.package_sizes[package_name]['order_limit']} orders/month",
+        overage_fee_text=_overage_fee_text(tariff.package_sizes[package_name], rate, currency),
+        module_prices=MappingProxyType(dict(zip(tariff.module_names, prices.tolist()))),
+        # Two-column grid: even positions left, odd positions right
+        module_columns=(tuple(rows[0::2]), tuple(rows[1::2])),
+        rows_by_name=MappingProxyType({row.name: row for row in rows})
+    )
+
+
+def build_configurator_view(tariff, currency=BASE_CURRENCY):
+    return ConfiguratorView(
+        tariff_version=tariff.version,
+        currency=currency,
+        logo=load_logo_bytes(),
+        package_names=tariff.package_names,
+        packages=MappingProxyType(
+            {name: _build_package_view(tariff, name, currency) for name in tariff.package_names})
+    )
+
+
+def get_configurator_view(tariff, currency=BASE_CURRENCY):
+    """Configurator view model shared by all sessions, rebuilt only per tariff version and currency"""
+    return shared_cache.get_or_compute(make_key('configurator_view', tariff.version, currency),
+                                       lambda: build_configurator_view(tariff, currency))
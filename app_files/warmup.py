@@ -0,0 +1,64 @@
+"""Precompute the shared caches for the most common calculator configurations.
+
+Run by serve.py before Streamlit starts listening, so /_stcore/health only
+reports ready once the caches are warm. The warmup set is read from
+warmup.json (override with PRICING_WARMUP_FILE).
+"""
+import json
+import os
+import time
+
+from cache import shared_cache
+from charts import get_cash_figure, get_figures
+from config import DEFAULT_DISCOUNT_RATE
+from finance import cash_flow_metrics
+from forecast import forecast_inputs, forecast_key, get_forecast, optimal_package_table
+from pricing_calculator import PricingCalculator
+from tariff import get_tariff
+from view_models import get_configurator_view
+
+DEFAULT_WARMUP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "warmup.json")
+
+
+def load_warmup_config(path=None):
+    """Load the warmup set; a missing file means only the default configuration is warmed"""
+    path = path or os.environ.get("PRICING_WARMUP_FILE", DEFAULT_WARMUP_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_warmup(config=None, log=print):
+    """Compile the tariff and populate the view model, optimal-package tables, forecasts and figures
+    (including the cumulative cash chart at the default discount rate)"""
+    if config is None:
+        config = load_warmup_config()
+    started = time.perf_counter()
+
+    tariff = get_tariff()
+    get_configurator_view(tariff)
+    max_orders = config.get("optimal_table_max_orders", 1000)
+    selections = config.get("module_selections") or [["System Access"]]
+    input_sets = config.get("forecast_inputs") or [{}]
+
+    for modules in selections:
+        calculator = PricingCalculator(modules, tariff.package_names[0], tariff)
+        optimal_package_table(calculator, max_orders)
+        for overrides in input_sets:
+            inputs = forecast_inputs(tariff, **overrides)
+            forecast = get_forecast(calculator, inputs)
+            key = forecast_key(calculator, inputs)
+            get_figures(key, forecast)
+            get_cash_figure(key, forecast, cash_flow_metrics(forecast['profit'], DEFAULT_DISCOUNT_RATE),
+                            DEFAULT_DISCOUNT_RATE)
+
+    elapsed = time.perf_counter() - started
+    stats = shared_cache.stats()
+    log(f"Warmup complete for tariff {tariff.version}: {len(selections)} module selections x "
+        f"{len(input_sets)} input sets, {stats['entries']} cache entries in {elapsed:.2f}s")
+    return stats
+
+
+if __name__ == "__main__":
+    run_warmup()
@@ -19,6 +19,15 @@ cp docker/dockerignore .dockerignore
 echo "🐳 Building Docker image..."
 docker-compose -f docker/docker-compose.yml build --no-cache
 
+# Load test the new image before it replaces the running containers (SKIP_LOAD_TEST=1 skips this)
+if [ -z "$SKIP_LOAD_TEST" ]; then
+    echo "🏋️ Load testing the new image..."
+    docker-compose -f docker/docker-compose.yml run --rm --no-deps -T \
+        -e PRICING_SHARED_CACHE_DIR= nordic-pricing \
+        python -m benchmarks.load_test --sessions 1,4,8 --steps 10 \
+        --max-p95-ms "${LOAD_TEST_MAX_P95_MS:-2500}" --max-session-mb "${LOAD_TEST_MAX_SESSION_MB:-50}"
+fi
+
 # Stop existing container
 echo "🛑 Stopping existing container..."
 docker-compose -f docker/docker-compose.yml down
@@ -27,9 +36,14 @@ docker-compose -f docker/docker-compose.yml down
 echo "▶️ Starting new container..."
 docker-compose -f docker/docker-compose.yml up -d
 
-# Wait for health check
+# Wait for health check (goes green once the cache warmup has finished)
 echo "🏥 Waiting for health check..."
-sleep 30
+for i in $(seq 1 30); do
+    if curl -sf http://localhost:8501/_stcore/health > /dev/null; then
+        break
+    fi
+    sleep 5
+done
 
 # Check if container is running
 if docker-compose -f docker/docker-compose.yml ps | grep -q "Up"; then